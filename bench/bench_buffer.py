@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#
+# Microbenchmark: protoserv.Buffer vs. the previous list backed implementation.
+#
+#   python bench/bench_buffer.py --backlog 1000000 --frame-size 300
+#
+import os
+import sys
+import time
+import argparse
+from typing import Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from protoserv import Buffer
+
+
+class LegacyBuffer:
+    """Previous list-of-ints Buffer (kept here only for comparison)."""
+    def __init__(self, buffer:Dict = None):
+        self.buffer = {} if buffer is None else buffer
+
+    def get_size(self, session_id) -> int:
+        return(len(self.buffer[session_id]))
+
+    def append(self, session_id, data) -> int:
+        self.buffer[session_id] += data
+        return(len(self.buffer[session_id]))
+
+    def get_range(self, session_id, start_element=0, end_elements = 0) -> bytes:
+        if end_elements == 0:
+            return b''
+        return bytes(self.buffer[session_id][start_element:end_elements])
+
+    def remove_elements(self, session_id, number_of_elements: int) -> int:
+        if number_of_elements != 0:
+            self.buffer[session_id] = self.buffer[session_id][number_of_elements:]
+        return len(self.buffer[session_id])
+
+    def create_session(self, session_id) -> bool:
+        self.buffer[session_id] = []
+        return True
+
+
+def make_stream(frame_size: int, frames: int) -> bytes:
+    frame = frame_size.to_bytes(2, 'big') + b'\xaa' * frame_size
+    return frame * frames
+
+
+def run(buffer, stream: bytes, chunk_size: int, frame_size: int, backlog: int, zero_copy: bool) -> dict:
+    buffer.create_session(1)
+    # Preload backlog so that every operation pays for its size
+    buffer.append(1, stream[:backlog])
+    pos = backlog
+    consumed = 0
+
+    t0 = time.perf_counter()
+    while pos < len(stream):
+        buffer.append(1, stream[pos:pos + chunk_size])
+        pos += chunk_size
+        while buffer.get_size(1) >= 2 + frame_size:
+            if zero_copy:
+                header = buffer.peek(1, 0, 2)
+                msg_len = (header[0] << 8) | header[1]
+                msg = buffer.peek(1, 2, 2 + msg_len)
+            else:
+                msg_len = int.from_bytes(buffer.get_range(1, 0, 2), 'big')
+                msg = buffer.get_range(1, 2, 2 + msg_len)
+            buffer.remove_elements(1, 2 + msg_len)
+            consumed += len(msg)
+    elapsed = time.perf_counter() - t0
+    return {'elapsed': elapsed, 'mb_s': consumed / elapsed / 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Buffer microbenchmark")
+    parser.add_argument("--frame-size", type=int, default=300, help="Payload size of a single frame. Default: 300")
+    parser.add_argument("--frames", type=int, default=20000, help="Number of frames streamed through the buffer. Default: 20000")
+    parser.add_argument("--chunk-size", type=int, default=8196, help="Size of a single append (sock.recv). Default: 8196")
+    parser.add_argument("--backlog", type=int, nargs='+', default=[0, 100000, 1000000], help="Preloaded backlog in bytes. Default: 0 100000 1000000")
+    args = parser.parse_args()
+
+    frame_total = args.frame_size + 2
+    for backlog in args.backlog:
+        backlog_frames = backlog // frame_total
+        stream = make_stream(args.frame_size, args.frames + backlog_frames)
+        backlog = backlog_frames * frame_total
+        results = [
+            ('LegacyBuffer', run(LegacyBuffer(), stream, args.chunk_size, args.frame_size, backlog, False)),
+            ('Buffer.get_range', run(Buffer(), stream, args.chunk_size, args.frame_size, backlog, False)),
+            ('Buffer.peek', run(Buffer(), stream, args.chunk_size, args.frame_size, backlog, True)),
+        ]
+        print(f"backlog: {backlog} bytes | frames: {args.frames} x {args.frame_size} bytes")
+        for name, r in results:
+            print(f"   {name.ljust(20)} | {r['elapsed']:.3f} s | {r['mb_s']:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
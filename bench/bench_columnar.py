@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+#
+# Columnar sink vs. NDJSON data file: file size, write time and time to read one column back.
+#
+#   python bench/bench_columnar.py --apstra-version 4.2.1 --messages 50000
+#
+import os
+import glob
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+import stream
+from protoserv.decoder import message_to_dict
+from protoserv.columnar import ColumnarSink, read_pcol, pyarrow
+
+
+def build_records(schema, count: int, seed: int = 0) -> list:
+    rnd = random.Random(seed)
+    records = []
+    for i in range(count):
+        message = stream.build_aos_message(schema, rnd, origin_name=f"SYS{i % 50}")
+        record = message_to_dict(schema, message)
+        record['source'] = '10.0.0.1:40000'
+        records.append(record)
+    return records
+
+
+def msg_type_of(record: dict):
+    for key, value in record.items():
+        if isinstance(value, dict):
+            return key
+    return None
+
+
+def bench_ndjson(records: list, directory: str) -> dict:
+    path = os.path.join(directory, 'data.log')
+    t0 = time.perf_counter()
+    with open(path, 'w') as f:
+        f.write("\n".join(json.dumps(record) for record in records) + "\n")
+    write_seconds = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    origins = []
+    with open(path) as f:
+        for line in f:
+            origins.append(json.loads(line).get('origin_name'))
+    read_seconds = time.perf_counter() - t0
+    return {'bytes': os.path.getsize(path), 'write': write_seconds, 'read': read_seconds, 'rows': len(origins)}
+
+
+def bench_columnar(records: list, schema, directory: str, file_format: str, compression: str, row_group_rows: int) -> dict:
+    sink = ColumnarSink(directory, schema, file_format=file_format, compression=compression,
+                        row_group_rows=row_group_rows, flush_interval=3600)
+    sink.start()
+    t0 = time.perf_counter()
+    for record in records:
+        sink.write(msg_type_of(record), record)
+    write_call_seconds = time.perf_counter() - t0
+    sink.close(timeout=600)
+    write_seconds = time.perf_counter() - t0
+
+    files = glob.glob(os.path.join(directory, '*', '*'))
+    t0 = time.perf_counter()
+    rows = 0
+    for path in files:
+        if path.endswith('.parquet'):
+            rows += len(pyarrow.parquet.read_table(path, columns=['origin_name']).column(0))
+        else:
+            for group in read_pcol(path, ['origin_name']):
+                rows += len(group['origin_name'])
+    read_seconds = time.perf_counter() - t0
+    return {'bytes': sum(os.path.getsize(path) for path in files), 'write': write_seconds,
+            'write_call': write_call_seconds, 'read': read_seconds, 'rows': rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar sink vs. NDJSON benchmark")
+    parser.add_argument("--apstra-version", default="4.2.1")
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--row-group-rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    schema = stream.schema_for(args.apstra_version)
+    records = build_records(schema, args.messages)
+    directory = tempfile.mkdtemp(prefix='bench_columnar_')
+    try:
+        results = {'ndjson': bench_ndjson(records, directory)}
+        runs = [('pcol', 'zlib'), ('pcol', 'lzma')]
+        if pyarrow is not None:
+            runs += [('parquet', 'zstd'), ('parquet', 'snappy')]
+        for file_format, compression in runs:
+            run_dir = os.path.join(directory, f"{file_format}-{compression}")
+            results[f"{file_format}/{compression}"] = bench_columnar(records, schema, run_dir, file_format,
+                                                                      compression, args.row_group_rows)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    base = results['ndjson']
+    print(f"{args.messages} messages")
+    print(f"{'output':<16} {'bytes':>12} {'size':>7} {'write s':>9} {'write() s':>10} {'read 1 col s':>13} {'speedup':>8}")
+    for name, result in results.items():
+        print(f"{name:<16} {result['bytes']:>12} {result['bytes'] / base['bytes']:>6.1%} {result['write']:>9.3f} "
+              f"{result.get('write_call', result['write']):>10.3f} {result['read']:>13.3f} "
+              f"{base['read'] / result['read']:>7.1f}x")
+        if result['rows'] != args.messages:
+            print(f"  !!! rows read back: {result['rows']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+#
+# Decode worker pool scaling benchmark.
+#
+#   python bench/bench_decodepool.py --apstra-version 4.2.1 --workers 1 2 4 8
+#
+import os
+import time
+import argparse
+import threading
+
+import stream
+from protoserv.decoder import message_to_dict, parse_frame
+from protoserv.decodepool import DecodePool
+
+
+def run_inline(schema, items) -> float:
+    t0 = time.perf_counter()
+    for _, payload in items:
+        message_to_dict(schema, parse_frame(schema, payload, "sequenced"))
+    return time.perf_counter() - t0
+
+
+def run_pool(proto_dir, items, workers, batch_size, reorder_window) -> float:
+    done = threading.Event()
+    received = []
+
+    def on_result(session_id, result, frame):
+        received.append(result)
+        if len(received) == len(items):
+            done.set()
+
+    pool = DecodePool(proto_dir, on_result, workers=workers, batch_size=batch_size, reorder_window=reorder_window)
+    pool.start()
+    # warm up worker processes (spawn + schema import) outside of the measurement
+    pool.executor.map(abs, range(workers * 4))
+    try:
+        t0 = time.perf_counter()
+        pool.submit(1, "sequenced", items)
+        done.wait()
+        elapsed = time.perf_counter() - t0
+    finally:
+        pool.shutdown()
+    seq = [int(r['seq_num']) for r in received]
+    assert seq == sorted(seq), "results out of seq_num order"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode worker pool benchmark")
+    parser.add_argument("--apstra-version", default=os.getenv('APSTRA_VERSION', '4.2.1'), help="Specify Apstra version (proto/<version>). Default: 4.2.1")
+    parser.add_argument("--messages", type=int, default=50000, help="Number of AosSequencedMessage to decode. Default: 50000")
+    parser.add_argument("--workers", type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1], help="Worker counts to test")
+    parser.add_argument("--batch-size", type=int, default=64, help="Messages per worker task. Default: 64")
+    parser.add_argument("--reorder-window", type=int, default=16384, help="Reorder window. Default: 16384")
+    args = parser.parse_args()
+
+    proto_dir = os.path.join(stream.PROJECT_DIR, 'proto', args.apstra_version)
+    schema = stream.load_schema(proto_dir)
+    items = list(enumerate(stream.build_payloads(schema, args.messages, sequenced=True), start=1))
+
+    elapsed = run_inline(schema, items)
+    print(f"inline            | {elapsed:.3f} s | {len(items) / elapsed:.0f} msg/s")
+    for workers in sorted(set(args.workers)):
+        elapsed = run_pool(proto_dir, items, workers, args.batch_size, args.reorder_window)
+        print(f"workers: {str(workers).ljust(7)} | {elapsed:.3f} s | {len(items) / elapsed:.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+#
+# End-to-end throughput / latency benchmark.
+#
+#   python bench/bench_e2e.py --apstra-version 4.2.1 --connections 4 --messages 20000 --ws-consumers 2 \
+#       --server-args "--ingest-mode asyncio --decode-workers 2"
+#
+# Starts server.py in a temporary directory, streams synthetic telemetry over N TCP
+# connections (bench/loadgen.py) and receives decoded messages on M WebSocket clients.
+# Reports msg/s, ingest -> emit latency percentiles (message timestamp is stamped at
+# send time) and CPU / peak RSS of every stage: generator, server, decode workers,
+# WebSocket consumers. Without WebSocket consumers completion is detected from the
+# data file (no latency).
+#
+import os
+import sys
+import json
+import time
+import shlex
+import signal
+import socket
+import asyncio
+import tempfile
+import argparse
+import threading
+import subprocess
+import multiprocessing
+from array import array
+
+import stream
+from loadgen import LoadGenerator
+
+
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+#-----------------------------------------------
+# /proc sampling
+def proc_stat(pid):
+    """(cpu seconds, rss bytes, ppid) of the process or None if it is gone."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    # fields[0] is state (3rd field of /proc/<pid>/stat)
+    return ((int(fields[11]) + int(fields[12])) / _CLOCK_TICKS, int(fields[21]) * _PAGE_SIZE, int(fields[1]))
+
+
+def children(pid) -> list:
+    result = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            stat = proc_stat(int(entry))
+            if stat is not None and stat[2] == pid:
+                result.append(int(entry))
+    return result
+
+
+class StageSampler(threading.Thread):
+    """Samples CPU time and peak RSS of stages (a stage is a set of processes)."""
+    def __init__(self, interval=0.2):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stages = {}
+        self.cpu = {}
+        self.peak_rss = {}
+        self.stop_event = threading.Event()
+
+    def add(self, name, pids_function):
+        self.stages[name] = pids_function
+        self.cpu[name] = {}
+        self.peak_rss[name] = 0
+
+    def sample(self):
+        for name, pids_function in self.stages.items():
+            rss = 0
+            for pid in pids_function():
+                stat = proc_stat(pid)
+                if stat is None:
+                    continue
+                self.cpu[name][pid] = stat[0]
+                rss += stat[1]
+            self.peak_rss[name] = max(self.peak_rss[name], rss)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.sample()
+        self.stop_event.set()
+
+    def cpu_seconds(self, name) -> float:
+        return sum(self.cpu[name].values())
+
+
+#-----------------------------------------------
+# WebSocket consumers (separate process - JSON parsing must not steal server CPU accounting)
+def run_consumers(url, consumers, expected, idle_timeout, ready, results):
+    import websockets
+
+    latencies = array('d')
+    counts = [0] * consumers
+    last = [0.0]
+
+    async def consume(n, ws):
+        async for message in ws:
+            now = time.time()
+            for line in (message.split("\n") if isinstance(message, str) else ()):
+                if not line:
+                    continue
+                message_dict = json.loads(line)
+                if 'action' in message_dict:
+                    # control frames (ie. snapshot) carry no telemetry timestamp
+                    continue
+                latencies.append(now - int(message_dict['timestamp']) / 1000000)
+                counts[n] += 1
+            last[0] = now
+            if counts[n] >= expected:
+                return
+
+    async def main():
+        connections = [await websockets.connect(url, max_size=None) for _ in range(consumers)]
+        ready.set()
+        tasks = [asyncio.ensure_future(consume(n, ws)) for n, ws in enumerate(connections)]
+        while not all(task.done() for task in tasks):
+            await asyncio.sleep(0.2)
+            if last[0] and time.time() - last[0] > idle_timeout:
+                break
+        for ws in connections:
+            await ws.close()
+
+    cpu0 = time.process_time()
+    asyncio.run(main())
+    results.put({'counts': counts, 'latencies': latencies.tobytes(), 'last': last[0],
+                 'cpu': time.process_time() - cpu0})
+
+
+def wait_port(port, timeout=30) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def count_lines(filepath, state) -> int:
+    """Incremental line count of a growing data file."""
+    try:
+        with open(filepath, 'rb') as f:
+            f.seek(state.get('offset', 0))
+            data = f.read()
+    except OSError:
+        return state.get('lines', 0)
+    state['offset'] = state.get('offset', 0) + len(data)
+    state['lines'] = state.get('lines', 0) + data.count(b'\n')
+    return state['lines']
+
+
+def percentile(values, p) -> float:
+    if not values:
+        return float('nan')
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="protoserv end-to-end benchmark")
+    parser.add_argument("--apstra-version", default=os.getenv('APSTRA_VERSION', '4.2.1'), help="Specify Apstra version (proto/<version>). Default: 4.2.1")
+    parser.add_argument("--port", type=int, default=14444, help="Protobuf listener port used by the benchmark server. Default: 14444")
+    parser.add_argument("--ws-port", type=int, default=8765, help="WebSocket port of the server. Default: 8765")
+    parser.add_argument("--connections", type=int, default=1, help="Number of concurrent protobuf connections. Default: 1")
+    parser.add_argument("--messages", type=int, default=20000, help="Messages per connection. Default: 20000")
+    parser.add_argument("--rate", type=float, default=0, help="Messages per second per connection (0 - as fast as possible). Default: 0")
+    parser.add_argument("--unsequenced", action="store_true", help="Send AosMessage instead of AosSequencedMessage")
+    parser.add_argument("--ws-consumers", type=int, default=1, help="Number of WebSocket consumers. Default: 1")
+    parser.add_argument("--ws-mode", default="json", choices=["json", "ndjson"], help="WebSocket output mode of the consumers. Default: json")
+    parser.add_argument("--pb-logger-file-output-format", default="json", help="Data file format of the server (none - no data file). Default: json")
+    parser.add_argument("--server-args", default="", help="Extra server.py arguments, e.g. \"--ingest-mode asyncio --decode-workers 2\"")
+    parser.add_argument("--timeout", type=float, default=300, help="Max benchmark duration in seconds. Default: 300")
+    args = parser.parse_args()
+
+    proto_dir = os.path.join(stream.PROJECT_DIR, 'proto', args.apstra_version)
+    total = args.connections * args.messages
+    workdir = tempfile.mkdtemp(prefix="protoserv-bench-")
+    env = dict(os.environ, STD_LOGGER_LEVEL='WARNING', STD_LOGGER_FILE_LEVEL='WARNING', LOG_REFRESH_INTERVAL='1',
+               DATA_LOGGER_FILE_OUTPUT_FILEPATH=os.path.join(workdir, 'data.log'))
+    server = subprocess.Popen([sys.executable, os.path.join(stream.PROJECT_DIR, 'server.py'),
+                               '--apstra-version', args.apstra_version, '--port', str(args.port),
+                               '--pb-logger-file-output-format', args.pb_logger_file_output_format]
+                              + shlex.split(args.server_args),
+                              cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    sampler = StageSampler()
+    ctx = multiprocessing.get_context('spawn')
+    consumers = None
+    generator = None
+    try:
+        if not wait_port(args.ws_port) or not wait_port(args.port):
+            print("server did not start")
+            return
+        sampler.add('server', lambda: [server.pid])
+        sampler.add('decode workers', lambda: children(server.pid))
+
+        if args.ws_consumers:
+            ready = ctx.Event()
+            consumer_results = ctx.Queue()
+            url = f"ws://127.0.0.1:{args.ws_port}/?mode={args.ws_mode}&snapshot=0"
+            consumers = ctx.Process(target=run_consumers, daemon=True,
+                                    args=(url, args.ws_consumers, total, 5.0, ready, consumer_results))
+            consumers.start()
+            ready.wait(30)
+            sampler.add('ws consumers', lambda: [consumers.pid])
+
+        generator = LoadGenerator('127.0.0.1', args.port, proto_dir, connections=args.connections,
+                                  messages=args.messages, rate=args.rate, sequenced=not args.unsequenced)
+        sampler.add('generator', lambda: [p.pid for p in generator.processes])
+        sampler.start()
+        generator.start()
+        sent = generator.wait()
+
+        deadline = time.time() + args.timeout
+        if consumers:
+            received = consumer_results.get(timeout=args.timeout)
+            end_time = received['last']
+        else:
+            state = {}
+            last_lines, end_time = -1, time.time()
+            while time.time() < deadline:
+                lines = count_lines(env['DATA_LOGGER_FILE_OUTPUT_FILEPATH'], state)
+                if lines != last_lines:
+                    last_lines, end_time = lines, time.time()
+                elif lines >= total or time.time() - end_time > 5:
+                    break
+                time.sleep(0.1)
+            received = {'counts': [last_lines], 'latencies': b'', 'cpu': None}
+        sampler.stop()
+    finally:
+        if generator:
+            generator.stop()
+        server.send_signal(signal.SIGINT)
+        try:
+            server.wait(15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    start_time = min(r['start'] for r in sent)
+    send_elapsed = max(r['start'] + r['elapsed'] for r in sent) - start_time
+    elapsed = max(end_time - start_time, 1e-9)
+    latencies = array('d')
+    latencies.frombytes(received['latencies'])
+    latencies = sorted(latencies)
+
+    print(f"messages          | sent: {total} | received: {' '.join(str(c) for c in received['counts'])}")
+    print(f"generator         | {send_elapsed:.3f} s | {total / max(send_elapsed, 1e-9):.0f} msg/s")
+    print(f"end to end        | {elapsed:.3f} s | {min(received['counts']) / elapsed:.0f} msg/s")
+    if latencies:
+        print(f"latency           | p50: {percentile(latencies, 50) * 1000:.2f} ms | p99: {percentile(latencies, 99) * 1000:.2f} ms"
+              f" | max: {latencies[-1] * 1000:.2f} ms")
+    for name in sampler.stages:
+        cpu = sampler.cpu_seconds(name)
+        print(f"{name.ljust(17)} | cpu: {cpu:.2f} s ({100 * cpu / elapsed:.0f}%) | peak rss: {sampler.peak_rss[name] / 1048576:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
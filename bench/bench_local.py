@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+#
+# Local output channels vs. WebSocket: shared memory ring, Unix socket stream and WSServer
+# deliver the same decoded messages to consumer processes on the same host.
+#
+#   python bench/bench_local.py --apstra-version 4.2.1 --messages 50000 --consumers 1
+#
+# Every message is stamped with its publish time, consumers parse the JSON and report
+# msg/s, publish -> receive latency percentiles, losses and their own CPU time.
+#
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+from array import array
+
+import stream
+from protoserv import WSServer
+from protoserv.decoder import message_to_dict
+from protoserv.localout import ShmRingWriter, UnixStreamServer
+from protoserv.localclient import ShmRingReader, UnixStreamReader
+
+
+def build_records(schema, count: int, seed: int = 0) -> list:
+    rnd = random.Random(seed)
+    return [message_to_dict(schema, stream.build_aos_message(schema, rnd, origin_name=f"SYS{i % 50}"))
+            for i in range(min(count, 5000))]
+
+
+#-----------------------------------------------
+# Consumers (separate processes)
+def consume_lines(lines, latencies) -> int:
+    now = time.time()
+    count = 0
+    for line in lines:
+        latencies.append(now - int(json.loads(line)['timestamp']) / 1000000)
+        count += 1
+    return count
+
+
+def run_shm(name, expected, ready, results):
+    latencies = array('d')
+    cpu0 = time.process_time()
+    with ShmRingReader(name) as ring:
+        ready.set()
+        count = 0
+        while count < expected:
+            records = ring.wait(timeout=5.0)
+            if not records:
+                break
+            count += consume_lines(records, latencies)
+        results.put({'count': count, 'latencies': latencies.tobytes(), 'cpu': time.process_time() - cpu0,
+                     'lost': ring.lost, 'overruns': ring.overruns})
+
+
+def run_unix(path, expected, ready, results):
+    latencies = array('d')
+    cpu0 = time.process_time()
+    with UnixStreamReader(path) as reader:
+        reader.sock.settimeout(5.0)
+        ready.set()
+        count = 0
+        try:
+            while count < expected:
+                records = reader.read()
+                if records is None:
+                    break
+                count += consume_lines(records, latencies)
+        except OSError:
+            pass
+        results.put({'count': count, 'latencies': latencies.tobytes(), 'cpu': time.process_time() - cpu0})
+
+
+def run_ws(url, expected, ready, results):
+    import websockets
+    latencies = array('d')
+    counts = [0]
+    cpu0 = time.process_time()
+
+    async def main():
+        async with websockets.connect(url, max_size=None) as ws:
+            ready.set()
+            while counts[0] < expected:
+                try:
+                    message = await asyncio.wait_for(ws.recv(), 5.0)
+                except asyncio.TimeoutError:
+                    break
+                if isinstance(message, str):
+                    counts[0] += consume_lines([line for line in message.split("\n") if line], latencies)
+
+    asyncio.run(main())
+    results.put({'count': counts[0], 'latencies': latencies.tobytes(), 'cpu': time.process_time() - cpu0})
+
+
+#-----------------------------------------------
+# Publisher (this process)
+def publish_all(records, count, publish) -> float:
+    t0 = time.perf_counter()
+    for i in range(count):
+        record = records[i % len(records)]
+        record['timestamp'] = str(int(time.time() * 1000000))
+        publish(json.dumps(record))
+    return time.perf_counter() - t0
+
+
+def run(name, target, target_args, publish, records, count, consumers, settle=0.5) -> dict:
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    readies = []
+    processes = []
+    for _ in range(consumers):
+        ready = ctx.Event()
+        process = ctx.Process(target=target, args=target_args + (count, ready, results))
+        process.start()
+        readies.append(ready)
+        processes.append(process)
+    for ready in readies:
+        ready.wait(30)
+    time.sleep(settle)
+    t0 = time.perf_counter()
+    publish_seconds = publish_all(records, count, publish)
+    outcomes = [results.get(timeout=120) for _ in processes]
+    elapsed = time.perf_counter() - t0
+    for process in processes:
+        process.join(10)
+    latencies = array('d')
+    for outcome in outcomes:
+        latencies.frombytes(outcome['latencies'])
+    latencies = sorted(latencies)
+    received = sum(outcome['count'] for outcome in outcomes)
+    return {'name': name, 'publish': publish_seconds, 'elapsed': elapsed, 'received': received,
+            'expected': count * consumers, 'cpu': sum(outcome['cpu'] for outcome in outcomes),
+            'p50': percentile(latencies, 50), 'p99': percentile(latencies, 99)}
+
+
+def percentile(values, p) -> float:
+    if not values:
+        return 0.0
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local output channels vs. WebSocket benchmark")
+    parser.add_argument("--apstra-version", default="4.2.1")
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--consumers", type=int, default=1)
+    parser.add_argument("--ws-port", type=int, default=18765)
+    parser.add_argument("--shm-size", type=int, default=64 * 1024 * 1024)
+    parser.add_argument("--channels", nargs="+", default=["shm", "unix", "ws"], choices=["shm", "unix", "ws"])
+    args = parser.parse_args()
+
+    schema = stream.schema_for(args.apstra_version)
+    records = build_records(schema, args.messages)
+    results = []
+
+    if "shm" in args.channels:
+        ring = ShmRingWriter(f"bench_local_{os.getpid()}", size=args.shm_size)
+        try:
+            results.append(run("shm ring", run_shm, (ring.name,), lambda message: ring.write(message.encode('utf-8')),
+                               records, args.messages, args.consumers))
+        finally:
+            ring.close()
+
+    if "unix" in args.channels:
+        path = os.path.join(tempfile.mkdtemp(prefix='bench_local_'), 'protoserv.sock')
+        server = UnixStreamServer(path, max_queue_bytes=1024 * 1024 * 1024).start()
+        try:
+            results.append(run("unix stream", run_unix, (path,), lambda message: server.publish(message.encode('utf-8')),
+                               records, args.messages, args.consumers))
+        finally:
+            server.close()
+
+    if "ws" in args.channels:
+        ws_server = WSServer(listen_ip="127.0.0.1", port=args.ws_port, queue_size=args.messages + 10,
+                             compression="none")
+        ws_server.start_server()
+        try:
+            results.append(run("websocket", run_ws, (f"ws://127.0.0.1:{args.ws_port}/",), ws_server.publish,
+                               records, args.messages, args.consumers, settle=1.0))
+        finally:
+            ws_server.shutdown_server()
+
+    print(f"{args.messages} messages, {args.consumers} consumer(s)")
+    print(f"{'channel':<12} {'msg/s':>10} {'received':>10} {'publish s':>10} {'consumer cpu s':>15} {'p50 ms':>8} {'p99 ms':>8}")
+    for result in results:
+        print(f"{result['name']:<12} {result['received'] / result['elapsed']:>10.0f} "
+              f"{result['received']:>5}/{result['expected']:<5} {result['publish']:>9.3f} {result['cpu']:>15.3f} "
+              f"{result['p50'] * 1000:>8.2f} {result['p99'] * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
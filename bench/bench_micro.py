@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+#
+# Hot path microbenchmarks (run before deploying to catch regressions).
+#
+#   python bench/bench_micro.py --apstra-version 4.2.1 --messages 20000
+#
+# Buffer append/peek/remove, server.pb2_msg_slicer, server.decode_first_uint64_field,
+# WireScanner.scan and DecodedMessage on the same synthetic stream.
+#
+import os
+import time
+import logging
+import argparse
+
+import stream
+import server
+from protoserv.buffer import Buffer
+from protoserv.decoder import parse_frame, DecodedMessage
+from protoserv.transcoder import Transcoder
+from protoserv.wirescan import WireScanner
+from protoserv.zlogger import ZLogger
+
+
+def measure(name, function, operations, repeat):
+    """Runs function() ``repeat`` times and prints the best result per operation."""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - t0)
+    print(f"{name.ljust(40)} | {best * 1e9 / operations:10.0f} ns/op | {operations / best:12.0f} op/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="protoserv hot path microbenchmarks")
+    parser.add_argument("--apstra-version", default=os.getenv('APSTRA_VERSION', '4.2.1'), help="Specify Apstra version (proto/<version>). Default: 4.2.1")
+    parser.add_argument("--messages", type=int, default=20000, help="Number of messages in the stream. Default: 20000")
+    parser.add_argument("--chunk", type=int, default=8196, help="recv() size used to feed the buffer. Default: 8196")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeat every benchmark N times (best is reported). Default: 5")
+    args = parser.parse_args()
+
+    schema = stream.schema_for(args.apstra_version)
+    payloads = stream.build_payloads(schema, args.messages, sequenced=True)
+    data = b''.join(stream.frame(p) for p in payloads)
+    chunks = [data[i:i + args.chunk] for i in range(0, len(data), args.chunk)]
+    n = len(payloads)
+    print(f"stream: {n} msg | {len(data)} B | {len(chunks)} chunks of {args.chunk} B")
+
+    # server.py globals normally set up in its __main__ block
+    server.logger = logging.getLogger('bench')
+    server.zlogger = ZLogger()
+    server.streaming_telemetry_schema_pb2 = schema
+    server.wire_scanner = WireScanner(schema)
+    server.decoded_sessions[1] = "127.0.0.1:1"
+
+    def buffer_append():
+        buffer = Buffer()
+        buffer.create_session(1)
+        for chunk in chunks:
+            buffer.append(1, chunk)
+    measure("Buffer.append", buffer_append, len(chunks), args.repeat)
+
+    def buffer_peek_remove():
+        buffer = Buffer()
+        buffer.create_session(1)
+        buffer.append(1, data)
+        for payload in payloads:
+            view = buffer.peek(1, 0, len(payload) + 2)
+            view.release()
+            buffer.remove_elements(1, len(payload) + 2)
+    measure("Buffer.peek + remove_elements", buffer_peek_remove, n, args.repeat)
+
+    def slicer():
+        server.pb2buffer = Buffer()
+        server.pb2buffer.create_session(1)
+        server.msg_counter[1] = 0
+        server.stream_mode[1] = None
+        for chunk in chunks:
+            server.pb2buffer.append(1, chunk)
+            server.pb2_msg_slicer(1)
+        assert server.msg_counter[1] == n
+    measure("append + pb2_msg_slicer", slicer, n, args.repeat)
+
+    def first_uint64():
+        for payload in payloads:
+            server.decode_first_uint64_field(payload)
+    measure("decode_first_uint64_field", first_uint64, n, args.repeat)
+    measure("WireScanner.scan", lambda: [server.wire_scanner.scan(p, "sequenced") for p in payloads], n, args.repeat)
+
+    messages = [parse_frame(schema, p, "sequenced") for p in payloads]
+    measure("parse_frame", lambda: [parse_frame(schema, p, "sequenced") for p in payloads], n, args.repeat)
+    for output_type in ("dict", "json"):
+        measure(f"DecodedMessage ({output_type}, json_format)",
+                lambda: [DecodedMessage(schema, p, "sequenced", source="bench").get(output_type) for p in payloads],
+                n, args.repeat)
+    transcoder = Transcoder(schema)
+    measure("Transcoder.message_to_dict", lambda: [transcoder.message_to_dict(m) for m in messages], n, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+#
+# Transcoder parity check + benchmark against MessageToDict + json.dumps.
+#
+#   python bench/bench_transcoder.py --apstra-version 4.2.1 --messages 20000
+#
+# Parity: every message of a random corpus (plus edge values - NaN/Infinity, -0.0,
+# max uint64, unicode, empty bytes/sub-messages) must give the same JSON string.
+# tests/test_transcoder.py runs the same corpus as a test.
+#
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+import stream
+from google.protobuf.descriptor import FieldDescriptor
+from protoserv.decoder import message_to_dict, parse_frame, field_is_map, field_is_repeated
+from protoserv.transcoder import Transcoder
+
+
+_EDGE_VALUES = {
+    FieldDescriptor.CPPTYPE_INT32: [0, -1, 2**31 - 1, -2**31],
+    FieldDescriptor.CPPTYPE_INT64: [0, -1, 2**63 - 1, -2**63],
+    FieldDescriptor.CPPTYPE_UINT32: [0, 2**32 - 1],
+    FieldDescriptor.CPPTYPE_UINT64: [0, 2**64 - 1, 1700000000000001],
+    FieldDescriptor.CPPTYPE_DOUBLE: [0.0, -0.0, 0.1, 1e300, float('nan'), float('inf'), float('-inf')],
+    FieldDescriptor.CPPTYPE_FLOAT: [0.0, -0.0, 0.1, 3.4e38, 1.17e-38, float('nan'), float('inf'), float('-inf')],
+    FieldDescriptor.CPPTYPE_BOOL: [False, True],
+}
+_EDGE_STRINGS = ['', 'zażółć gęślą jaźń', '"quoted" \\ \n \t', ' \U0001F600']
+_EDGE_BYTES = [b'', b'\x00\xff', bytes(range(256))]
+
+
+def _edge_choices(field) -> list:
+    if field.cpp_type == FieldDescriptor.CPPTYPE_STRING:
+        return _EDGE_BYTES if field.type == FieldDescriptor.TYPE_BYTES else _EDGE_STRINGS
+    return _EDGE_VALUES[field.cpp_type]
+
+
+def edge_message(message, rnd: random.Random, depth: int = 0):
+    """Overwrites set scalar fields (and map values) with edge values."""
+    for field, value in message.ListFields():
+        if field_is_map(field):
+            value_field = field.message_type.fields_by_name['value']
+            for key in list(value):
+                if value_field.cpp_type == FieldDescriptor.CPPTYPE_MESSAGE:
+                    edge_message(value[key], rnd, depth + 1)
+                elif value_field.cpp_type != FieldDescriptor.CPPTYPE_ENUM:
+                    value[key] = rnd.choice(_edge_choices(value_field))
+            continue
+        if field.cpp_type == FieldDescriptor.CPPTYPE_MESSAGE:
+            items = value if field_is_repeated(field) else [value]
+            for item in items:
+                if rnd.random() < 0.2:
+                    item.Clear()
+                    if not field_is_repeated(field):
+                        item.SetInParent()
+                    if not item.IsInitialized():
+                        # sub-message with required fields can not stay empty
+                        stream.fill_message(item, rnd, depth + 1)
+                else:
+                    edge_message(item, rnd, depth + 1)
+            continue
+        if field.cpp_type == FieldDescriptor.CPPTYPE_ENUM:
+            continue
+        choices = _edge_choices(field)
+        if field_is_repeated(field):
+            del value[:]
+            value.extend(rnd.choice(choices) for _ in range(rnd.randrange(0, 4)))
+        else:
+            setattr(message, field.name, rnd.choice(choices))
+    return message
+
+
+def build_corpus(schema, count: int, seed: int) -> list:
+    rnd = random.Random(seed)
+    payloads = []
+    for i in range(count):
+        message = stream.build_aos_message(schema, rnd)
+        if i % 2:
+            edge_message(message, rnd)
+            message.timestamp = int(time.time() * 1000000)
+        payloads.append(schema.AosSequencedMessage(seq_num=i + 1, aos_proto=message.SerializeToString()).SerializeToString())
+        # unsequenced frames as well
+        payloads.append(message.SerializeToString())
+    return payloads
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcoder parity check and benchmark")
+    parser.add_argument("--apstra-version", default=os.getenv('APSTRA_VERSION', '4.2.1'), help="Specify Apstra version (proto/<version>). Default: 4.2.1")
+    parser.add_argument("--messages", type=int, default=20000, help="Number of messages. Default: 20000")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus seed. Default: 0")
+    args = parser.parse_args()
+
+    schema = stream.schema_for(args.apstra_version)
+    transcoder = Transcoder(schema)
+    payloads = build_corpus(schema, args.messages // 2, args.seed)
+    messages = [parse_frame(schema, p, "sequenced" if i % 2 == 0 else "unsequenced") for i, p in enumerate(payloads)]
+
+    mismatches = 0
+    for message in messages:
+        expected = json.dumps(message_to_dict(schema, message))
+        result = json.dumps(transcoder.message_to_dict(message))
+        if expected != result:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"MISMATCH\n   expected: {expected}\n   result:   {result}")
+    print(f"parity: {len(messages) - mismatches}/{len(messages)} identical")
+
+    for name, to_dict in (("MessageToDict", lambda m: message_to_dict(schema, m)),
+                          ("Transcoder", transcoder.message_to_dict)):
+        t0 = time.perf_counter()
+        for message in messages:
+            to_dict(message)
+        elapsed_dict = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for message in messages:
+            json.dumps(to_dict(message))
+        elapsed = time.perf_counter() - t0
+        print(f"{name.ljust(15)} | dict: {len(messages) / elapsed_dict:.0f} msg/s | dict + json.dumps: {len(messages) / elapsed:.0f} msg/s")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
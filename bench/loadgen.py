@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+#
+# Synthetic Apstra streaming load generator.
+#
+#   python bench/loadgen.py --apstra-version 4.2.1 --port 4444 --connections 4 --messages 50000 --rate 0
+#
+# Every connection is a separate process sending length prefixed AosSequencedMessage
+# (or AosMessage with --unsequenced) built from the compiled schema. Message timestamps
+# are set at send time, so consumers can measure ingest -> emit latency.
+#
+import os
+import time
+import random
+import socket
+import argparse
+import multiprocessing
+
+import stream
+
+
+TEMPLATES = 64
+
+
+def run_connection(number, host, port, proto_dir, messages, rate, sequenced, chunk, stop_event, results):
+    schema = stream.load_schema(proto_dir)
+    rnd = random.Random(number)
+    templates = [stream.build_aos_message(schema, rnd, origin_name=f"device-{number}-{i % 16}") for i in range(TEMPLATES)]
+
+    sock = socket.create_connection((host, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    interval = 1.0 / rate if rate > 0 else 0.0
+    sent_bytes = 0
+    batch = []
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    for i in range(messages):
+        batch.append(stream.encode_frame(schema, templates[i % TEMPLATES], seq_num=i + 1 if sequenced else None))
+        if interval or len(batch) >= chunk:
+            data = b''.join(batch)
+            sock.sendall(data)
+            sent_bytes += len(data)
+            batch.clear()
+        if interval:
+            delay = t0 + (i + 1) * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    if batch:
+        data = b''.join(batch)
+        sock.sendall(data)
+        sent_bytes += len(data)
+    elapsed = time.perf_counter() - t0
+    results.put({'connection': number, 'messages': messages, 'bytes': sent_bytes, 'elapsed': elapsed,
+                 'cpu': time.process_time() - cpu0, 'start': time.time() - elapsed})
+    # keep the session open - the server drops buffered data of a closed connection
+    stop_event.wait()
+    sock.close()
+
+
+class LoadGenerator:
+    """N concurrent TCP connections (one process each) streaming synthetic Apstra telemetry."""
+    def __init__(self, host, port, proto_dir, connections=1, messages=10000, rate=0.0, sequenced=True, chunk=64):
+        self.ctx = multiprocessing.get_context('spawn')
+        self.stop_event = self.ctx.Event()
+        self.results = self.ctx.Queue()
+        self.processes = [self.ctx.Process(target=run_connection,
+                                           args=(n, host, port, proto_dir, messages, rate, sequenced, chunk,
+                                                 self.stop_event, self.results),
+                                           daemon=True)
+                          for n in range(connections)]
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+
+    def wait(self) -> list:
+        """Waits until every connection sent its messages and returns per connection results."""
+        return sorted((self.results.get() for _ in self.processes), key=lambda r: r['connection'])
+
+    def stop(self):
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic Apstra protobuf stream generator")
+    parser.add_argument("--apstra-version", default=os.getenv('APSTRA_VERSION', '4.2.1'), help="Specify Apstra version (proto/<version>). Default: 4.2.1")
+    parser.add_argument("--host", default="127.0.0.1", help="Protobuf listener address. Default: 127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv('LISTEN_PORT', 4444)), help="Protobuf listener port. Default: 4444")
+    parser.add_argument("--connections", type=int, default=1, help="Number of concurrent connections. Default: 1")
+    parser.add_argument("--messages", type=int, default=10000, help="Messages per connection. Default: 10000")
+    parser.add_argument("--rate", type=float, default=0, help="Messages per second per connection (0 - as fast as possible). Default: 0")
+    parser.add_argument("--unsequenced", action="store_true", help="Send AosMessage instead of AosSequencedMessage")
+    parser.add_argument("--hold", type=float, default=5, help="Seconds to keep connections open after sending. Default: 5")
+    args = parser.parse_args()
+
+    generator = LoadGenerator(args.host, args.port, os.path.join(stream.PROJECT_DIR, 'proto', args.apstra_version),
+                              connections=args.connections, messages=args.messages, rate=args.rate,
+                              sequenced=not args.unsequenced)
+    generator.start()
+    for result in generator.wait():
+        print(f"connection: {str(result['connection']).ljust(4)} | {result['messages']} msg | {result['bytes']} B"
+              f" | {result['elapsed']:.3f} s | {result['messages'] / result['elapsed']:.0f} msg/s | cpu: {result['cpu']:.2f} s")
+    time.sleep(args.hold)
+    generator.stop()
+
+
+if __name__ == "__main__":
+    main()
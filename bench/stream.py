@@ -0,0 +1,113 @@
+#
+# Synthetic Apstra stream helpers shared by the benchmarks.
+#
+# Messages are built from the descriptors of the compiled streaming_telemetry_schema_pb2,
+# so they follow whatever schema is in proto/<apstra-version>.
+#
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from protoserv.decoder import load_schema, field_is_map, field_is_repeated
+from google.protobuf.descriptor import FieldDescriptor
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+
+_INT_TYPES = (FieldDescriptor.CPPTYPE_INT32, FieldDescriptor.CPPTYPE_INT64,
+              FieldDescriptor.CPPTYPE_UINT32, FieldDescriptor.CPPTYPE_UINT64)
+
+
+def schema_for(apstra_version: str):
+    return load_schema(os.path.join(PROJECT_DIR, 'proto', apstra_version))
+
+
+def _scalar(field, rnd: random.Random):
+    cpp_type = field.cpp_type
+    if cpp_type in _INT_TYPES:
+        value = rnd.randrange(0, 1 << 20)
+        if cpp_type in (FieldDescriptor.CPPTYPE_INT32, FieldDescriptor.CPPTYPE_INT64) and rnd.random() < 0.1:
+            value = -value
+        return value
+    if cpp_type in (FieldDescriptor.CPPTYPE_DOUBLE, FieldDescriptor.CPPTYPE_FLOAT):
+        return float(rnd.randrange(0, 10000)) / 4
+    if cpp_type == FieldDescriptor.CPPTYPE_BOOL:
+        return rnd.random() < 0.5
+    if cpp_type == FieldDescriptor.CPPTYPE_ENUM:
+        return rnd.choice(field.enum_type.values).number
+    if field.type == FieldDescriptor.TYPE_BYTES:
+        return rnd.randbytes(rnd.randrange(1, 16))
+    return f"{field.name}-{rnd.randrange(0, 64)}"
+
+
+def fill_message(message, rnd: random.Random, depth: int = 0, max_depth: int = 6):
+    """Fills message with random values (one member of every oneof, 1-3 items of repeated and map fields)."""
+    descriptor = message.DESCRIPTOR
+    chosen = {oneof.name: rnd.choice(oneof.fields) for oneof in descriptor.oneofs if oneof.fields}
+    for field in descriptor.fields:
+        oneof = field.containing_oneof
+        if oneof is not None and chosen.get(oneof.name) is not field:
+            continue
+        if field_is_map(field):
+            # map containers have no add()/extend() - items are set by key
+            container = getattr(message, field.name)
+            key_field = field.message_type.fields_by_name['key']
+            value_field = field.message_type.fields_by_name['value']
+            for _ in range(rnd.randrange(1, 4)):
+                key = _scalar(key_field, rnd)
+                if value_field.cpp_type == FieldDescriptor.CPPTYPE_MESSAGE:
+                    if depth < max_depth:
+                        fill_message(container[key], rnd, depth + 1, max_depth)
+                else:
+                    container[key] = _scalar(value_field, rnd)
+        elif field.cpp_type == FieldDescriptor.CPPTYPE_MESSAGE:
+            if depth >= max_depth:
+                continue
+            if field_is_repeated(field):
+                for _ in range(rnd.randrange(1, 4)):
+                    fill_message(getattr(message, field.name).add(), rnd, depth + 1, max_depth)
+            else:
+                fill_message(getattr(message, field.name), rnd, depth + 1, max_depth)
+        elif field_is_repeated(field):
+            getattr(message, field.name).extend(_scalar(field, rnd) for _ in range(rnd.randrange(1, 4)))
+        else:
+            setattr(message, field.name, _scalar(field, rnd))
+    return message
+
+
+def build_aos_message(schema, rnd: random.Random, timestamp: int = None, origin_name: str = None):
+    message = fill_message(schema.AosMessage(), rnd)
+    # recognize_stream_mode() relies on the first field being a (microseconds) timestamp
+    message.timestamp = timestamp if timestamp is not None else int(time.time() * 1000000)
+    if origin_name is not None:
+        message.origin_name = origin_name
+    return message
+
+
+def build_payloads(schema, count: int, sequenced: bool = True, seed: int = 0, start_seq: int = 1) -> list:
+    """Returns list of serialized AosSequencedMessage/AosMessage payloads (without length prefix)."""
+    rnd = random.Random(seed)
+    payloads = []
+    for i in range(count):
+        payload = build_aos_message(schema, rnd, origin_name=f"device-{i % 16}").SerializeToString()
+        if sequenced:
+            payload = schema.AosSequencedMessage(seq_num=start_seq + i, aos_proto=payload).SerializeToString()
+        payloads.append(payload)
+    return payloads
+
+
+def frame(payload: bytes) -> bytes:
+    return len(payload).to_bytes(2, 'big') + payload
+
+
+def encode_frame(schema, message, seq_num: int = None, timestamp: int = None) -> bytes:
+    """Stamps message with timestamp (default: now in microseconds) and returns length prefixed frame.
+
+    The timestamp is what the end-to-end benchmark uses to measure ingest -> emit latency.
+    """
+    message.timestamp = timestamp if timestamp is not None else int(time.time() * 1000000)
+    payload = message.SerializeToString()
+    if seq_num is not None:
+        payload = schema.AosSequencedMessage(seq_num=seq_num, aos_proto=payload).SerializeToString()
+    return frame(payload)
@@ -4,3 +4,5 @@ os.environ['PYTHONDONTWRITEBYTECODE'] = '1'
 from .wsserver import WSServer
 from .buffer import Buffer
 from .zlogger import ZLogger
+from .aioserver import PB2IngestServer
+from .datasink import DataSink
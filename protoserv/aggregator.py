@@ -0,0 +1,383 @@
+import math
+import time
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from google.protobuf.descriptor import FieldDescriptor
+
+from .decoder import field_is_repeated
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - pure python columns are used instead
+    numpy = None
+
+
+# Message type of the emitted summary records
+AGGREGATE_TYPE = 'aggregate'
+
+COUNTER_TYPES = frozenset((
+    FieldDescriptor.TYPE_DOUBLE, FieldDescriptor.TYPE_FLOAT,
+    FieldDescriptor.TYPE_INT64, FieldDescriptor.TYPE_UINT64, FieldDescriptor.TYPE_SINT64,
+    FieldDescriptor.TYPE_FIXED64, FieldDescriptor.TYPE_SFIXED64,
+    FieldDescriptor.TYPE_INT32, FieldDescriptor.TYPE_UINT32, FieldDescriptor.TYPE_SINT32,
+    FieldDescriptor.TYPE_FIXED32, FieldDescriptor.TYPE_SFIXED32,
+))
+LABEL_TYPES = frozenset((FieldDescriptor.TYPE_STRING, FieldDescriptor.TYPE_ENUM))
+
+# Pending samples are folded into the window state in batches of this size
+AGGREGATE_BATCH_SIZE = 4096
+
+# Rows without samples for this many windows are dropped (0 - rows are kept forever)
+AGGREGATE_IDLE_WINDOWS = 10
+
+# Window state columns: name, width (0 - one value per row, else one per counter), initial value
+_COLUMNS = (('minimum', 1, math.inf), ('maximum', 1, -math.inf), ('total', 1, 0.0),
+            ('first', 1, math.nan), ('last', 1, math.nan), ('prev_last', 1, math.nan),
+            ('samples', 0, 0.0), ('first_ts', 0, 0.0), ('last_ts', 0, 0.0), ('prev_ts', 0, 0.0),
+            ('idle', 0, 0.0))
+
+
+class _Plan:
+    """Aggregation plan of one message descriptor (built once from the schema).
+
+    ``labels`` (string/enum fields) identify a row, ``counters`` (numeric fields)
+    are aggregated, ``children`` are nested messages - their rows inherit the labels.
+    """
+    def __init__(self, descriptor, name: str = "", parent_labels: Tuple[str, ...] = (), use_numpy: bool = True,
+                 depth: int = 0):
+        self.name = name
+        self.labels = tuple(f.name for f in descriptor.fields if f.type in LABEL_TYPES and not field_is_repeated(f))
+        self.label_names = parent_labels + self.labels
+        counters = tuple(f.name for f in descriptor.fields if f.type in COUNTER_TYPES and not field_is_repeated(f))
+        self.group = _Group(name, self.label_names, counters, use_numpy) if counters and name else None
+        self.children: Dict[str, Tuple[bool, _Plan]] = {}
+        if depth < 3:
+            for field in descriptor.fields:
+                if field.type == FieldDescriptor.TYPE_MESSAGE:
+                    child_name = f"{name}.{field.name}" if name else field.name
+                    self.children[field.name] = (field_is_repeated(field),
+                                                 _Plan(field.message_type, child_name, self.label_names, use_numpy, depth + 1))
+
+    def groups(self) -> list:
+        result = [self.group] if self.group else []
+        for _, child in self.children.values():
+            result.extend(child.groups())
+        return result
+
+    def walk(self, body: dict, key: tuple, timestamp: float) -> None:
+        if self.labels:
+            key = key + tuple(str(body.get(label, '')) for label in self.labels)
+        if self.group is not None:
+            self.group.add(key, timestamp, body)
+        for name, (repeated, child) in self.children.items():
+            value = body.get(name)
+            if value is None:
+                continue
+            if repeated:
+                for item in value:
+                    child.walk(item, key, timestamp)
+            else:
+                child.walk(value, key, timestamp)
+
+
+class _Group:
+    """Running window state of one counter group in array columns.
+
+    Rows are (source, device, label values...), columns are counters. Incoming
+    samples are only appended to pending arrays; every ``AGGREGATE_BATCH_SIZE``
+    samples (and at window end) they are folded into min/max/sum/first/last
+    columns - with numpy in a few vectorized ``ufunc.at`` calls. Rows that got no
+    samples for ``idle_windows`` windows (ie. removed interfaces) are dropped by
+    ``expire``, so the row set follows the live entities.
+    """
+    def __init__(self, name: str, label_names: Tuple[str, ...], counters: Tuple[str, ...], use_numpy: bool = True):
+        self.name = name
+        self.label_names = label_names
+        self.counters = counters
+        self.n = len(counters)
+        self.numpy = numpy if use_numpy else None
+        self.rows: Dict[tuple, int] = {}
+        self.keys: List[tuple] = []
+        self.capacity = 0
+        self._reset_pending()
+        self._grow(64)
+
+    def _reset_pending(self):
+        self.pending_rows = array('q')
+        self.pending_ts = array('d')
+        self.pending_values = array('d')
+
+    def _columns(self, size, width, value):
+        if self.numpy is not None:
+            return self.numpy.full((size, width) if width else size, value, dtype=self.numpy.float64)
+        return array('d', [value]) * (size * (width or 1))
+
+    def _grow(self, capacity: int) -> None:
+        for name, width, value in _COLUMNS:
+            column = self._columns(capacity, width and self.n, value)
+            if self.capacity:
+                old = getattr(self, name)
+                if self.numpy is not None:
+                    column[:self.capacity] = old
+                else:
+                    column[:len(old)] = old
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def add(self, key: tuple, timestamp: float, body: dict) -> None:
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = len(self.keys)
+            self.keys.append(key)
+            if row >= self.capacity:
+                self._apply()
+                self._grow(self.capacity * 2)
+        self.pending_rows.append(row)
+        self.pending_ts.append(timestamp)
+        values = self.pending_values
+        for name in self.counters:
+            # int64 counters are strings in the decoded dict, missing counter is the (proto3) default 0
+            value = body.get(name)
+            values.append(float(value) if value is not None else 0.0)
+        if len(self.pending_rows) >= AGGREGATE_BATCH_SIZE:
+            self._apply()
+
+    def _apply(self) -> None:
+        count = len(self.pending_rows)
+        if not count:
+            return
+        if self.numpy is not None:
+            self._apply_numpy(count)
+        else:
+            self._apply_python(count)
+        self._reset_pending()
+
+    def _apply_numpy(self, count: int) -> None:
+        np = self.numpy
+        rows = np.frombuffer(self.pending_rows, dtype=np.int64)
+        ts = np.frombuffer(self.pending_ts, dtype=np.float64)
+        values = np.frombuffer(self.pending_values, dtype=np.float64).reshape(count, self.n)
+        np.minimum.at(self.minimum, rows, values)
+        np.maximum.at(self.maximum, rows, values)
+        np.add.at(self.total, rows, values)
+        unique, first_index = np.unique(rows, return_index=True)
+        fresh = self.samples[unique] == 0
+        self.first[unique[fresh]] = values[first_index[fresh]]
+        self.first_ts[unique[fresh]] = ts[first_index[fresh]]
+        np.add.at(self.samples, rows, 1)
+        last_index = count - 1 - np.unique(rows[::-1], return_index=True)[1]
+        self.last[unique] = values[last_index]
+        self.last_ts[unique] = ts[last_index]
+
+    def _apply_python(self, count: int) -> None:
+        n = self.n
+        rows, ts, values = self.pending_rows, self.pending_ts, self.pending_values
+        minimum, maximum, total = self.minimum, self.maximum, self.total
+        for i in range(count):
+            row = rows[i]
+            base = row * n
+            offset = i * n
+            sample = values[offset:offset + n]
+            if self.samples[row] == 0:
+                self.first[base:base + n] = sample
+                self.first_ts[row] = ts[i]
+            self.samples[row] += 1
+            self.last[base:base + n] = sample
+            self.last_ts[row] = ts[i]
+            for j in range(n):
+                value = sample[j]
+                if value < minimum[base + j]:
+                    minimum[base + j] = value
+                if value > maximum[base + j]:
+                    maximum[base + j] = value
+                total[base + j] += value
+
+    def summaries(self) -> List[Tuple[tuple, int, dict]]:
+        """(row key, samples, {counter: {min, max, avg, last, rate}}) of the rows with samples; resets the window."""
+        self._apply()
+        if self.numpy is not None:
+            return self._summaries_numpy()
+        return self._summaries_python()
+
+    def _summaries_numpy(self) -> list:
+        np = self.numpy
+        used = len(self.keys)
+        active = np.nonzero(self.samples[:used] > 0)[0]
+        self.idle[:used] += 1
+        self.idle[active] = 0
+        if not len(active):
+            return []
+        samples = self.samples[active]
+        last = self.last[active]
+        last_ts = self.last_ts[active]
+        prev_ts = self.prev_ts[active]
+        # rate against the last sample of the previous window, inside the window for a new row
+        has_prev = prev_ts > 0
+        dt = np.where(has_prev, last_ts - prev_ts, last_ts - self.first_ts[active])
+        dv = np.where(has_prev[:, None], last - self.prev_last[active], last - self.first[active])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = np.where((dt[:, None] > 0) & (dv >= 0), dv / dt[:, None], np.nan)
+            avg = self.total[active] / samples[:, None]
+        columns = zip(self.minimum[active].tolist(), self.maximum[active].tolist(), avg.tolist(),
+                      last.tolist(), rate.tolist())
+        result = [(self.keys[row], int(count), self._counters(*column))
+                  for row, count, column in zip(active.tolist(), samples.tolist(), columns)]
+        self.prev_last[active] = last
+        self.prev_ts[active] = last_ts
+        self.minimum[active] = math.inf
+        self.maximum[active] = -math.inf
+        self.total[active] = 0.0
+        self.samples[active] = 0
+        return result
+
+    def _summaries_python(self) -> list:
+        n = self.n
+        result = []
+        for row in range(len(self.keys)):
+            count = int(self.samples[row])
+            if not count:
+                self.idle[row] += 1
+                continue
+            self.idle[row] = 0
+            base = row * n
+            if self.prev_ts[row] > 0:
+                dt = self.last_ts[row] - self.prev_ts[row]
+                reference = self.prev_last[base:base + n]
+            else:
+                dt = self.last_ts[row] - self.first_ts[row]
+                reference = self.first[base:base + n]
+            last = self.last[base:base + n]
+            rate = [(value - ref) / dt if dt > 0 and value >= ref else math.nan for value, ref in zip(last, reference)]
+            avg = [value / count for value in self.total[base:base + n]]
+            result.append((self.keys[row], count, self._counters(
+                self.minimum[base:base + n].tolist(), self.maximum[base:base + n].tolist(), avg, last.tolist(), rate)))
+            self.prev_last[base:base + n] = last
+            self.prev_ts[row] = self.last_ts[row]
+            self.minimum[base:base + n] = array('d', [math.inf]) * n
+            self.maximum[base:base + n] = array('d', [-math.inf]) * n
+            self.total[base:base + n] = array('d', [0.0]) * n
+            self.samples[row] = 0
+        return result
+
+    def expire(self, idle_windows: int) -> int:
+        """Drops rows without samples for ``idle_windows`` windows (called at window end). Returns dropped rows."""
+        used = len(self.keys)
+        keep = [row for row in range(used) if self.idle[row] < idle_windows]
+        if len(keep) == used:
+            return 0
+        kept = len(keep)
+        for name, width, value in _COLUMNS:
+            column = getattr(self, name)
+            if self.numpy is not None:
+                column[:kept] = column[keep]
+                column[kept:used] = value
+            else:
+                width = width and self.n or 1
+                moved = array('d')
+                for row in keep:
+                    moved.extend(column[row * width:(row + 1) * width])
+                column[:kept * width] = moved
+                column[kept * width:used * width] = array('d', [value]) * ((used - kept) * width)
+        self.keys = [self.keys[row] for row in keep]
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        return used - kept
+
+    def _counters(self, minimum, maximum, avg, last, rate) -> dict:
+        return {name: {'min': minimum[j], 'max': maximum[j], 'avg': avg[j], 'last': last[j],
+                       'rate': rate[j] if rate[j] == rate[j] else None}
+                for j, name in enumerate(self.counters)}
+
+
+class Aggregator:
+    """Per window rates and min/max/avg of counter messages (perf_mon) instead of every raw sample.
+
+    Decoded messages of ``types`` are folded into per group column state keyed by
+    (source, device, labels); one summary record per row is produced when the
+    ``window`` (seconds, aligned to the wall clock) ends. Rates use the Apstra
+    message timestamps. numpy is used when installed (pure python columns otherwise).
+    Rows without samples for ``idle_windows`` windows are dropped (0 - never).
+
+    Summary record (message type ``aggregate``)::
+
+        {"timestamp": "<window end us>", "origin_name": "SYS1",
+         "aggregate": {"type": "perf_mon", "window": 60.0, "start": "<window start us>",
+                       "interface_counters": {"interface_name": "eth0", "samples": 6,
+                                              "counters": {"tx_bytes": {"min": .., "max": .., "avg": .., "last": .., "rate": ..}}}}}
+    """
+    def __init__(self, schema, window: float = 60.0, types: Iterable[str] = ('perf_mon',), use_numpy: bool = True,
+                 idle_windows: int = AGGREGATE_IDLE_WINDOWS):
+        self.window = float(window)
+        self.idle_windows = int(idle_windows)
+        self.types = frozenset(types)
+        self.plans: Dict[str, _Plan] = {}
+        message = schema.AosMessage.DESCRIPTOR
+        for msg_type in self.types:
+            field = message.fields_by_name.get(msg_type)
+            if field is None or field.type != FieldDescriptor.TYPE_MESSAGE:
+                raise ValueError(f"Unknown message type: {msg_type}")
+            self.plans[msg_type] = _Plan(field.message_type, use_numpy=use_numpy)
+        self.numpy = numpy is not None and use_numpy
+        self.lock = threading.Lock()
+        self.window_id = None
+        # Stats
+        self.samples = 0
+        self.records = 0
+        self.windows = 0
+        self.expired = 0
+
+    def add(self, source: Optional[str], msg_type: str, record: dict) -> List[Tuple[str, dict]]:
+        """Folds the decoded message into the window - returns (source, summary record) of a window that just ended."""
+        now = time.time()
+        try:
+            timestamp = int(record['timestamp']) / 1000000
+        except (KeyError, ValueError, TypeError):
+            timestamp = now
+        body = record.get(msg_type)
+        if not isinstance(body, dict):
+            return []
+        with self.lock:
+            records = self._roll(now)
+            self.plans[msg_type].walk(body, (source, record.get('origin_name')), timestamp)
+            self.samples += 1
+        return records
+
+    def flush(self, force: bool = False) -> List[Tuple[str, dict]]:
+        """(source, summary record) of an ended window (of the current one too when force - ie. on shutdown)."""
+        with self.lock:
+            if force:
+                return self._close(self.window_id) if self.window_id is not None else []
+            return self._roll(time.time())
+
+    def _roll(self, now: float) -> List[Tuple[str, dict]]:
+        window_id = int(now // self.window)
+        if window_id == self.window_id:
+            return []
+        previous = self.window_id
+        self.window_id = window_id
+        if previous is None:
+            return []
+        return self._close(previous)
+
+    def _close(self, window_id: int) -> List[Tuple[str, dict]]:
+        start = int(window_id * self.window * 1000000)
+        end = int((window_id + 1) * self.window * 1000000)
+        records = []
+        for msg_type, plan in self.plans.items():
+            for group in plan.groups():
+                for key, samples, counters in group.summaries():
+                    body = dict(zip(group.label_names, key[2:]))
+                    body['samples'] = samples
+                    body['counters'] = counters
+                    records.append((key[0], {'timestamp': str(end), 'origin_name': key[1],
+                                             AGGREGATE_TYPE: {'type': msg_type, 'window': self.window,
+                                                              'start': str(start), group.name: body}}))
+                if self.idle_windows > 0:
+                    self.expired += group.expire(self.idle_windows)
+        self.windows += 1
+        self.records += len(records)
+        return records
+
+    def get_rows(self) -> int:
+        return sum(len(group.keys) for plan in self.plans.values() for group in plan.groups())
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from .buffer import Buffer
+from .tcpingest import ReadSizer, SocketOptions, create_listen_socket, INGEST_READ_MIN, INGEST_READ_MAX
+from .utils import encode_address
+
+
+class PB2IngestProtocol(asyncio.BufferedProtocol):
+    """Single protobuf client connection.
+
+    The transport receives straight into the session memory (``get_buffer`` hands
+    out free space of the session buffer, sized by the connection's throughput)
+    and ``on_data`` is called from ``buffer_updated`` so frames are dispatched as
+    soon as they arrive.
+    """
+    def __init__(self, server: "PB2IngestServer"):
+        self.server = server
+        self.transport = None
+        self.session_id = None
+        self.sizer = ReadSizer(server.read_min, server.read_max)
+        self.last_data = 0.0
+        self.idle_handle = None
+        # reasons reading is paused for (flow control, decode pool) - resumed when none is left
+        self.paused = set()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        client_ip, client_port = transport.get_extra_info('peername')[:2]
+        self.session_id = encode_address(client_ip, client_port)
+        sock = transport.get_extra_info('socket')
+        if sock is not None:
+            try:
+                self.server.options.apply(sock)
+            except OSError as e:
+                self.server.logger.warning(f"ingest session {self.session_id} socket options: {str(e)}")
+        self.server.buffer.create_session(self.session_id)
+        self.server.connections[self.session_id] = self
+        self.last_data = asyncio.get_running_loop().time()
+        if self.server.options.idle_timeout > 0:
+            self.idle_handle = asyncio.get_running_loop().call_later(self.server.options.idle_timeout,
+                                                                     self._check_idle)
+        if self.server.on_connect:
+            self.server.on_connect(self.session_id, client_ip, client_port)
+
+    def get_buffer(self, sizehint):
+        return self.server.buffer.reserve(self.session_id, self.sizer.size)
+
+    def buffer_updated(self, nbytes):
+        self.server.buffer.commit(self.session_id, nbytes)
+        self.sizer.update(nbytes)
+        self.last_data = asyncio.get_running_loop().time()
+        if self.server.on_data:
+            try:
+                self.server.on_data(self.session_id)
+            except Exception as e:
+                self.server.logger.error(f"ingest session {self.session_id} on_data error: {str(e)}")
+
+    def _check_idle(self):
+        self.idle_handle = None
+        if self.transport is None:
+            return
+        loop = asyncio.get_running_loop()
+        idle = loop.time() - self.last_data
+        if idle >= self.server.options.idle_timeout:
+            self.server.logger.warning(f"ingest session {self.session_id} idle for {idle:.0f} s - disconnect")
+            self.transport.close()
+            return
+        self.idle_handle = loop.call_later(self.server.options.idle_timeout - idle, self._check_idle)
+
+    def connection_lost(self, exc):
+        if self.idle_handle:
+            self.idle_handle.cancel()
+            self.idle_handle = None
+        if self.server.on_close:
+            self.server.on_close(self.session_id)
+        self.server.connections.pop(self.session_id, None)
+        self.server.buffer.destroy_session(self.session_id)
+        self.transport = None
+
+
+class PB2IngestServer:
+    """asyncio based protobuf listener (alternative to the thread per connection model).
+
+    Args:
+        buffer (Buffer): Session buffer shared with the consumers.
+        listen_ip (str): IP address to listen on.
+        port (int): TCP port to listen on.
+        on_connect (callable): ``on_connect(session_id, client_ip, client_port)``.
+        on_data (callable): ``on_data(session_id)`` - called after every received chunk.
+        on_close (callable): ``on_close(session_id)`` - called before the session buffer is destroyed.
+        backlog (int): listen() backlog.
+        reuse_port (bool): Bind with SO_REUSEPORT (several worker processes share the port).
+        options (SocketOptions): Receive buffer, keepalive and idle timeout of the connections.
+        read_min (int), read_max (int): Bounds of the adaptive read size.
+    """
+    def __init__(self, buffer: Buffer, listen_ip="0.0.0.0", port=4444,
+                 on_connect: Optional[Callable] = None,
+                 on_data: Optional[Callable] = None,
+                 on_close: Optional[Callable] = None,
+                 backlog: int = 128,
+                 reuse_port: bool = False,
+                 options: Optional[SocketOptions] = None,
+                 read_min: int = INGEST_READ_MIN,
+                 read_max: int = INGEST_READ_MAX,
+                 logger=None):
+        self.buffer = buffer
+        self.listen_ip = listen_ip
+        self.listen_port = int(port)
+        self.on_connect = on_connect
+        self.on_data = on_data
+        self.on_close = on_close
+        self.backlog = backlog
+        self.reuse_port = reuse_port
+        self.options = options if options else SocketOptions()
+        self.read_min = read_min
+        self.read_max = read_max
+        self.logger = logger if logger else logging.getLogger('logger')
+        self.server = None
+        self.connections = {}
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        sock = create_listen_socket(self.listen_ip, self.listen_port, self.backlog, self.reuse_port, self.options)
+        self.server = await loop.create_server(lambda: PB2IngestProtocol(self), sock=sock, backlog=self.backlog)
+        self.logger.info(f"protobuf server (asyncio): {self.listen_ip}:{self.listen_port}")
+        return self.server
+
+    # Flow control - called from the event loop thread (buffer_updated -> on_data)
+    #  every reason (flow control memory budget, full decode pool window) pauses independently
+    def pause_reading(self, session_id, reason="flow"):
+        connection = self.connections.get(session_id)
+        if connection and connection.transport:
+            if not connection.paused:
+                connection.transport.pause_reading()
+            connection.paused.add(reason)
+
+    def resume_reading(self, session_id, reason="flow"):
+        connection = self.connections.get(session_id)
+        if connection and connection.transport and reason in connection.paused:
+            connection.paused.discard(reason)
+            if not connection.paused:
+                connection.transport.resume_reading()
+
+    def close_session(self, session_id):
+        connection = self.connections.get(session_id)
+        if connection and connection.transport:
+            connection.transport.close()
+
+    async def stop(self):
+        if self.server is None:
+            return
+        self.server.close()
+        for connection in list(self.connections.values()):
+            if connection.transport:
+                connection.transport.close()
+        await self.server.wait_closed()
+        self.server = None
@@ -1,6 +1,109 @@
-from typing import Union, Dict, Set
+import threading
+from typing import Dict
 
-class Buffer:        
+
+class _Session:
+    """Single session byte store.
+
+    The session memory is a preallocated bytearray: unread data lives in
+    ``data[start:end]`` and ``data[end:]`` is free space that ``append`` and
+    ``recv_into`` write into. Consuming only moves ``start`` forward; an emptied
+    session starts again at offset 0 and the consumed prefix is reclaimed when
+    the free space runs out - unless memoryviews returned by ``peek()`` still pin
+    the memory, then the unread part moves to a new bytearray and the old one is
+    left to the views (bytes they reference are never overwritten).
+    """
+    __slots__ = ('data', 'start', 'end', 'lock', 'received', 'reserved')
+
+    def __init__(self):
+        self.data = bytearray()
+        self.start = 0
+        self.end = 0
+        self.lock = threading.Lock()
+        # total bytes appended (metrics)
+        self.received = 0
+        # view handed out by Buffer.reserve() until commit()
+        self.reserved = None
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def pinned(self) -> bool:
+        """True while a memoryview still references the session memory."""
+        try:
+            self.data.append(0)
+        except BufferError:
+            return True
+        del self.data[-1]
+        return False
+
+    def reserve(self, size: int) -> None:
+        """Makes sure ``data[end:end + size]`` is free space."""
+        if self.start == self.end and self.start:
+            self.rewind()
+        if self.end + size <= len(self.data):
+            return
+        live = self.end - self.start
+        if live + size <= len(self.data) and not self.pinned():
+            # room enough once the consumed prefix is dropped
+            self.data[:live] = self.data[self.start:self.end]
+        else:
+            # grow, or leave the pinned memory to its views
+            capacity = len(self.data) if live + size <= len(self.data) else max(len(self.data) * 2, live + size)
+            data = bytearray(capacity)
+            data[:live] = self.data[self.start:self.end]
+            self.data = data
+        self.start = 0
+        self.end = live
+
+    def append(self, data) -> None:
+        size = len(data)
+        self.reserve(size)
+        self.data[self.end:self.end + size] = data
+        self.end += size
+        self.received += size
+
+    def recv_into(self, sock, size: int, flags: int = 0) -> int:
+        self.reserve(size)
+        target = memoryview(self.data)[self.end:self.end + size]
+        try:
+            received = sock.recv_into(target, size, flags)
+        finally:
+            target.release()
+        self.end += received
+        self.received += received
+        return received
+
+    def consume(self, number_of_elements: int) -> None:
+        self.start = min(self.start + number_of_elements, self.end)
+        if self.start == self.end:
+            self.rewind()
+
+    def rewind(self) -> None:
+        """Empty session back to offset 0 (kept where it is while views pin the memory)."""
+        if self.start == self.end and self.start and not self.pinned():
+            self.start = 0
+            self.end = 0
+
+    def compact(self) -> None:
+        if self.start == 0 or self.pinned():
+            # Pinned by a peek() view - reclaimed by a next reserve()
+            return
+        live = self.end - self.start
+        self.data[:live] = self.data[self.start:self.end]
+        self.start = 0
+        self.end = live
+
+
+class Buffer:
+    """Per session byte buffer.
+
+    Every session is a preallocated bytearray with read/write offsets, so
+    ``append`` and ``remove_elements`` are amortized O(1); ``recv_into`` and
+    ``reserve``/``commit`` let the socket layer receive straight into the
+    session memory. ``peek`` returns memoryviews into the session memory without
+    copying; ``get``/``get_range`` still return ``bytes`` for backward compatibility.
+    """
     def __init__(self, buffer:Dict = None):
         if buffer == None:
             self.buffer = {}
@@ -11,35 +114,102 @@ class Buffer:
         return(len(self.buffer[session_id]))
 
     def append(self, session_id, data) -> int:
-        self.buffer[session_id] += data
-        return(len(self.buffer[session_id]))
+        session = self.buffer[session_id]
+        with session.lock:
+            session.append(data)
+            return(len(session))
+
+    def recv_into(self, session_id, sock, size: int, flags: int = 0) -> int:
+        """Receives up to ``size`` bytes from ``sock`` straight into the session memory.
+
+        Returns the number of bytes received (0 - connection closed by the peer).
+        The session lock is held during the call, so a blocking socket should be
+        read once it is readable (or with ``socket.MSG_DONTWAIT``).
+        """
+        session = self.buffer[session_id]
+        with session.lock:
+            return session.recv_into(sock, size, flags)
+
+    def reserve(self, session_id, size: int) -> memoryview:
+        """Writable view of ``size`` bytes of free session memory (asyncio ``BufferedProtocol.get_buffer``).
+
+        The filled part is published by ``commit``; a session has one writer, so
+        nothing else may append to it in between.
+        """
+        session = self.buffer[session_id]
+        with session.lock:
+            session.reserve(size)
+            session.reserved = memoryview(session.data)[session.end:session.end + size]
+            return session.reserved
+
+    def commit(self, session_id, number_of_elements: int) -> int:
+        """Publishes the first ``number_of_elements`` bytes written into the ``reserve`` view. Returns unread size."""
+        session = self.buffer[session_id]
+        with session.lock:
+            if session.reserved is not None:
+                session.reserved.release()
+                session.reserved = None
+            session.end += number_of_elements
+            session.received += number_of_elements
+            return len(session)
 
     def get(self, session_id, number_of_elements = 0) -> bytes:
         if number_of_elements == 0:
             return b''
         else:
-            return bytes(self.buffer[session_id][:number_of_elements])
-        
+            return bytes(self.peek(session_id, 0, number_of_elements))
+
     def get_range(self, session_id, start_element=0, end_elements = 0) -> bytes:
         if end_elements == 0:
             return b''
         else:
-            return bytes(self.buffer[session_id][start_element:end_elements])
+            return bytes(self.peek(session_id, start_element, end_elements))
+
+    def peek(self, session_id, start_element=0, end_elements=None) -> memoryview:
+        """Returns a zero-copy read-only view of the unread session data.
+
+        Args:
+            session_id: Session key.
+            start_element (int): Offset from the first unread byte.
+            end_elements (int): End offset (exclusive). ``None`` means up to the end of the data.
+
+        The view stays valid after ``remove_elements``/``append``; it should be
+        released (or simply dropped) once the caller is done with it.
+        """
+        session = self.buffer[session_id]
+        with session.lock:
+            size = len(session)
+            if end_elements is None or end_elements > size:
+                end_elements = size
+            start_element = min(max(start_element, 0), end_elements)
+            view = memoryview(session.data).toreadonly()
+            return view[session.start + start_element:session.start + end_elements]
 
     def remove_elements(self, session_id, number_of_elements: int) -> int:
-        if number_of_elements == 0:
-            return len(self.buffer[session_id])
-        else:
-            self.buffer[session_id] = self.buffer[session_id][number_of_elements:]
-        return len(self.buffer[session_id])
-    
+        session = self.buffer[session_id]
+        with session.lock:
+            if number_of_elements > 0:
+                session.consume(number_of_elements)
+            return len(session)
+
+    def compact(self, session_id) -> int:
+        """Drops already consumed bytes of the session. Returns unread size."""
+        session = self.buffer[session_id]
+        with session.lock:
+            session.compact()
+            return len(session)
+
+    def get_received(self, session_id) -> int:
+        """Total number of bytes appended to the session."""
+        return self.buffer[session_id].received
+
     def get_sessions(self) -> list:
         return list(self.buffer.keys())
-    
+
     def create_session(self, session_id) -> bool:
-        self.buffer[session_id] = []
+        self.buffer[session_id] = _Session()
         return True
-    
+
     def destroy_session(self, session_id) -> bool:
         self.buffer.pop(session_id, None)
-        return True
\ No newline at end of file
+        return True
@@ -0,0 +1,243 @@
+import os
+import glob
+import mmap
+import time
+import struct
+import bisect
+import threading
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from .framing import FRAME_HEADER_SIZE
+
+
+# Segment file: frames exactly as received (2 byte big endian length + protobuf message)
+# Index file:   fixed size records (receive timestamp, session_id, seq_num, segment offset)
+SEGMENT_EXTENSION = '.seg'
+INDEX_EXTENSION = '.idx'
+INDEX_RECORD = struct.Struct('<dQQQ')
+_FRAME_HEADER = struct.Struct('>H')
+
+
+class CaptureWriter:
+    """Appends raw frames to segment files with a sidecar time index.
+
+    Timestamps in the index never go backwards (a clock step back repeats the
+    last timestamp), so time lookups can bisect the index.
+
+    Args:
+        directory (str): Capture directory.
+        segment_bytes (int): Start a new segment once the current one reaches this size.
+        max_segments (int): Number of segments to keep (0 - keep all).
+        flush_interval (float): Flush buffered frames/index at most every N seconds.
+    """
+    def __init__(self, directory, segment_bytes=256 * 1024 * 1024, max_segments=0, flush_interval=1.0):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.segment = None
+        self.index = None
+        self.segment_path = None
+        self.offset = 0
+        self.last_ts = 0.0
+        self.last_flush = time.monotonic()
+        self.frames = 0
+        self.segments = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, session_id: int, frames: List[memoryview], seq_nums: Optional[List[int]] = None) -> None:
+        """Appends sliced frames (protobuf messages without length prefix) of one session."""
+        now = time.time()
+        with self.lock:
+            if now < self.last_ts:
+                now = self.last_ts
+            self.last_ts = now
+            if self.segment is None or self.offset >= self.segment_bytes:
+                self._new_segment(now)
+            segment_write = self.segment.write
+            index_write = self.index.write
+            offset = self.offset
+            for i, frame in enumerate(frames):
+                index_write(INDEX_RECORD.pack(now, session_id, seq_nums[i] if seq_nums else 0, offset))
+                segment_write(_FRAME_HEADER.pack(len(frame)))
+                segment_write(frame)
+                offset += FRAME_HEADER_SIZE + len(frame)
+            self.offset = offset
+            self.frames += len(frames)
+            if time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self) -> None:
+        with self.lock:
+            if self.segment is not None:
+                self._flush()
+
+    def close(self) -> None:
+        with self.lock:
+            self._close_segment()
+
+    def _flush(self):
+        # segment first - index entries must never point past the flushed frames
+        self.segment.flush()
+        self.index.flush()
+        self.last_flush = time.monotonic()
+
+    def _close_segment(self):
+        if self.segment is not None:
+            self._flush()
+            self.segment.close()
+            self.index.close()
+            self.segment = None
+            self.index = None
+
+    def _new_segment(self, now: float):
+        self._close_segment()
+        name = f"capture-{datetime.fromtimestamp(now).strftime('%Y%m%d-%H%M%S')}-{self.segments:06d}"
+        self.segment_path = os.path.join(self.directory, name + SEGMENT_EXTENSION)
+        self.segment = open(self.segment_path, 'ab', buffering=1024 * 1024)
+        self.index = open(os.path.join(self.directory, name + INDEX_EXTENSION), 'ab', buffering=64 * 1024)
+        self.offset = os.path.getsize(self.segment_path)
+        self.segments += 1
+        if self.max_segments > 0:
+            for path in list_segments(self.directory)[:-self.max_segments]:
+                for filepath in (path, path[:-len(SEGMENT_EXTENSION)] + INDEX_EXTENSION):
+                    try:
+                        os.remove(filepath)
+                    except OSError:
+                        pass
+
+
+def list_segments(directory) -> List[str]:
+    """Segment files of the capture directory in recording order."""
+    return sorted(glob.glob(os.path.join(glob.escape(directory), 'capture-*' + SEGMENT_EXTENSION)))
+
+
+class _Timestamps:
+    """Sequence view of index timestamps (for bisect without loading the index)."""
+    __slots__ = ('index', 'count')
+
+    def __init__(self, index, count):
+        self.index = index
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i) -> float:
+        return INDEX_RECORD.unpack_from(self.index, i * INDEX_RECORD.size)[0]
+
+
+class _Segment:
+    __slots__ = ('path', 'data', 'index', 'count', 'timestamps', 'first_ts', 'last_ts')
+
+    def __init__(self, path):
+        self.path = path
+        with open(path[:-len(SEGMENT_EXTENSION)] + INDEX_EXTENSION, 'rb') as f:
+            self.index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.count = len(self.index) // INDEX_RECORD.size
+        # drop index records of frames not flushed completely (capture still running / crash)
+        while self.count and not self._complete(self.count - 1):
+            self.count -= 1
+        self.timestamps = _Timestamps(self.index, self.count)
+        self.first_ts = self.timestamps[0] if self.count else 0.0
+        self.last_ts = self.timestamps[self.count - 1] if self.count else 0.0
+
+    def _complete(self, i) -> bool:
+        offset = INDEX_RECORD.unpack_from(self.index, i * INDEX_RECORD.size)[3]
+        if offset + FRAME_HEADER_SIZE > len(self.data):
+            return False
+        return offset + FRAME_HEADER_SIZE + _FRAME_HEADER.unpack_from(self.data, offset)[0] <= len(self.data)
+
+    def close(self):
+        for m in (self.index, self.data):
+            try:
+                m.close()
+            except BufferError:
+                # frame views still referenced - mmap is released with them
+                pass
+
+
+class CaptureReader:
+    """Memory mapped access to a capture directory.
+
+    ``records()`` yields ``(timestamp, session_id, seq_num, frame)`` where frame
+    is a memoryview of the 2 byte length prefixed message inside the mmap
+    (valid until ``close()``). Time range seeks bisect the per-segment index.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.segments = []
+        for path in list_segments(directory):
+            try:
+                segment = _Segment(path)
+            except (OSError, ValueError):
+                # empty (just created) segment can not be mapped
+                continue
+            if segment.count:
+                self.segments.append(segment)
+            else:
+                segment.close()
+        self._first_ts = [segment.first_ts for segment in self.segments]
+
+    def __len__(self) -> int:
+        return sum(segment.count for segment in self.segments)
+
+    def time_range(self) -> Tuple[float, float]:
+        if not self.segments:
+            return (0.0, 0.0)
+        return (self.segments[0].first_ts, self.segments[-1].last_ts)
+
+    def seek(self, timestamp: float) -> Tuple[int, int]:
+        """Returns (segment number, record number) of the first record at or after timestamp."""
+        s = max(bisect.bisect_right(self._first_ts, timestamp) - 1, 0)
+        while s < len(self.segments):
+            segment = self.segments[s]
+            i = bisect.bisect_left(segment.timestamps, timestamp)
+            if i < segment.count:
+                return s, i
+            s += 1
+        return len(self.segments), 0
+
+    def records(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Tuple[float, int, int, memoryview]]:
+        s, i = self.seek(start) if start is not None else (0, 0)
+        unpack_record = INDEX_RECORD.unpack_from
+        unpack_header = _FRAME_HEADER.unpack_from
+        record_size = INDEX_RECORD.size
+        for segment in self.segments[s:]:
+            data = memoryview(segment.data)
+            index = segment.index
+            for n in range(i, segment.count):
+                ts, session_id, seq_num, offset = unpack_record(index, n * record_size)
+                if end is not None and ts > end:
+                    return
+                length = unpack_header(data, offset)[0]
+                yield ts, session_id, seq_num, data[offset:offset + FRAME_HEADER_SIZE + length]
+            i = 0
+
+    def replay(self, speed: float = 1.0, start: Optional[float] = None,
+               end: Optional[float] = None) -> Iterator[Tuple[float, int, int, memoryview]]:
+        """Same as ``records()`` paced by recorded timestamps.
+
+        Args:
+            speed (float): 1.0 - recorded speed, 2.0 - twice as fast, 0 - as fast as possible.
+        """
+        first_ts = None
+        started = time.monotonic()
+        for record in self.records(start, end):
+            if speed > 0:
+                if first_ts is None:
+                    first_ts = record[0]
+                delay = (record[0] - first_ts) / speed - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            yield record
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+        self._first_ts = []
@@ -0,0 +1,395 @@
+import os
+import sys
+import json
+import lzma
+import zlib
+import time
+import struct
+import threading
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from google.protobuf.descriptor import FieldDescriptor
+
+from .decoder import field_is_repeated
+from .utils import ensure_directory_exists
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - built-in columnar format is used instead
+    pyarrow = None
+
+
+COLUMNAR_FORMATS = ("auto", "parquet", "pcol")
+
+# Built-in columnar format: magic, then row groups of
+#   <4 byte header length><header JSON><column blocks>
+# header: {"rows": n, "codec": "zlib", "byteorder": "little",
+#          "columns": [{"name", "type", "nulls": <size>, "size": <size>}, ...]}
+# Every column block is compressed separately, so a reader decompresses only the columns it needs.
+PCOL_MAGIC = b'PCOL1\n'
+PCOL_CODECS = {
+    'zlib': (lambda data: zlib.compress(data, 6), zlib.decompress),
+    'lzma': (lambda data: lzma.compress(data, preset=1), lzma.decompress),
+    'none': (lambda data: data, lambda data: data),
+}
+
+# Column types (from the protobuf descriptors; other values are inferred)
+_TYPE_BY_CPP = {
+    FieldDescriptor.CPPTYPE_INT32: 'int64', FieldDescriptor.CPPTYPE_INT64: 'int64',
+    FieldDescriptor.CPPTYPE_UINT32: 'uint64', FieldDescriptor.CPPTYPE_UINT64: 'uint64',
+    FieldDescriptor.CPPTYPE_DOUBLE: 'double', FieldDescriptor.CPPTYPE_FLOAT: 'double',
+    FieldDescriptor.CPPTYPE_BOOL: 'bool',
+    FieldDescriptor.CPPTYPE_STRING: 'string', FieldDescriptor.CPPTYPE_ENUM: 'string',
+}
+_ARRAY_CODES = {'int64': 'q', 'uint64': 'Q', 'double': 'd'}
+
+
+def schema_columns(schema, msg_type: str, max_depth: int = 6) -> Dict[str, str]:
+    """{column: type} of a top-level AosMessage type - nested messages are flattened
+    into dotted names (``perf_mon.interface_counters.tx_bytes``), repeated fields
+    are stored as JSON strings."""
+    message = schema.AosMessage.DESCRIPTOR
+    columns = {'seq_num': 'uint64', 'source': 'string'}
+    for field in message.fields:
+        if field.containing_oneof is None and field.cpp_type != FieldDescriptor.CPPTYPE_MESSAGE:
+            columns[field.name] = 'string' if field_is_repeated(field) else _TYPE_BY_CPP[field.cpp_type]
+    field = message.fields_by_name.get(msg_type)
+    if field is not None and field.cpp_type == FieldDescriptor.CPPTYPE_MESSAGE:
+        _descriptor_columns(field.message_type, msg_type + '.', columns, max_depth)
+    return columns
+
+
+def _descriptor_columns(descriptor, prefix: str, columns: dict, depth: int) -> None:
+    for field in descriptor.fields:
+        name = prefix + field.name
+        if field_is_repeated(field):
+            columns[name] = 'string'
+        elif field.cpp_type == FieldDescriptor.CPPTYPE_MESSAGE:
+            if depth > 0:
+                _descriptor_columns(field.message_type, name + '.', columns, depth - 1)
+            else:
+                columns[name] = 'string'
+        else:
+            columns[name] = _TYPE_BY_CPP[field.cpp_type]
+
+
+def _infer_type(value) -> str:
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int64'
+    if isinstance(value, float):
+        return 'double'
+    return 'string'
+
+
+def _flatten(record: dict, prefix: str, row: dict) -> None:
+    for key, value in record.items():
+        if isinstance(value, dict):
+            _flatten(value, f"{prefix}{key}.", row)
+        else:
+            row[prefix + key] = value
+
+
+def _convert(values: list, column_type: str) -> list:
+    """Decoded dict values -> column values (int64 are strings in the dict, lists are stored as JSON)."""
+    result = []
+    append = result.append
+    for value in values:
+        if value is None:
+            append(None)
+            continue
+        try:
+            if column_type == 'string':
+                append(value if isinstance(value, str) else json.dumps(value))
+            elif column_type == 'double':
+                append(float(value))
+            elif column_type == 'bool':
+                append(bool(value))
+            else:
+                append(int(value))
+        except (TypeError, ValueError, OverflowError):
+            append(None)
+    return result
+
+
+class _TypeWriter:
+    """Open output file of one message type (parquet or pcol)."""
+    def __init__(self, path: str, file_format: str, compression: str):
+        self.path = path
+        self.file_format = file_format
+        self.compression = compression
+        self.opened = time.time()
+        self.columns = None
+        self.file = None
+        self.writer = None
+        self.row_groups = 0
+
+    def write(self, columns: Dict[str, str], data: Dict[str, list], rows: int) -> int:
+        self.columns = dict(columns)
+        if self.file_format == "parquet":
+            return self._write_parquet(columns, data)
+        return self._write_pcol(columns, data, rows)
+
+    def _write_parquet(self, columns, data) -> int:
+        types = {'int64': pyarrow.int64(), 'uint64': pyarrow.uint64(), 'double': pyarrow.float64(),
+                 'bool': pyarrow.bool_(), 'string': pyarrow.string()}
+        table = pyarrow.table({name: pyarrow.array(data[name], type=types[column_type])
+                               for name, column_type in columns.items()})
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, table.schema, compression=self.compression)
+        self.writer.write_table(table)
+        self.row_groups += 1
+        return table.nbytes
+
+    def _write_pcol(self, columns, data, rows: int) -> int:
+        compress = PCOL_CODECS[self.compression][0]
+        header = []
+        blocks = []
+        for name, column_type in columns.items():
+            values = data[name]
+            nulls = b''
+            if column_type == 'string':
+                block = json.dumps(values, ensure_ascii=False).encode('utf-8')
+            else:
+                if None in values:
+                    nulls = compress(bytes(value is None for value in values))
+                    default = False if column_type == 'bool' else 0
+                    values = [default if value is None else value for value in values]
+                if column_type == 'bool':
+                    block = bytes(values)
+                else:
+                    block = array(_ARRAY_CODES[column_type], values).tobytes()
+            block = compress(block)
+            header.append({'name': name, 'type': column_type, 'nulls': len(nulls), 'size': len(block)})
+            blocks.append(nulls)
+            blocks.append(block)
+        header = json.dumps({'rows': rows, 'codec': self.compression, 'byteorder': sys.byteorder,
+                             'columns': header}).encode('utf-8')
+        if self.file is None:
+            self.file = open(self.path, 'wb')
+            self.file.write(PCOL_MAGIC)
+        data = b''.join([struct.pack('>I', len(header)), header] + blocks)
+        self.file.write(data)
+        self.file.flush()
+        self.row_groups += 1
+        return len(data)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class ColumnarSink:
+    """Per message type columnar files for analytics (next to the NDJSON data file).
+
+    ``write()`` only queues the decoded dict; the writer thread flattens the
+    queued messages of each type into typed columns (column names and types from
+    the protobuf descriptors, dotted paths of nested messages) and writes them as
+    one row group when ``row_group_rows`` messages are queued or every
+    ``flush_interval`` seconds. Files are ``<directory>/<type>/<type>-<time>.parquet``
+    (pyarrow) or ``.pcol`` (built-in format, see ``read_pcol``) and rotate every
+    ``rotate_interval`` seconds.
+
+    Args:
+        directory (str): Output directory.
+        schema: Loaded streaming_telemetry_schema_pb2 module.
+        file_format (str): 'auto' (parquet if pyarrow is installed), 'parquet' or 'pcol'.
+        compression (str): parquet codec (zstd, snappy, gzip, ...) / pcol codec (zlib, lzma, none).
+        row_group_rows (int): Messages per row group.
+        flush_interval (float): Max seconds a message waits for its row group.
+        rotate_interval (float): Seconds after which a new file is started (parquet files are readable once closed).
+        max_queue_rows (int): ``write()`` drops messages while this many wait for the writer.
+    """
+    def __init__(self, directory: str, schema, file_format: str = "auto", compression: str = "zstd",
+                 row_group_rows: int = 10000, flush_interval: float = 60.0, rotate_interval: float = 3600.0,
+                 max_queue_rows: int = 1000000, logger=None):
+        if file_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Invalid columnar format. Choose one of: {', '.join(COLUMNAR_FORMATS)}")
+        if file_format == "auto":
+            file_format = "parquet" if pyarrow is not None else "pcol"
+        if file_format == "parquet" and pyarrow is None:
+            raise ValueError("parquet format requires pyarrow")
+        if file_format == "pcol" and compression not in PCOL_CODECS:
+            compression = "zlib"
+        self.directory = directory
+        self.schema = schema
+        self.file_format = file_format
+        self.compression = compression
+        self.row_group_rows = row_group_rows
+        self.flush_interval = flush_interval
+        self.rotate_interval = rotate_interval
+        self.max_queue_rows = max_queue_rows
+        self.logger = logger
+
+        self.pending: Dict[str, list] = {}
+        self.queued_rows = 0
+        self.cond = threading.Condition()
+        self.stopping = False
+        self.thread = None
+        self.writers: Dict[str, _TypeWriter] = {}
+        self.columns: Dict[str, Dict[str, str]] = {}
+
+        self.written_rows = 0
+        self.written_bytes = 0
+        self.row_groups = 0
+        self.dropped = 0
+
+    # -----------------------------------------------
+    # Producer side
+    def write(self, msg_type: Optional[str], record: dict) -> None:
+        if msg_type is None:
+            return
+        with self.cond:
+            if self.queued_rows >= self.max_queue_rows:
+                self.dropped += 1
+                return
+            rows = self.pending.get(msg_type)
+            if rows is None:
+                rows = self.pending[msg_type] = []
+            rows.append(record)
+            self.queued_rows += 1
+            if len(rows) >= self.row_group_rows:
+                self.cond.notify_all()
+
+    def start(self):
+        ensure_directory_exists(os.path.join(self.directory, ''))
+        self.thread = threading.Thread(target=self._run, name="columnar-sink", daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self, timeout=30):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def get_queue_rows(self) -> int:
+        return self.queued_rows
+
+    # -----------------------------------------------
+    # Writer thread
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            with self.cond:
+                full = [t for t, rows in self.pending.items() if len(rows) >= self.row_group_rows]
+                if not full and not self.stopping:
+                    self.cond.wait(max(self.flush_interval - (time.monotonic() - last_flush), 0.1))
+                stopping = self.stopping
+                due = stopping or time.monotonic() - last_flush >= self.flush_interval
+                batches = {}
+                for msg_type, rows in list(self.pending.items()):
+                    if due or len(rows) >= self.row_group_rows:
+                        batches[msg_type] = rows
+                        del self.pending[msg_type]
+                        self.queued_rows -= len(rows)
+            for msg_type, rows in batches.items():
+                for start in range(0, len(rows), self.row_group_rows):
+                    try:
+                        self._write_row_group(msg_type, rows[start:start + self.row_group_rows])
+                    except Exception as e:
+                        if self.logger:
+                            self.logger.error(f"columnar sink {msg_type} error: {str(e)}")
+            if due:
+                last_flush = time.monotonic()
+                self._rotate()
+            if stopping:
+                break
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
+
+    def _columns_for(self, msg_type: str) -> Dict[str, str]:
+        columns = self.columns.get(msg_type)
+        if columns is None:
+            columns = self.columns[msg_type] = schema_columns(self.schema, msg_type)
+        return columns
+
+    def _write_row_group(self, msg_type: str, records: List[dict]) -> None:
+        columns = self._columns_for(msg_type)
+        flat = []
+        for record in records:
+            row = {}
+            _flatten(record, '', row)
+            flat.append(row)
+            for name, value in row.items():
+                # fields outside the schema (ie. aggregate records) get an inferred column
+                if name not in columns and value is not None:
+                    columns[name] = _infer_type(value)
+        data = {name: _convert([row.get(name) for row in flat], column_type)
+                for name, column_type in columns.items()}
+        writer = self.writers.get(msg_type)
+        if writer is not None and writer.columns != columns and writer.file_format == "parquet":
+            # parquet files have one schema - new columns start a new file
+            writer.close()
+            writer = None
+        if writer is None:
+            writer = self.writers[msg_type] = self._open(msg_type)
+        self.written_bytes += writer.write(columns, data, len(flat))
+        self.written_rows += len(flat)
+        self.row_groups += 1
+
+    def _open(self, msg_type: str) -> _TypeWriter:
+        extension = "parquet" if self.file_format == "parquet" else "pcol"
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.directory, msg_type, f"{msg_type}-{stamp}.{extension}")
+        counter = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, msg_type, f"{msg_type}-{stamp}-{counter}.{extension}")
+            counter += 1
+        ensure_directory_exists(path)
+        return _TypeWriter(path, self.file_format, self.compression)
+
+    def _rotate(self) -> None:
+        now = time.time()
+        for msg_type, writer in list(self.writers.items()):
+            if self.rotate_interval and now - writer.opened >= self.rotate_interval:
+                writer.close()
+                del self.writers[msg_type]
+
+
+def read_pcol(path: str, columns: Optional[List[str]] = None) -> Iterator[Dict[str, list]]:
+    """Row groups of a .pcol file as {column: values} (only ``columns`` are decompressed, None - all)."""
+    wanted = set(columns) if columns is not None else None
+    with open(path, 'rb') as f:
+        if f.read(len(PCOL_MAGIC)) != PCOL_MAGIC:
+            raise ValueError(f"{path} is not a pcol file")
+        while True:
+            size = f.read(4)
+            if len(size) < 4:
+                return
+            header = json.loads(f.read(struct.unpack('>I', size)[0]))
+            decompress = PCOL_CODECS[header['codec']][1]
+            swap = header['byteorder'] != sys.byteorder
+            result = {}
+            for column in header['columns']:
+                if wanted is not None and column['name'] not in wanted:
+                    f.seek(column['nulls'] + column['size'], os.SEEK_CUR)
+                    continue
+                nulls = decompress(f.read(column['nulls'])) if column['nulls'] else None
+                block = decompress(f.read(column['size']))
+                column_type = column['type']
+                if column_type == 'string':
+                    values = json.loads(block)
+                elif column_type == 'bool':
+                    values = [bool(value) for value in block]
+                else:
+                    values = array(_ARRAY_CODES[column_type])
+                    values.frombytes(block)
+                    if swap:
+                        values.byteswap()
+                    values = values.tolist()
+                if nulls is not None:
+                    values = [None if null else value for value, null in zip(values, nulls)]
+                result[column['name']] = values
+            yield result
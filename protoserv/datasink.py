@@ -0,0 +1,209 @@
+import os
+import re
+import glob
+import gzip
+import lzma
+import time
+import threading
+from datetime import datetime, timedelta
+
+from .utils import ensure_directory_exists
+
+
+COMPRESSION_EXTENSIONS = {'none': '', 'gzip': '.gz', 'lzma': '.xz'}
+_UNITS = {'S': 1, 'M': 60, 'H': 3600, 'D': 86400}
+
+
+class DataSink:
+    """Asynchronous batched data file writer.
+
+    ``write()`` only queues the line; a dedicated writer thread joins everything
+    queued so far into one buffer and writes it with a single call (optionally
+    through a gzip/lzma stream). Files rotate by time (same ``when``/``interval``
+    values as TimedRotatingFileHandler) and/or by size.
+
+    Args:
+        filepath (str): Active file path (compression extension is appended).
+        when (str): Time rotation: 'S', 'M', 'H', 'D', 'midnight', 'W0'-'W6' or 'none'.
+        interval (int): Rotation interval in ``when`` units.
+        backup_count (int): Number of rotated files to keep (0 - keep all).
+        max_bytes (int): Rotate when the file would exceed this size (0 - no size rotation).
+        compression (str): 'none', 'gzip' or 'lzma'.
+        compression_level (int): gzip 1-9 / lzma preset 0-9.
+        batch_bytes (int): Writer wakes up when this many bytes are queued ...
+        flush_interval (float): ... or after this many seconds.
+        fsync_interval (float): fsync the file at most every N seconds (0 - never).
+        max_queue_bytes (int): ``write()`` blocks while this many bytes wait for the writer.
+    """
+    def __init__(self, filepath, when='midnight', interval=1, backup_count=10, max_bytes=0,
+                 compression='none', compression_level=6, batch_bytes=1024 * 1024, flush_interval=1.0,
+                 fsync_interval=0.0, max_queue_bytes=64 * 1024 * 1024):
+        if compression not in COMPRESSION_EXTENSIONS:
+            raise ValueError(f"Invalid compression. Choose one of: {', '.join(COMPRESSION_EXTENSIONS)}")
+        self.base_filepath = filepath
+        self.filepath = filepath + COMPRESSION_EXTENSIONS[compression]
+        self.when = when
+        self.interval = max(int(interval), 1)
+        self.backup_count = backup_count
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.compression_level = compression_level
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_queue_bytes = max_queue_bytes
+
+        self.queue = []
+        self.queued_bytes = 0
+        self.cond = threading.Condition()
+        self.stopping = False
+        self.thread = None
+        self.file = None
+        self.raw_file = None
+        self.file_size = 0
+        self.rollover_at = None
+        self.last_fsync = time.monotonic()
+
+        self.written_lines = 0
+        self.written_bytes = 0
+        self.batches = 0
+        self.rotations = 0
+
+    # -----------------------------------------------
+    # Producer side
+    def write(self, record) -> None:
+        line = record if isinstance(record, str) else str(record)
+        with self.cond:
+            while self.queued_bytes > self.max_queue_bytes and not self.stopping:
+                self.cond.wait()
+            self.queue.append(line)
+            self.queued_bytes += len(line) + 1
+            if self.queued_bytes >= self.batch_bytes:
+                self.cond.notify_all()
+
+    # logging.Logger compatible call used for the data logger
+    info = write
+
+    def start(self):
+        ensure_directory_exists(self.filepath)
+        self._open()
+        self.thread = threading.Thread(target=self._run, name="data-sink", daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self, timeout=10):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def get_queue_bytes(self) -> int:
+        return self.queued_bytes
+
+    # -----------------------------------------------
+    # Writer thread
+    def _run(self):
+        while True:
+            with self.cond:
+                if self.queued_bytes < self.batch_bytes and not self.stopping:
+                    self.cond.wait(self.flush_interval)
+                batch = self.queue
+                self.queue = []
+                self.queued_bytes = 0
+                stopping = self.stopping
+                self.cond.notify_all()
+            if batch:
+                batch.append('')
+                self._write("\n".join(batch).encode('utf-8'), len(batch) - 1)
+            elif self.rollover_at is not None and time.time() >= self.rollover_at:
+                self._rotate()
+            if self.fsync_interval > 0 and time.monotonic() - self.last_fsync >= self.fsync_interval:
+                self._fsync()
+            if stopping:
+                with self.cond:
+                    if self.queue:
+                        continue
+                break
+        self._close_file(fsync=self.fsync_interval > 0)
+
+    def _write(self, data: bytes, lines: int):
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            self._rotate()
+        elif self.max_bytes > 0 and self.file_size > 0 and self.file_size + len(data) > self.max_bytes:
+            self._rotate()
+        self.file.write(data)
+        self.file.flush()
+        # size of uncompressed data - compressed files rotate by amount of data written into them
+        self.file_size += len(data)
+        self.written_lines += lines
+        self.written_bytes += len(data)
+        self.batches += 1
+
+    def _fsync(self):
+        try:
+            self.raw_file.flush()
+            os.fsync(self.raw_file.fileno())
+        except (OSError, ValueError):
+            pass
+        self.last_fsync = time.monotonic()
+
+    # -----------------------------------------------
+    # File handling / rotation
+    def _open(self):
+        self.raw_file = open(self.filepath, 'ab')
+        if self.compression == 'gzip':
+            self.file = gzip.GzipFile(fileobj=self.raw_file, mode='ab', compresslevel=self.compression_level)
+        elif self.compression == 'lzma':
+            self.file = lzma.LZMAFile(self.raw_file, mode='ab', preset=self.compression_level)
+        else:
+            self.file = self.raw_file
+        self.file_size = os.path.getsize(self.filepath)
+        self.rollover_at = self._next_rollover(time.time())
+
+    def _close_file(self, fsync=False):
+        if self.file is not self.raw_file:
+            self.file.close()
+        if fsync:
+            self._fsync()
+        self.raw_file.close()
+
+    def _rotate(self):
+        self._close_file(fsync=self.fsync_interval > 0)
+        suffix = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        rotated = f"{self.base_filepath}.{suffix}{COMPRESSION_EXTENSIONS[self.compression]}"
+        counter = 1
+        while os.path.exists(rotated):
+            rotated = f"{self.base_filepath}.{suffix}.{counter}{COMPRESSION_EXTENSIONS[self.compression]}"
+            counter += 1
+        os.rename(self.filepath, rotated)
+        self.rotations += 1
+        self._remove_old_files()
+        self._open()
+
+    def _remove_old_files(self):
+        if self.backup_count <= 0:
+            return
+        pattern = re.compile(re.escape(os.path.basename(self.base_filepath)) + r"\.\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}")
+        rotated = [f for f in glob.glob(f"{glob.escape(self.base_filepath)}.*") if pattern.match(os.path.basename(f))]
+        rotated.sort(key=os.path.getmtime)
+        for filepath in rotated[:-self.backup_count]:
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
+
+    def _next_rollover(self, now: float):
+        when = (self.when or 'none').upper()
+        if when == 'NONE':
+            return None
+        if when in _UNITS:
+            return now + _UNITS[when] * self.interval
+        today = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        if when == 'MIDNIGHT':
+            return (today + timedelta(days=self.interval)).timestamp()
+        if when.startswith('W') and when[1:].isdigit():
+            days = (int(when[1:]) - today.weekday()) % 7 or 7
+            return (today + timedelta(days=days + 7 * (self.interval - 1))).timestamp()
+        raise ValueError(f"Invalid rollover interval specified: {self.when}")
@@ -0,0 +1,232 @@
+import os
+import time
+import heapq
+import logging
+import threading
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from . import decoder
+from .gcpolicy import GCPolicy
+from .transcoder import Transcoder
+
+
+# -----------------------------------------------
+# Worker process side
+_schema = None
+_transcoder = None
+_context = None
+
+def _worker_init(proto_dir: str, transcoder: str, reuse_limit: int = decoder.DECODE_REUSE_LIMIT,
+                 gc_threshold: Tuple[int, ...] = (), gc_freeze: bool = False):
+    global _schema, _transcoder, _context
+    _schema = decoder.load_schema(proto_dir)
+    if transcoder == "fast":
+        _transcoder = Transcoder(_schema)
+    _context = decoder.DecodeContext(_schema, reuse_limit)
+    policy = GCPolicy(gc_threshold, freeze=gc_freeze).install()
+    if gc_freeze:
+        policy.freeze()
+
+def _worker_decode(stream_mode: str, batch: List[Tuple[int, bytes]]) -> List[Tuple[int, object]]:
+    results = []
+    for key, frame in batch:
+        try:
+            message = decoder.parse_frame(_schema, frame, stream_mode, _context)
+            if _transcoder is not None:
+                results.append((key, _transcoder.message_to_dict(message, _context)))
+            else:
+                results.append((key, decoder.message_to_dict(_schema, message, _context)))
+        except Exception as e:
+            results.append((key, DecodeError(str(e))))
+    return results
+
+
+class DecodeError(Exception):
+    pass
+
+
+# -----------------------------------------------
+class ReorderWindow:
+    """Releases decoded results in key (seq_num) order.
+
+    Keys are registered with ``expect()`` when a frame is submitted. A completed
+    result is released once no smaller key is still being decoded, so gaps in
+    seq_num never stall the stream. If more than ``max_size`` results are held
+    back, the smallest one is released anyway.
+    """
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self.ready = []
+        self.in_flight = []
+        self.in_flight_count = Counter()
+        self.counter = 0
+
+    def __len__(self) -> int:
+        return len(self.ready)
+
+    def expect(self, key: int) -> None:
+        heapq.heappush(self.in_flight, key)
+        self.in_flight_count[key] += 1
+
+    def push(self, key: int, item) -> list:
+        self.in_flight_count[key] -= 1
+        if self.in_flight_count[key] <= 0:
+            del self.in_flight_count[key]
+        # drop completed keys from the top of the in-flight heap (lazy delete)
+        while self.in_flight and self.in_flight[0] not in self.in_flight_count:
+            heapq.heappop(self.in_flight)
+
+        self.counter += 1
+        heapq.heappush(self.ready, (key, self.counter, item))
+
+        released = []
+        while self.ready:
+            head_key = self.ready[0][0]
+            if self.in_flight and head_key > self.in_flight[0] and len(self.ready) <= self.max_size:
+                break
+            released.append(heapq.heappop(self.ready)[2])
+        return released
+
+
+class _Session:
+    __slots__ = ('window', 'lock', 'cond', 'pending', 'emit_lock', 'on_ready')
+
+    def __init__(self, window_size: int):
+        self.window = ReorderWindow(window_size)
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.emit_lock = threading.Lock()
+        self.pending = 0
+        # non-blocking submit: called once the window has room again
+        self.on_ready = None
+
+
+class DecodePool:
+    """Process pool decode stage.
+
+    Frames are decoded in ``workers`` processes (``batch_size`` frames per task)
+    using streaming_telemetry_schema_pb2 loaded from ``proto_dir``. Results are
+    passed to ``on_result(session_id, result, frame)`` in key order through a bounded
+    reorder window per session. ``result`` is a dict or ``DecodeError``, ``frame``
+    is the submitted frame payload.
+
+    ``transcoder`` selects dict conversion in workers: 'fast' (Transcoder) or 'json_format' (MessageToDict).
+
+    ``submit`` blocks while a session already has ``reorder_window`` frames in flight.
+    Callers that must not block (asyncio event loop) pass ``on_ready``: frames are
+    always queued, ``submit`` returns False when the window is full and
+    ``on_ready(session_id)`` is called from a pool thread once it has room again.
+
+    ``on_batch(session_id, count, elapsed)`` (optional) is called for every decoded
+    batch with the submit -> result time in seconds.
+
+    Workers parse into reused message instances (``reuse_limit`` parses each, see
+    decoder.DecodeContext) and apply ``gc_threshold``/``gc_freeze`` after start-up.
+    """
+    def __init__(self, proto_dir: str, on_result: Callable, workers: int = 0, batch_size: int = 64,
+                 reorder_window: int = 4096, transcoder: str = "fast", logger=None, on_batch: Callable = None,
+                 reuse_limit: int = decoder.DECODE_REUSE_LIMIT, gc_threshold: Tuple[int, ...] = (),
+                 gc_freeze: bool = False):
+        self.proto_dir = proto_dir
+        self.transcoder = transcoder
+        self.reuse_limit = reuse_limit
+        self.gc_threshold = tuple(gc_threshold)
+        self.gc_freeze = gc_freeze
+        self.on_result = on_result
+        self.on_batch = on_batch
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.batch_size = max(int(batch_size), 1)
+        self.reorder_window = max(int(reorder_window), self.batch_size)
+        self.logger = logger if logger else logging.getLogger('logger')
+        self.executor = None
+        self.sessions = {}
+        self.sessions_lock = threading.Lock()
+
+    def start(self):
+        # spawn - the server process is multi-threaded, fork is not safe here
+        self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                            mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_worker_init,
+                                            initargs=(self.proto_dir, self.transcoder, self.reuse_limit,
+                                                      self.gc_threshold, self.gc_freeze))
+        self.logger.info(f"decode pool: {self.workers} workers | batch size: {self.batch_size} | reorder window: {self.reorder_window}")
+
+    def shutdown(self, wait=True):
+        if self.executor:
+            self.executor.shutdown(wait=wait, cancel_futures=not wait)
+            self.executor = None
+
+    def _session(self, session_id) -> _Session:
+        session = self.sessions.get(session_id)
+        if session is None:
+            with self.sessions_lock:
+                session = self.sessions.setdefault(session_id, _Session(self.reorder_window))
+        return session
+
+    def destroy_session(self, session_id):
+        with self.sessions_lock:
+            self.sessions.pop(session_id, None)
+
+    def get_pending(self, session_id) -> int:
+        session = self.sessions.get(session_id)
+        return session.pending if session else 0
+
+    def submit(self, session_id, stream_mode: str, items: List[Tuple[int, bytes]],
+               on_ready: Optional[Callable] = None) -> bool:
+        """Queues ``(key, frame)`` pairs of one session for decode (frames must be picklable bytes).
+
+        Without ``on_ready`` it waits for room in the reorder window. With it, it never waits and
+        returns False if the window is full - ``on_ready(session_id)`` follows when it is not.
+        """
+        session = self._session(session_id)
+        for i in range(0, len(items), self.batch_size):
+            batch = items[i:i + self.batch_size]
+            with session.cond:
+                while on_ready is None and session.pending + len(batch) > self.reorder_window and session.pending > 0:
+                    session.cond.wait()
+                session.pending += len(batch)
+                for key, _ in batch:
+                    session.window.expect(key)
+            future = self.executor.submit(_worker_decode, stream_mode, batch)
+            future.add_done_callback(lambda f, s=session_id, ss=session, b=batch, t=time.perf_counter(): self._done(s, ss, b, f, t))
+        if on_ready is None:
+            return True
+        with session.cond:
+            if session.pending + self.batch_size <= self.reorder_window:
+                return True
+            session.on_ready = on_ready
+            return False
+
+    def _done(self, session_id, session: _Session, batch, future, submitted=None):
+        try:
+            results = future.result()
+        except Exception as e:
+            results = [(key, DecodeError(str(e))) for key, _ in batch]
+        if self.on_batch and submitted is not None:
+            self.on_batch(session_id, len(batch), time.perf_counter() - submitted)
+        frames = [frame for _, frame in batch]
+
+        # emit_lock keeps results of one session serialized across callback threads
+        with session.emit_lock:
+            with session.cond:
+                released = []
+                for (key, result), frame in zip(results, frames):
+                    released.extend(session.window.push(key, (result, frame)))
+                session.pending -= len(results)
+                session.cond.notify_all()
+                on_ready = None
+                if session.on_ready is not None and session.pending + self.batch_size <= self.reorder_window:
+                    on_ready, session.on_ready = session.on_ready, None
+            for result, frame in released:
+                try:
+                    self.on_result(session_id, result, frame)
+                except Exception as e:
+                    self.logger.error(f"decode pool on_result error: {str(e)}")
+        if on_ready is not None:
+            try:
+                on_ready(session_id)
+            except Exception as e:
+                self.logger.error(f"decode pool on_ready error: {str(e)}")
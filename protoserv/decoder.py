@@ -0,0 +1,263 @@
+import sys
+import json
+import importlib
+
+from google.protobuf.json_format import MessageToDict
+
+from .wirescan import scanner_for
+
+
+SCHEMA_MODULE = 'streaming_telemetry_schema_pb2'
+
+
+def load_schema(proto_dir: str):
+    """Imports streaming_telemetry_schema_pb2 generated for one Apstra version (proto/<version>)."""
+    if proto_dir not in sys.path:
+        sys.path.append(proto_dir)
+    return importlib.import_module(SCHEMA_MODULE)
+
+
+# Parses into one reused message instance before it is replaced (0 - no reuse)
+DECODE_REUSE_LIMIT = 1024
+
+
+class DecodeContext:
+    """Reused protobuf message instances of one decoding thread (or decode worker process).
+
+    ``ParseFromString`` clears the message before parsing, so the same
+    AosSequencedMessage/AosMessage instances serve every frame instead of new
+    message objects per frame (and per nested ``aos_proto``). The upb backend
+    keeps the memory of every parse in the message arena until the message is
+    freed, so an instance is replaced after ``reuse_limit`` parses.
+
+    A parsed message is only valid until the next parse of the same kind - convert
+    it to dict before that. Not thread safe: one context per thread.
+
+    Args:
+        schema: Loaded streaming_telemetry_schema_pb2 module.
+        reuse_limit (int): Parses per instance (0 - new message for every parse).
+    """
+    __slots__ = ('schema', 'reuse_limit', 'instances', 'uses', 'parses', 'created')
+
+    def __init__(self, schema, reuse_limit: int = DECODE_REUSE_LIMIT):
+        self.schema = schema
+        self.reuse_limit = reuse_limit
+        # sequenced / unsequenced (also nested aos_proto) message instances and their parse counts
+        self.instances = {}
+        self.uses = {}
+        # Stats
+        self.parses = 0
+        self.created = 0
+
+    def message(self, stream_mode: str):
+        """Cleared message instance for the stream mode ('sequenced' or 'unsequenced')."""
+        uses = self.uses.get(stream_mode, 0)
+        message = self.instances.get(stream_mode)
+        if message is None or uses >= self.reuse_limit:
+            if stream_mode == "sequenced":
+                message = self.schema.AosSequencedMessage()
+            elif stream_mode == "unsequenced":
+                message = self.schema.AosMessage()
+            else:
+                raise ValueError(f"Unknown stream mode: {stream_mode}")
+            self.instances[stream_mode] = message
+            self.created += 1
+            uses = 0
+        self.uses[stream_mode] = uses + 1
+        self.parses += 1
+        return message
+
+    def parse(self, msg, stream_mode: str):
+        message = self.message(stream_mode)
+        message.ParseFromString(msg)
+        return message
+
+
+def message_to_dict(schema, message, context: DecodeContext = None) -> dict:
+    """Converts AosMessage/AosSequencedMessage into dict (nested aos_proto is unpacked, seq_num injected).
+
+    With a ``context`` the nested AosMessage is parsed into its reused instance.
+    """
+    result_dict = MessageToDict(message, preserving_proto_field_name=True)
+
+    if 'aos_proto' in result_dict and 'seq_num' in result_dict:
+        nested_message = parse_frame(schema, message.aos_proto, "unsequenced", context)
+        seq = result_dict['seq_num']
+        # nested AosMessage has no aos_proto - converted directly, not through the (span wrapped) message_to_dict
+        result_dict = MessageToDict(nested_message, preserving_proto_field_name=True)
+        result_dict['seq_num'] = seq
+
+    if 'seq_num' not in result_dict:
+        result_dict['seq_num'] = 0
+
+    return result_dict
+
+
+def parse_frame(schema, msg, stream_mode: str, context: DecodeContext = None):
+    """Parses single frame payload into AosSequencedMessage ('sequenced') or AosMessage ('unsequenced').
+
+    With a ``context`` the message instance is reused (valid until the next parse_frame with that context).
+    """
+    if context is not None and context.reuse_limit > 0:
+        return context.parse(msg, stream_mode)
+    if stream_mode == "sequenced":
+        message = schema.AosSequencedMessage()
+    elif stream_mode == "unsequenced":
+        message = schema.AosMessage()
+    else:
+        raise ValueError(f"Unknown stream mode: {stream_mode}")
+    message.ParseFromString(msg)
+    return message
+
+
+_message_type_names = {}
+
+def message_type_names(schema) -> frozenset:
+    """Names of the top-level AosMessage oneof members (perf_mon, alert, event, ...)."""
+    names = _message_type_names.get(schema.__name__)
+    if names is None:
+        descriptor = schema.AosMessage.DESCRIPTOR
+        names = frozenset(field.name for oneof in descriptor.oneofs for field in oneof.fields)
+        _message_type_names[schema.__name__] = names
+    return names
+
+
+def field_is_repeated(field) -> bool:
+    # FieldDescriptor.label was replaced by is_repeated in newer protobuf releases
+    is_repeated = getattr(field, 'is_repeated', None)
+    if is_repeated is not None:
+        return is_repeated
+    return field.label == field.LABEL_REPEATED
+
+
+def field_is_map(field) -> bool:
+    """map<key, value> field (repeated message of a map entry type)."""
+    return (field.type == field.TYPE_MESSAGE
+            and field.message_type.has_options
+            and field.message_type.GetOptions().map_entry)
+
+
+class DecodedMessage:
+    """Per message decode context shared by all outputs (debug log, data file, websocket).
+
+    The frame is parsed once and converted to dict once - only when some output asks
+    for it. Serialized forms are built lazily on first use and cached.
+
+    Args:
+        schema: Loaded streaming_telemetry_schema_pb2 module.
+        raw: Frame payload (bytes/memoryview) without the 2 byte length prefix.
+        stream_mode (str): 'sequenced' or 'unsequenced'.
+        source (str): Value of the injected 'source' key (``None`` - not injected).
+        result_dict (dict): Already decoded dict (ie. from the decode worker pool).
+        transcoder (Transcoder): Fast dict converter (``None`` - use MessageToDict).
+        msg_type (str): Message type already known from the wire scan.
+        context (DecodeContext): Reused message instances of the decoding thread - the parsed
+            message is dropped once the dict is built.
+    """
+    __slots__ = ('schema', 'raw', 'stream_mode', 'source', 'transcoder', 'context', '_message', '_dict', '_json',
+                 '_json4', '_msg_type')
+
+    def __init__(self, schema, raw=None, stream_mode: str = None, source: str = None, result_dict: dict = None,
+                 transcoder=None, msg_type: str = None, context: DecodeContext = None):
+        self.schema = schema
+        self.transcoder = transcoder
+        self.context = context
+        self.raw = raw
+        self.stream_mode = stream_mode
+        self.source = source
+        self._message = None
+        self._dict = None
+        self._json = None
+        self._json4 = None
+        self._msg_type = msg_type
+        if result_dict is not None:
+            self._set_dict(result_dict)
+
+    def _set_dict(self, result_dict: dict):
+        if self.source is not None:
+            result_dict['source'] = self.source
+        self._dict = result_dict
+
+    @property
+    def message(self):
+        if self._message is None:
+            self._message = parse_frame(self.schema, self.raw, self.stream_mode, self.context)
+        return self._message
+
+    @property
+    def dict(self) -> dict:
+        if self._dict is None:
+            self.decode()
+        return self._dict
+
+    def decode(self) -> None:
+        """Parses the frame and converts it to dict (the 'decode' diagnostics span)."""
+        if self.transcoder is not None:
+            self._set_dict(self.transcoder.message_to_dict(self.message, self.context))
+        else:
+            self._set_dict(message_to_dict(self.schema, self.message, self.context))
+        if self.context is not None:
+            # the instance is parsed again for the next frame of the context
+            self._message = None
+
+    def serialize(self, indent: int = None) -> str:
+        """JSON of the decoded dict (the 'serialize' diagnostics span)."""
+        return json.dumps(self.dict, indent=indent)
+
+    @property
+    def msg_type(self) -> str:
+        """Top-level AosMessage oneof member set in this message (``None`` if unknown).
+
+        Taken from the decoded dict if there is one, otherwise from the frame bytes (no parse).
+        """
+        if self._msg_type is None:
+            if self._dict is None and self.raw is not None and self.stream_mode is not None:
+                try:
+                    self._msg_type = scanner_for(self.schema).msg_type(self.raw, self.stream_mode)
+                except (ValueError, IndexError):
+                    pass
+            if self._msg_type is None:
+                names = message_type_names(self.schema)
+                for key in self.dict:
+                    if key in names:
+                        self._msg_type = key
+                        break
+        return self._msg_type
+
+    @property
+    def json(self) -> str:
+        if self._json is None:
+            self._json = self.serialize()
+        return self._json
+
+    @property
+    def json4(self) -> str:
+        if self._json4 is None:
+            self._json4 = self.serialize(indent=4)
+        return self._json4
+
+    @property
+    def bytes(self) -> bytes:
+        if self.raw is None:
+            raise ValueError("raw frame is not available")
+        if not isinstance(self.raw, bytes):
+            self.raw = bytes(self.raw)
+        return self.raw
+
+    @property
+    def frame(self) -> bytes:
+        """Raw payload with the 2 byte length prefix (as received from Apstra)."""
+        payload = self.bytes
+        return len(payload).to_bytes(2, 'big') + payload
+
+    def get(self, output_type: str = "dict"):
+        """Returns the message in output_type: 'dict', 'json', 'json4' or 'raw'."""
+        if output_type == "json":
+            return self.json
+        elif output_type == "json4":
+            return self.json4
+        elif output_type == "dict":
+            return self.dict
+        elif output_type == "raw":
+            return self.bytes
+        raise ValueError("Invalid output_type. Choose either 'dict', 'json', 'json4' or 'raw'.")
@@ -0,0 +1,356 @@
+import os
+import sys
+import time
+import pstats
+import signal
+import cProfile
+import logging
+import threading
+import tracemalloc
+import inspect
+import functools
+from array import array
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from .utils import ensure_directory_exists
+
+
+PROFILE_MODES = ("sampling", "cprofile")
+
+
+def _timestamp() -> str:
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SpanRecorder:
+    """Per-stage timing spans.
+
+    Stages are functions/methods registered with ``add()``. ``enable()`` replaces
+    them with timed wrappers and ``disable()`` puts the originals back, so there is
+    no cost at all while spans are off. At most ``max_spans`` spans per stage are kept.
+    """
+    def __init__(self, max_spans: int = 1000000):
+        self.max_spans = max_spans
+        self.targets = []
+        self.originals = []
+        self.spans: Dict[str, array] = {}
+        self.started = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.originals)
+
+    def add(self, stage: str, owner, attribute: str) -> None:
+        self.targets.append((stage, owner, attribute))
+
+    def _wrap(self, stage: str, function: Callable) -> Callable:
+        spans = self.spans.setdefault(stage, array('d'))
+        max_spans = self.max_spans
+        perf_counter = time.perf_counter
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def timed(*args, **kwargs):
+                t0 = perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    if len(spans) < max_spans:
+                        spans.append(perf_counter() - t0)
+        else:
+            @functools.wraps(function)
+            def timed(*args, **kwargs):
+                t0 = perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    if len(spans) < max_spans:
+                        spans.append(perf_counter() - t0)
+        return timed
+
+    def enable(self) -> None:
+        if self.enabled:
+            return
+        self.spans = {}
+        self.started = time.time()
+        for stage, owner, attribute in self.targets:
+            original = getattr(owner, attribute)
+            self.originals.append((owner, attribute, original, attribute in vars(owner)))
+            setattr(owner, attribute, self._wrap(stage, original))
+
+    def disable(self) -> None:
+        for owner, attribute, original, own_attribute in reversed(self.originals):
+            if own_attribute:
+                setattr(owner, attribute, original)
+            else:
+                # bound method wrapped on the instance - drop the override
+                delattr(owner, attribute)
+        self.originals = []
+
+    def write(self, prefix: str) -> List[str]:
+        """Writes ``<prefix>.txt`` (per stage summary) and ``<prefix>.csv`` (all spans)."""
+        lines = [f"spans from {datetime.fromtimestamp(self.started or time.time())} ({time.time() - (self.started or time.time()):.1f} s)",
+                 f"{'stage'.ljust(20)} {'count':>10} {'total s':>10} {'avg us':>10} {'p50 us':>10} {'p99 us':>10} {'max us':>10}"]
+        with open(prefix + '.csv', 'w') as f:
+            f.write("stage,seconds\n")
+            for stage, spans in self.spans.items():
+                values = sorted(spans)
+                if not values:
+                    continue
+                f.writelines(f"{stage},{value:.9f}\n" for value in spans)
+                count = len(values)
+                lines.append(f"{stage.ljust(20)} {count:>10} {sum(values):>10.3f} {sum(values) / count * 1e6:>10.1f}"
+                             f" {values[count // 2] * 1e6:>10.1f} {values[min(int(count * 0.99), count - 1)] * 1e6:>10.1f}"
+                             f" {values[-1] * 1e6:>10.1f}")
+        with open(prefix + '.txt', 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        return [prefix + '.txt', prefix + '.csv']
+
+
+class Diagnostics:
+    """Runtime triggered diagnostics - results are written to files in ``output_dir``.
+
+    - profile: time boxed statistical sampling of all threads (``sys._current_frames``,
+      collapsed stacks for flamegraph.pl + top functions) or cProfile of the thread
+      ``profile_call`` runs callables in (event loop thread)
+    - spans: per-stage timing spans (``SpanRecorder``) for a time box
+    - memory: tracemalloc snapshot; every following call writes a diff against the
+      previous one together with ``state()`` (sizes of server buffers/dicts)
+
+    Args:
+        output_dir (str): Directory for result files.
+        duration (float): Default profile/spans time box in seconds.
+        sample_interval (float): Sampling profiler interval in seconds.
+        profile_call (callable): ``profile_call(fn)`` runs fn in the thread to cProfile.
+        state (callable): Returns dict of sizes tracked between memory snapshots.
+    """
+    def __init__(self, output_dir="log/diagnostics", duration=30.0, sample_interval=0.005,
+                 profile_call: Optional[Callable] = None, state: Optional[Callable] = None,
+                 tracemalloc_frames: int = 5, logger=None):
+        self.output_dir = output_dir
+        self.duration = duration
+        self.sample_interval = sample_interval
+        self.profile_call = profile_call
+        self.state = state
+        self.tracemalloc_frames = tracemalloc_frames
+        self.logger = logger if logger else logging.getLogger('logger')
+        self.spans = SpanRecorder()
+        self.lock = threading.Lock()
+        self.memory_lock = threading.Lock()
+        self.profiling = False
+        self.baseline = None
+        self.baseline_state = None
+
+    def _path(self, name: str) -> str:
+        return ensure_directory_exists(os.path.join(self.output_dir, f"{name}-{_timestamp()}"))
+
+    def _background(self, target, *args):
+        threading.Thread(target=target, args=args, name="diagnostics", daemon=True).start()
+
+    # -----------------------------------------------
+    # Triggers
+    def install_signals(self):
+        """SIGUSR1 - profile + spans for ``duration`` seconds, SIGUSR2 - memory snapshot/diff."""
+        signal.signal(signal.SIGUSR1, lambda sig, frame: self.capture())
+        signal.signal(signal.SIGUSR2, lambda sig, frame: self.memory())
+
+    def handle_command(self, control: dict) -> dict:
+        """WebSocket control: ``{"action": "diagnostics", "command": "profile", "mode": "sampling", "duration": 10}``.
+
+        Commands: capture (profile + spans), profile, spans, memory, memory_stop, status.
+        """
+        command = control.get('command', 'status')
+        duration = float(control.get('duration', self.duration))
+        if command == 'capture':
+            result = self.capture(duration, control.get('mode', 'sampling'))
+        elif command == 'profile':
+            result = self.profile(duration, control.get('mode', 'sampling'))
+        elif command == 'spans':
+            result = self.start_spans(duration)
+        elif command == 'memory':
+            result = self.memory()
+        elif command == 'memory_stop':
+            result = self.memory_stop()
+        elif command == 'status':
+            result = {'profiling': self.profiling, 'spans': self.spans.enabled, 'tracemalloc': tracemalloc.is_tracing(),
+                      'output_dir': self.output_dir}
+        else:
+            raise ValueError(f"unknown diagnostics command '{command}'")
+        return {'action': 'diagnostics', 'command': command, **result}
+
+    def capture(self, duration: float = None, mode: str = "sampling") -> dict:
+        result = self.profile(duration, mode)
+        result.update(self.start_spans(duration))
+        return result
+
+    # -----------------------------------------------
+    # Profiling
+    def profile(self, duration: float = None, mode: str = "sampling") -> dict:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"unknown profile mode '{mode}' - supported: {', '.join(PROFILE_MODES)}")
+        if mode == "cprofile" and self.profile_call is None:
+            raise ValueError("cprofile mode is not available")
+        with self.lock:
+            if self.profiling:
+                return {'profile': 'already running'}
+            self.profiling = True
+        duration = duration or self.duration
+        self.logger.info(f"diagnostics: {mode} profile for {duration} s")
+        if mode == "sampling":
+            self._background(self._sample, duration)
+        else:
+            self._background(self._cprofile, duration)
+        return {'profile': mode, 'duration': duration}
+
+    def _sample(self, duration: float):
+        prefix = self._path("profile")
+        me = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        try:
+            end = time.monotonic() + duration
+            while time.monotonic() < end:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_name(frame.f_code))
+                        frame = frame.f_back
+                    stack.append(names.get(ident, str(ident)))
+                    stacks[tuple(reversed(stack))] += 1
+                samples += 1
+                time.sleep(self.sample_interval)
+            self._write_samples(prefix, stacks, samples, duration)
+        except Exception as e:
+            self.logger.error(f"diagnostics: sampling error: {str(e)}")
+        finally:
+            self.profiling = False
+
+    def _write_samples(self, prefix: str, stacks: Counter, samples: int, duration: float):
+        # flamegraph.pl / speedscope collapsed stacks
+        with open(prefix + '.collapsed', 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(";".join(frame.replace(';', ':') for frame in stack) + f" {count}\n")
+        # per thread: functions by self (top of stack) and inclusive samples
+        threads = {}
+        for stack, count in stacks.items():
+            thread = threads.setdefault(stack[0], {'total': 0, 'self': Counter(), 'inclusive': Counter()})
+            thread['total'] += count
+            if len(stack) > 1:
+                thread['self'][stack[-1]] += count
+            for frame in set(stack[1:]):
+                thread['inclusive'][frame] += count
+        lines = [f"sampling profile: {samples} samples every {self.sample_interval * 1000:.1f} ms over {duration} s"]
+        for name, thread in sorted(threads.items(), key=lambda item: -item[1]['total']):
+            lines.append("")
+            lines.append(f"thread: {name} ({thread['total']} samples)")
+            lines.append("  self:")
+            lines.extend(f"    {count:>8} {100 * count / thread['total']:5.1f}%  {frame}" for frame, count in thread['self'].most_common(15))
+            lines.append("  inclusive:")
+            lines.extend(f"    {count:>8} {100 * count / thread['total']:5.1f}%  {frame}" for frame, count in thread['inclusive'].most_common(25))
+        with open(prefix + '.txt', 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        self.logger.info(f"diagnostics: profile written to {prefix}.txt / {prefix}.collapsed")
+
+    def _cprofile(self, duration: float):
+        prefix = self._path("cprofile")
+        profiler = cProfile.Profile()
+        done = threading.Event()
+
+        def stop():
+            try:
+                profiler.disable()
+                profiler.dump_stats(prefix + '.pstats')
+                with open(prefix + '.txt', 'w') as f:
+                    pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(60)
+                self.logger.info(f"diagnostics: cProfile written to {prefix}.txt / {prefix}.pstats")
+            except Exception as e:
+                self.logger.error(f"diagnostics: cProfile error: {str(e)}")
+            finally:
+                done.set()
+
+        try:
+            self.profile_call(profiler.enable)
+            time.sleep(duration)
+            self.profile_call(stop)
+            done.wait(duration + 30)
+        finally:
+            self.profiling = False
+
+    # -----------------------------------------------
+    # Timing spans
+    def start_spans(self, duration: float = None) -> dict:
+        if self.spans.enabled:
+            return {'spans': 'already running'}
+        duration = duration or self.duration
+        self.spans.enable()
+        self.logger.info(f"diagnostics: timing spans for {duration} s")
+        timer = threading.Timer(duration, self.stop_spans)
+        timer.daemon = True
+        timer.start()
+        return {'spans': [target[0] for target in self.spans.targets], 'duration': duration}
+
+    def stop_spans(self) -> dict:
+        if not self.spans.enabled:
+            return {'spans': 'not running'}
+        self.spans.disable()
+        files = self.spans.write(self._path("spans"))
+        self.logger.info(f"diagnostics: spans written to {files[0]}")
+        return {'files': files}
+
+    # -----------------------------------------------
+    # Memory
+    def memory(self) -> dict:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+            self.baseline = None
+        self._background(self._memory_snapshot)
+        return {'memory': 'diff' if self.baseline is not None else 'baseline'}
+
+    def memory_stop(self) -> dict:
+        tracemalloc.stop()
+        self.baseline = None
+        self.baseline_state = None
+        return {'memory': 'stopped'}
+
+    def _memory_snapshot(self):
+        with self.memory_lock:
+            try:
+                snapshot = tracemalloc.take_snapshot().filter_traces((
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+                ))
+                state = self.state() if self.state else {}
+                if self.baseline is not None:
+                    self._write_memory_diff(snapshot, state)
+                else:
+                    self.logger.info("diagnostics: tracemalloc baseline taken")
+                self.baseline = snapshot
+                self.baseline_state = state
+            except Exception as e:
+                self.logger.error(f"diagnostics: tracemalloc error: {str(e)}")
+
+    def _write_memory_diff(self, snapshot, state: dict):
+        prefix = self._path("memory")
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"tracemalloc: current {current / 1048576:.1f} MiB | peak {peak / 1048576:.1f} MiB", "", "state (previous -> current):"]
+        for key, value in state.items():
+            previous = self.baseline_state.get(key) if self.baseline_state else None
+            lines.append(f"  {key.ljust(30)} {previous} -> {value}")
+        lines.extend(["", "top growth by line:"])
+        lines.extend(f"  {stat}" for stat in snapshot.compare_to(self.baseline, 'lineno')[:40])
+        lines.extend(["", "top growth by traceback:"])
+        for stat in snapshot.compare_to(self.baseline, 'traceback')[:10]:
+            lines.append(f"  {stat.size_diff / 1024:+.1f} KiB {stat.count_diff:+d} blocks")
+            lines.extend(f"      {line}" for line in stat.traceback.format())
+        with open(prefix + '.txt', 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        self.logger.info(f"diagnostics: memory diff written to {prefix}.txt")
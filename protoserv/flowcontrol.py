@@ -0,0 +1,171 @@
+import time
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+
+OVERLOAD_POLICIES = ("pause", "disconnect", "none")
+
+
+class _SessionFlow:
+    __slots__ = ('size', 'over', 'paused', 'paused_since', 'paused_seconds', 'pauses', 'last_paused',
+                 'disconnect', 'on_pause', 'on_resume', 'on_disconnect')
+
+    def __init__(self, on_pause=None, on_resume=None, on_disconnect=None):
+        self.size = 0
+        self.over = False
+        self.paused = False
+        self.paused_since = 0.0
+        self.paused_seconds = 0.0
+        self.pauses = 0
+        # epoch time of the last pause (metrics)
+        self.last_paused = 0.0
+        self.disconnect = False
+        self.on_pause = on_pause
+        self.on_resume = on_resume
+        self.on_disconnect = on_disconnect
+
+    def paused_total(self, now: float) -> float:
+        return self.paused_seconds + (now - self.paused_since if self.paused else 0.0)
+
+
+class FlowControl:
+    """Per-session and global memory budgets of the session buffers.
+
+    ``update(session_id, size)`` is called with the unread size of the session
+    buffer after every append/consume. A session goes over budget above
+    ``session_high`` and is back under it at ``session_low``; all sessions are over
+    budget while the total is above ``global_high`` (until it drops to ``global_low``).
+
+    Overload policies:
+        pause - stop reading the socket (TCP flow control pushes back on Apstra)
+        disconnect - close the connection of the session that went over budget
+        none - only account (metrics), never act
+
+    Thread per connection readers call ``wait(session_id)`` before every recv;
+    asyncio sessions pass ``on_pause``/``on_resume`` (transport pause/resume_reading).
+    """
+    def __init__(self, session_high=64 * 1024 * 1024, session_low=32 * 1024 * 1024,
+                 global_high=512 * 1024 * 1024, global_low=384 * 1024 * 1024, policy="pause", logger=None):
+        if policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"Invalid overload policy. Choose one of: {', '.join(OVERLOAD_POLICIES)}")
+        self.session_high = session_high
+        self.session_low = min(session_low, session_high)
+        self.global_high = global_high
+        self.global_low = min(global_low, global_high)
+        self.policy = policy
+        self.logger = logger if logger else logging.getLogger('logger')
+        self.sessions: Dict[object, _SessionFlow] = {}
+        self.total = 0
+        self.global_over = False
+        self.global_overloads = 0
+        self.cond = threading.Condition()
+
+    # -----------------------------------------------
+    def register(self, session_id, on_pause: Optional[Callable] = None, on_resume: Optional[Callable] = None,
+                 on_disconnect: Optional[Callable] = None) -> None:
+        with self.cond:
+            self.sessions[session_id] = _SessionFlow(on_pause, on_resume, on_disconnect)
+
+    def unregister(self, session_id) -> None:
+        actions = []
+        with self.cond:
+            flow = self.sessions.pop(session_id, None)
+            if flow is not None:
+                self.total -= flow.size
+                if self._update_global():
+                    # a closed session can bring the total back under the global budget
+                    for sid, session_flow in self.sessions.items():
+                        self._apply(sid, session_flow, actions, cause=flow)
+            self.cond.notify_all()
+        for action, argument in actions:
+            action(argument)
+
+    def update(self, session_id, size: int) -> None:
+        actions = []
+        with self.cond:
+            flow = self.sessions.get(session_id)
+            if flow is None:
+                return
+            self.total += size - flow.size
+            flow.size = size
+            if not flow.over and size > self.session_high:
+                flow.over = True
+            elif flow.over and size <= self.session_low:
+                flow.over = False
+            if self._update_global():
+                # global state changed - every session may have to pause/resume
+                for sid, session_flow in self.sessions.items():
+                    self._apply(sid, session_flow, actions, cause=flow)
+            else:
+                self._apply(session_id, flow, actions, cause=flow)
+        for action, argument in actions:
+            action(argument)
+
+    def _update_global(self) -> bool:
+        if not self.global_over and self.total > self.global_high:
+            self.global_over = True
+            self.global_overloads += 1
+            self.logger.warning(f"flow control: global buffer budget exceeded ({self.total} B > {self.global_high} B)")
+            return True
+        if self.global_over and self.total <= self.global_low:
+            self.global_over = False
+            self.logger.info(f"flow control: global buffer back under budget ({self.total} B)")
+            return True
+        return False
+
+    def _apply(self, session_id, flow: _SessionFlow, actions: list, cause: _SessionFlow):
+        over = flow.over or self.global_over
+        if self.policy == "none":
+            return
+        if self.policy == "disconnect":
+            # only the session that pushed the buffers over budget is disconnected
+            if over and flow is cause and not flow.disconnect:
+                flow.disconnect = True
+                self.logger.warning(f"flow control: session {session_id} over budget ({flow.size} B) - disconnect")
+                if flow.on_disconnect:
+                    actions.append((flow.on_disconnect, session_id))
+                self.cond.notify_all()
+            return
+        now = time.monotonic()
+        if over and not flow.paused:
+            flow.paused = True
+            flow.paused_since = now
+            flow.pauses += 1
+            flow.last_paused = time.time()
+            self.logger.warning(f"flow control: session {session_id} paused ({flow.size} B buffered, total {self.total} B)")
+            if flow.on_pause:
+                actions.append((flow.on_pause, session_id))
+        elif not over and flow.paused:
+            flow.paused = False
+            flow.paused_seconds += now - flow.paused_since
+            self.logger.info(f"flow control: session {session_id} resumed after {now - flow.paused_since:.3f} s")
+            if flow.on_resume:
+                actions.append((flow.on_resume, session_id))
+            self.cond.notify_all()
+
+    def wait(self, session_id, timeout: Optional[float] = None) -> bool:
+        """Blocks while the session is paused. False - the session has to be disconnected."""
+        with self.cond:
+            flow = self.sessions.get(session_id)
+            if flow is None:
+                return True
+            if flow.paused:
+                self.cond.wait_for(lambda: not flow.paused or flow.disconnect, timeout)
+            return not flow.disconnect
+
+    def is_paused(self, session_id) -> bool:
+        flow = self.sessions.get(session_id)
+        return flow.paused if flow else False
+
+    # -----------------------------------------------
+    # Stats
+    def get_stats(self, session_id) -> dict:
+        flow = self.sessions.get(session_id)
+        if flow is None:
+            return {'paused': False, 'pauses': 0, 'paused_seconds': 0.0, 'last_paused': 0.0, 'size': 0}
+        return {'paused': flow.paused, 'pauses': flow.pauses, 'paused_seconds': flow.paused_total(time.monotonic()),
+                'last_paused': flow.last_paused, 'size': flow.size}
+
+    def get_sessions(self) -> list:
+        return list(self.sessions.keys())
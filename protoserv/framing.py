@@ -0,0 +1,55 @@
+import struct
+import logging
+import binascii
+from typing import List
+
+from .buffer import Buffer
+
+
+# Apstra streams every protobuf message prefixed with 2 bytes (big endian) length
+FRAME_HEADER_SIZE = 2
+_frame_header = struct.Struct('>H')
+
+
+def slice_frames(buffer: Buffer, session_id, max_frames: int = 0, logger=None) -> List[memoryview]:
+    """Extracts all complete frames from the session buffer in one pass.
+
+    Args:
+        buffer (Buffer): Session buffer.
+        session_id: Session key.
+        max_frames (int): Stop after this many frames (0 - no limit).
+        logger: Optional logger for DEBUG dumps (built only when DEBUG is enabled).
+
+    Returns:
+        List of zero-copy memoryviews with message payloads (length prefix stripped).
+        Consumed bytes are removed from the buffer with a single ``remove_elements`` call;
+        an incomplete trailing frame stays in the buffer until more data arrives.
+    """
+    view = buffer.peek(session_id)
+    size = len(view)
+    unpack_from = _frame_header.unpack_from
+    frames = []
+    pos = 0
+    while pos + FRAME_HEADER_SIZE <= size:
+        msg_len, = unpack_from(view, pos)
+        end = pos + FRAME_HEADER_SIZE + msg_len
+        if end > size:
+            break
+        frames.append(view[pos + FRAME_HEADER_SIZE:end])
+        pos = end
+        if max_frames and len(frames) >= max_frames:
+            break
+
+    if logger is not None and logger.isEnabledFor(logging.DEBUG):
+        debug_dump(logger, session_id, frames, size, pos)
+
+    if pos:
+        buffer.remove_elements(session_id, pos)
+    view.release()
+    return frames
+
+
+def debug_dump(logger, session_id, frames: List[memoryview], size: int, consumed: int) -> None:
+    logger.debug(f"pb2buffer-debug - session: {session_id} - buffer size: {size} - frames: {len(frames)} - consume: {consumed} bytes - left: {size - consumed} bytes")
+    for frame in frames:
+        logger.debug(f"msg_len: {len(frame)} - msg_hex: {binascii.hexlify(frame).decode()}")
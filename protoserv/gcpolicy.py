@@ -0,0 +1,106 @@
+import gc
+import sys
+import time
+import logging
+from typing import Callable, Optional, Tuple
+
+
+def parse_threshold(value: str) -> Tuple[int, ...]:
+    """GC_THRESHOLD "50000,20,100" -> (50000, 20, 100); empty - interpreter default ()."""
+    if not value:
+        return ()
+    threshold = tuple(int(part) for part in value.split(",") if part.strip())
+    if not 1 <= len(threshold) <= 3:
+        raise ValueError(f"GC threshold needs 1-3 values: {value}")
+    return threshold
+
+
+class GCPolicy:
+    """Garbage collector settings of a process and its collection statistics.
+
+    Decoding churns through millions of short-lived dicts, so full collections
+    that also walk every long-lived startup object (schema modules, descriptors,
+    transcoder tables, ...) are what shows up as latency spikes. ``freeze()``
+    moves everything allocated so far to the permanent generation, ``threshold``
+    makes young collections less frequent and forced collections are off unless
+    ``collect_interval`` asks for them.
+
+    Args:
+        threshold (tuple): ``gc.set_threshold()`` values (empty - interpreter default).
+        freeze (bool): ``freeze()`` moves the startup objects to the permanent generation.
+        collect_interval (float): Seconds between forced ``gc.collect()`` in ``tick()`` (0 - never).
+        on_pause (callable): ``on_pause(generation, seconds)`` after every collection.
+    """
+    def __init__(self, threshold: Tuple[int, ...] = (), freeze: bool = True, collect_interval: float = 0,
+                 on_pause: Optional[Callable] = None, logger=None):
+        self.threshold = tuple(threshold)
+        self.freeze_enabled = freeze
+        self.collect_interval = collect_interval
+        self.on_pause = on_pause
+        self.logger = logger if logger else logging.getLogger('logger')
+        self.last_collect = time.monotonic()
+        self._started = None
+        # Stats per generation
+        self.collections = [0, 0, 0]
+        self.collected = [0, 0, 0]
+        self.pause_seconds = [0.0, 0.0, 0.0]
+        self.max_pause = [0.0, 0.0, 0.0]
+        self.forced = 0
+
+    def install(self):
+        if self.threshold:
+            gc.set_threshold(*self.threshold)
+        if self._callback not in gc.callbacks:
+            gc.callbacks.append(self._callback)
+        return self
+
+    def uninstall(self):
+        if self._callback in gc.callbacks:
+            gc.callbacks.remove(self._callback)
+
+    def freeze(self) -> int:
+        """Collects once and freezes everything still alive - returns the number of frozen objects."""
+        if not self.freeze_enabled:
+            return 0
+        gc.collect()
+        gc.freeze()
+        frozen = gc.get_freeze_count()
+        self.logger.info(f"gc: {frozen} startup objects frozen | threshold: {gc.get_threshold()}")
+        return frozen
+
+    def tick(self) -> None:
+        """Forced collection when collect_interval is due (called from the stats loop)."""
+        if self.collect_interval <= 0:
+            return
+        now = time.monotonic()
+        if now - self.last_collect >= self.collect_interval:
+            self.last_collect = now
+            self.forced += 1
+            gc.collect()
+
+    def _callback(self, phase, info):
+        if phase == "start":
+            self._started = time.perf_counter()
+            return
+        if self._started is None:
+            return
+        pause = time.perf_counter() - self._started
+        self._started = None
+        generation = info.get('generation', 2)
+        self.collections[generation] += 1
+        self.collected[generation] += info.get('collected', 0)
+        self.pause_seconds[generation] += pause
+        if pause > self.max_pause[generation]:
+            self.max_pause[generation] = pause
+        if self.on_pause:
+            self.on_pause(generation, pause)
+
+    def get_stats(self) -> dict:
+        return {'collections': list(self.collections),
+                'collected': list(self.collected),
+                'pause_seconds': list(self.pause_seconds),
+                'max_pause': list(self.max_pause),
+                'forced': self.forced,
+                'frozen': gc.get_freeze_count(),
+                'tracked': gc.get_count(),
+                'allocated_blocks': sys.getallocatedblocks()}
@@ -0,0 +1,156 @@
+import time
+import bisect
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+
+# Secondary indexes (key of every stored message: source IP, message type, device origin_name)
+INDEX_NAMES = ('source', 'type', 'device')
+
+# Evicted entries are reclaimed only once they are at least this many and
+# also more than the live part of the ring (amortized O(1), see buffer.py).
+HISTORY_COMPACT_THRESHOLD = 4096
+
+# Estimated per entry overhead (list slots, key tuple, index deque items) for memory accounting
+ENTRY_OVERHEAD = 160
+
+
+class HistoryStore:
+    """Bounded ring of recent decoded messages with time and key indexes.
+
+    Messages (JSON strings) are appended in receive order to parallel lists, so the
+    receive time list is sorted and serves as the time index (bisect). Every message
+    gets a sequence number; secondary indexes map source / type / device to deques
+    of sequence numbers. The oldest message is always at the head of all its index
+    deques, so eviction pops them in O(1) - indexes are maintained incrementally.
+
+    Eviction: older than ``max_age`` seconds, over ``max_bytes`` (estimated) or over
+    ``max_entries`` (0 - no limit).
+    """
+    def __init__(self, max_age=600.0, max_bytes=64 * 1024 * 1024, max_entries=0):
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.times: List[float] = []
+        self.keys: List[tuple] = []
+        self.messages: List[str] = []
+        # first live position / sequence number of position 0
+        self.start = 0
+        self.base = 0
+        self.indexes: Dict[str, Dict[str, deque]] = {name: {} for name in INDEX_NAMES}
+        self.lock = threading.Lock()
+        # Stats
+        self.bytes = 0
+        self.appended = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.times) - self.start
+
+    def append(self, source: Optional[str], msg_type: Optional[str], device: Optional[str], message: str,
+               received: float = None) -> None:
+        """Stores ``message``; ``received`` defaults to now.
+
+        The time is taken under the lock and never goes below the previous entry
+        (concurrent appenders, clock steps), so ``times`` stays sorted for bisect.
+        """
+        key = (source, msg_type, device)
+        with self.lock:
+            if received is None:
+                received = time.time()
+            if self.times and received < self.times[-1]:
+                received = self.times[-1]
+            seq = self.base + len(self.times)
+            self.times.append(received)
+            self.keys.append(key)
+            self.messages.append(message)
+            for index, value in zip(self.indexes.values(), key):
+                if value is not None:
+                    seqs = index.get(value)
+                    if seqs is None:
+                        seqs = index[value] = deque()
+                    seqs.append(seq)
+            self.bytes += len(message) + ENTRY_OVERHEAD
+            self.appended += 1
+            self._evict(received)
+
+    def _evict(self, now: float) -> None:
+        deadline = now - self.max_age if self.max_age else None
+        times = self.times
+        while self.start < len(times) and (
+                (self.max_bytes and self.bytes > self.max_bytes)
+                or (self.max_entries and len(times) - self.start > self.max_entries)
+                or (deadline is not None and times[self.start] < deadline)):
+            position = self.start
+            for index, value in zip(self.indexes.values(), self.keys[position]):
+                if value is not None:
+                    seqs = index[value]
+                    seqs.popleft()
+                    if not seqs:
+                        del index[value]
+            self.bytes -= len(self.messages[position]) + ENTRY_OVERHEAD
+            self.messages[position] = None
+            self.start += 1
+            self.evictions += 1
+        if self.start >= HISTORY_COMPACT_THRESHOLD and self.start * 2 >= len(times):
+            del times[:self.start]
+            del self.keys[:self.start]
+            del self.messages[:self.start]
+            self.base += self.start
+            self.start = 0
+
+    def expire(self) -> None:
+        """Drops messages older than max_age (the store is otherwise only evicted on append)."""
+        with self.lock:
+            self._evict(time.time())
+
+    def query(self, start: float = None, end: float = None, source: str = None, msg_type: str = None,
+              device: str = None, limit: int = 1000) -> List[str]:
+        """Newest ``limit`` messages received in [start, end] matching all given keys (oldest first)."""
+        wanted = (source, msg_type, device)
+        result = []
+        with self.lock:
+            times = self.times
+            lo = bisect.bisect_left(times, start, self.start) if start is not None else self.start
+            hi = bisect.bisect_right(times, end, lo) if end is not None else len(times)
+            candidates = []
+            for index, value in zip(self.indexes.values(), wanted):
+                if value is not None:
+                    seqs = index.get(value)
+                    if seqs is None:
+                        return result
+                    candidates.append(seqs)
+            if candidates:
+                # walk the most selective index from the newest message
+                base = self.base
+                seq_lo, seq_hi = base + lo, base + hi
+                for seq in reversed(min(candidates, key=len)):
+                    if seq >= seq_hi:
+                        continue
+                    if seq < seq_lo or len(result) >= limit:
+                        break
+                    position = seq - base
+                    if self._match(self.keys[position], wanted):
+                        result.append(self.messages[position])
+            else:
+                for position in range(hi - 1, lo - 1, -1):
+                    if len(result) >= limit:
+                        break
+                    result.append(self.messages[position])
+        result.reverse()
+        return result
+
+    @staticmethod
+    def _match(key: tuple, wanted: tuple) -> bool:
+        for value, expected in zip(key, wanted):
+            if expected is not None and value != expected:
+                return False
+        return True
+
+    def time_range(self):
+        """(oldest, newest) receive time of the stored messages (None if empty)."""
+        with self.lock:
+            if self.start >= len(self.times):
+                return None, None
+            return self.times[self.start], self.times[-1]
@@ -0,0 +1,119 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional, Set
+
+from .subscriptions import source_ip
+
+
+# Entity key fields looked up in the message body and its nested messages
+ENTITY_FIELDS = ("system_id", "interface_name", "interface", "id", "name")
+
+# Estimated per entry overhead (key tuple, OrderedDict node, entry tuple) for memory accounting
+ENTRY_OVERHEAD = 256
+
+
+class LastValueCache:
+    """Latest message per (source IP, message type, entity).
+
+    Entries are the JSON strings already built for the outputs (no extra copy of
+    the decoded dict), kept in update order: the least recently updated entry is
+    evicted first when ``max_entries``/``max_bytes`` is exceeded and entries older
+    than ``ttl`` seconds expire. ``update`` is O(1) - a dict move plus an eviction
+    check of the oldest entry.
+
+    The entity key is ``origin_name`` followed by the names of nested messages and
+    the values of ``entity_fields`` found in the message body, ie.
+    ``SYS1/interface_counters/eth0`` or ``SYS1/device_status/SYS1``.
+    """
+    def __init__(self, max_entries=10000, ttl=3600.0, max_bytes=64 * 1024 * 1024,
+                 entity_fields: Iterable[str] = ENTITY_FIELDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entity_fields = tuple(entity_fields)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Stats
+        self.bytes = 0
+        self.updates = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def entity_key(self, record: dict, msg_type: str) -> str:
+        parts = [str(record.get('origin_name', ''))]
+        body = record.get(msg_type)
+        if isinstance(body, dict):
+            fields = self.entity_fields
+            for key, value in body.items():
+                if isinstance(value, dict):
+                    parts.append(key)
+                    for field in fields:
+                        if field in value:
+                            parts.append(str(value[field]))
+                elif key in fields:
+                    parts.append(str(value))
+        return '/'.join(parts)
+
+    def update(self, source: Optional[str], msg_type: Optional[str], record: dict, message: str) -> None:
+        key = (source_ip(source), msg_type, self.entity_key(record, msg_type))
+        size = len(message) + len(key[2]) + ENTRY_OVERHEAD
+        now = time.monotonic()
+        entries = self.entries
+        with self.lock:
+            old = entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            entries[key] = (message, now, size)
+            self.bytes += size
+            self.updates += 1
+            while len(entries) > self.max_entries or (self.max_bytes and self.bytes > self.max_bytes):
+                self.bytes -= entries.popitem(last=False)[1][2]
+                self.evictions += 1
+            self._expire(now)
+
+    def _expire(self, now: float) -> None:
+        if not self.ttl:
+            return
+        entries = self.entries
+        deadline = now - self.ttl
+        while entries:
+            key = next(iter(entries))
+            entry = entries[key]
+            if entry[1] >= deadline:
+                break
+            del entries[key]
+            self.bytes -= entry[2]
+            self.expirations += 1
+
+    def expire(self) -> None:
+        """Drops expired entries (the cache is otherwise only expired on update)."""
+        with self.lock:
+            self._expire(time.monotonic())
+
+    def snapshot(self, sources: Optional[Set[str]] = None, types: Optional[Set[str]] = None,
+                 predicate: Optional[Callable[[str], bool]] = None) -> List[str]:
+        """JSON messages of the live entries, oldest update first (``None`` - no filter)."""
+        deadline = time.monotonic() - self.ttl if self.ttl else None
+        with self.lock:
+            items = list(self.entries.items())
+        result = []
+        for (source, msg_type, _), (message, updated, _) in items:
+            if deadline is not None and updated < deadline:
+                continue
+            if sources is not None and source not in sources:
+                continue
+            if types is not None and msg_type not in types:
+                continue
+            if predicate is not None and not predicate(message):
+                continue
+            result.append(message)
+        return result
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
@@ -0,0 +1,249 @@
+"""Readers of the local output channels (shared memory ring, Unix socket stream).
+
+Only the standard library is needed, so co-located consumers can copy this file:
+
+    from protoserv.localclient import ShmRingReader, UnixStreamReader
+
+    with ShmRingReader('protoserv') as ring:
+        for payload in ring:            # bytes - JSON message or raw frame
+            message = json.loads(payload)
+
+    with UnixStreamReader('/run/protoserv/protoserv.sock') as stream:
+        for payload in stream:
+            ...
+"""
+import os
+import time
+import socket
+import struct
+from multiprocessing import shared_memory
+from typing import Iterator, List, Optional
+
+
+# Every record (ring and socket): 4 byte big-endian length + payload
+RECORD_HEADER = struct.Struct('>I')
+
+# Ring layout: header | reader slots | data area (capacity bytes)
+#   header: magic, capacity, write position, published records, closed flag, reserved position
+#   reader slot: pid, cursor (for the writer's lag stats only - readers never block the writer)
+# Positions are logical (total bytes ever written); offset in the data area is position % capacity.
+# A record that does not fit before the end of the data area is preceded by a WRAP marker
+# and starts at offset 0.
+# The writer publishes the reserved position (end of the record being copied) before the copy and
+# the write position after it - data below reserved position - capacity may already be overwritten.
+RING_MAGIC = b'PSRING1\x00'
+RING_HEADER = struct.Struct('<8sQQQQ')
+RING_HEADER_SIZE = 64
+RING_WRITE_POS_OFFSET = 16
+RING_CLOSED_OFFSET = 32
+RING_RESERVE_POS_OFFSET = 40
+RING_MAX_READERS = 32
+RING_SLOT = struct.Struct('<QQ')
+RING_DATA_OFFSET = RING_HEADER_SIZE + RING_MAX_READERS * RING_SLOT.size
+RING_WRAP = 0xFFFFFFFF
+
+_POSITION = struct.Struct('<Q')
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Attaches an existing segment without handing it to the resource tracker
+    (which would unlink the writer's segment when this process exits)."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 - no track argument
+        pass
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class ShmRingReader:
+    """Reader of the shared memory ring with its own cursor.
+
+    Starts at the current write position (live messages only). The writer never
+    waits for readers: a reader that falls more than the ring capacity behind
+    loses the overwritten messages (``overruns``/``lost``) and continues from the
+    current write position.
+
+    Args:
+        name (str): Shared memory name (LOCAL_SHM_NAME).
+        poll_interval (float): Max sleep between polls when the ring is empty.
+    """
+    def __init__(self, name: str, poll_interval: float = 0.005):
+        self.shm = attach_shared_memory(name)
+        self.buf = self.shm.buf
+        magic, self.capacity, write_pos, _, _ = RING_HEADER.unpack_from(self.buf, 0)
+        if magic != RING_MAGIC:
+            self.shm.close()
+            raise ValueError(f"{name} is not a protoserv ring")
+        self.poll_interval = poll_interval
+        self.cursor = write_pos
+        self.slot = self._claim_slot()
+        # Stats
+        self.records = 0
+        self.overruns = 0
+        self.lost = 0
+
+    def _claim_slot(self) -> Optional[int]:
+        pid = os.getpid()
+        for slot in range(RING_MAX_READERS):
+            offset = RING_HEADER_SIZE + slot * RING_SLOT.size
+            owner, _ = RING_SLOT.unpack_from(self.buf, offset)
+            if owner == 0 or not _alive(owner):
+                RING_SLOT.pack_into(self.buf, offset, pid, self.cursor)
+                if RING_SLOT.unpack_from(self.buf, offset)[0] == pid:
+                    return offset
+        return None
+
+    @property
+    def closed(self) -> bool:
+        return _POSITION.unpack_from(self.buf, RING_CLOSED_OFFSET)[0] != 0
+
+    def read(self, max_records: int = 1024) -> List[bytes]:
+        """Records published since the last call (empty list if there are none - no wait)."""
+        buf = self.buf
+        capacity = self.capacity
+        write_pos = _POSITION.unpack_from(buf, RING_WRITE_POS_OFFSET)[0]
+        cursor = self.cursor
+        if write_pos - cursor > capacity:
+            self.overruns += 1
+            cursor = write_pos
+        starts = []
+        records = []
+        while cursor < write_pos and len(records) < max_records:
+            offset = cursor % capacity
+            remaining = capacity - offset
+            if remaining < RECORD_HEADER.size:
+                cursor += remaining
+                continue
+            length = RECORD_HEADER.unpack_from(buf, RING_DATA_OFFSET + offset)[0]
+            if length == RING_WRAP:
+                cursor += remaining
+                continue
+            start = RING_DATA_OFFSET + offset + RECORD_HEADER.size
+            if length > remaining - RECORD_HEADER.size or cursor + RECORD_HEADER.size + length > write_pos:
+                # length overwritten while reading
+                break
+            starts.append(cursor)
+            records.append(bytes(buf[start:start + length]))
+            cursor += RECORD_HEADER.size + length
+        # records the writer overwrote (or is overwriting) meanwhile are dropped
+        oldest = _POSITION.unpack_from(buf, RING_RESERVE_POS_OFFSET)[0] - capacity
+        if starts and starts[0] < oldest:
+            valid = 0
+            while valid < len(starts) and starts[valid] < oldest:
+                valid += 1
+            self.overruns += 1
+            self.lost += valid
+            records = records[valid:]
+        if cursor < oldest:
+            # continue from the current write position
+            cursor = oldest + capacity
+        self.cursor = cursor
+        self.records += len(records)
+        if self.slot is not None:
+            _POSITION.pack_into(buf, self.slot + 8, cursor)
+        return records
+
+    def wait(self, timeout: Optional[float] = None, max_records: int = 1024) -> Optional[List[bytes]]:
+        """Waits for records (polling with backoff); [] on timeout, None once the writer closed the ring."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        delay = 0.00005
+        while True:
+            records = self.read(max_records)
+            if records:
+                return records
+            if self.closed:
+                return None
+            if deadline is not None and time.monotonic() >= deadline:
+                return []
+            time.sleep(delay)
+            delay = min(delay * 2, self.poll_interval)
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            records = self.wait()
+            if records is None:
+                return
+            yield from records
+
+    def close(self) -> None:
+        if self.buf is None:
+            return
+        if self.slot is not None:
+            RING_SLOT.pack_into(self.buf, self.slot, 0, 0)
+        self.buf = None
+        self.shm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class UnixStreamReader:
+    """Reader of the Unix socket stream (records in batched writes).
+
+    Args:
+        path (str): Socket path (LOCAL_SOCKET_PATH).
+        recv_size (int): Max bytes per recv call.
+    """
+    def __init__(self, path: str, recv_size: int = 1024 * 1024):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.recv_size = recv_size
+        self.pending = b''
+        self.records = 0
+
+    def read(self) -> Optional[List[bytes]]:
+        """Blocks until at least one complete record arrives (None - server closed the stream)."""
+        while True:
+            chunk = self.sock.recv(self.recv_size)
+            if not chunk:
+                return None
+            data = self.pending + chunk if self.pending else chunk
+            records = []
+            pos = 0
+            size = len(data)
+            while size - pos >= RECORD_HEADER.size:
+                length = RECORD_HEADER.unpack_from(data, pos)[0]
+                end = pos + RECORD_HEADER.size + length
+                if end > size:
+                    break
+                records.append(data[pos + RECORD_HEADER.size:end])
+                pos = end
+            self.pending = data[pos:]
+            if records:
+                self.records += len(records)
+                return records
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            records = self.read()
+            if records is None:
+                return
+            yield from records
+
+    def close(self) -> None:
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -0,0 +1,238 @@
+import os
+import socket
+import logging
+import threading
+from multiprocessing import shared_memory
+from typing import List, Tuple
+
+from .localclient import (RECORD_HEADER, RING_MAGIC, RING_HEADER, RING_HEADER_SIZE,
+                          RING_CLOSED_OFFSET, RING_RESERVE_POS_OFFSET, RING_MAX_READERS, RING_SLOT, RING_DATA_OFFSET, RING_WRAP, _POSITION,
+                          _alive)
+from .utils import ensure_directory_exists
+
+
+LOCAL_OUTPUT_FORMATS = ("json", "raw")
+
+
+class ShmRingWriter:
+    """Single writer of the shared memory ring read by co-located processes (see localclient.ShmRingReader).
+
+    Records are copied into the data area and the write position is published
+    after the copy, so readers only ever see complete records. The end of the
+    record is published as the reserved position before the copy (seqlock style):
+    a reader checks it after copying and drops records the writer may have been
+    overwriting meanwhile. The writer never
+    waits for readers - a reader more than ``size`` bytes behind loses messages.
+    ``write`` is serialized by a lock (the consumer threads of several sessions
+    share one ring).
+
+    Args:
+        name (str): Shared memory name (/dev/shm/<name>).
+        size (int): Data area size in bytes; a record may take at most half of it.
+    """
+    def __init__(self, name: str, size: int = 64 * 1024 * 1024):
+        self.name = name
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=RING_DATA_OFFSET + size)
+        except FileExistsError:
+            # left behind by a previous run that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=RING_DATA_OFFSET + size)
+        self.buf = self.shm.buf
+        self.capacity = size
+        self.max_record = size // 2
+        self.pos = 0
+        self.lock = threading.Lock()
+        self.buf[:RING_DATA_OFFSET] = bytes(RING_DATA_OFFSET)
+        RING_HEADER.pack_into(self.buf, 0, RING_MAGIC, size, 0, 0, 0)
+        # Stats
+        self.records = 0
+        self.bytes = 0
+        self.dropped = 0
+
+    def write(self, payload: bytes) -> bool:
+        length = len(payload)
+        if length > self.max_record:
+            self.dropped += 1
+            return False
+        need = RECORD_HEADER.size + length
+        buf = self.buf
+        capacity = self.capacity
+        with self.lock:
+            pos = self.pos
+            offset = pos % capacity
+            remaining = capacity - offset
+            wrap = need > remaining
+            # reserve first: readers lapped by this record see it before any byte (WRAP marker included) is overwritten
+            _POSITION.pack_into(buf, RING_RESERVE_POS_OFFSET, pos + (remaining if wrap else 0) + need)
+            if wrap:
+                if remaining >= RECORD_HEADER.size:
+                    RECORD_HEADER.pack_into(buf, RING_DATA_OFFSET + offset, RING_WRAP)
+                pos += remaining
+                offset = 0
+            start = RING_DATA_OFFSET + offset
+            RECORD_HEADER.pack_into(buf, start, length)
+            buf[start + RECORD_HEADER.size:start + need] = payload
+            self.pos = pos + need
+            self.records += 1
+            self.bytes += need
+            # publish: write position + number of records
+            RING_HEADER.pack_into(buf, 0, RING_MAGIC, capacity, self.pos, self.records, 0)
+        return True
+
+    def readers(self) -> List[Tuple[int, int]]:
+        """(pid, bytes behind the writer) of the attached readers."""
+        result = []
+        for slot in range(RING_MAX_READERS):
+            pid, cursor = RING_SLOT.unpack_from(self.buf, RING_HEADER_SIZE + slot * RING_SLOT.size)
+            if pid and _alive(pid):
+                result.append((pid, max(self.pos - cursor, 0)))
+        return result
+
+    def close(self) -> None:
+        if self.buf is None:
+            return
+        with self.lock:
+            _POSITION.pack_into(self.buf, RING_CLOSED_OFFSET, 1)
+            self.buf = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class UnixStreamServer:
+    """Unix domain socket stream of length-prefixed records (see localclient.UnixStreamReader).
+
+    ``publish()`` only queues the record; a writer thread sends everything queued
+    so far to every client with one ``sendall`` per client, every ``flush_interval``
+    seconds or once ``batch_bytes`` are queued. A client that does not take a
+    batch within ``send_timeout`` is disconnected; records over ``max_queue_bytes``
+    are dropped.
+
+    Args:
+        path (str): Socket path (an existing socket file is replaced).
+        batch_bytes (int): Writer wakes up when this many bytes are queued ...
+        flush_interval (float): ... or after this many seconds.
+        max_queue_bytes (int): Max bytes waiting for the writer.
+        send_timeout (float): Max seconds to send one batch to a client.
+    """
+    def __init__(self, path: str, batch_bytes: int = 256 * 1024, flush_interval: float = 0.005,
+                 max_queue_bytes: int = 16 * 1024 * 1024, send_timeout: float = 1.0, logger=None):
+        self.path = path
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.max_queue_bytes = max_queue_bytes
+        self.send_timeout = send_timeout
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self.sock = None
+        self.clients: List[socket.socket] = []
+        self.clients_lock = threading.Lock()
+        self.queue = []
+        self.queued_bytes = 0
+        self.cond = threading.Condition()
+        self.stopping = False
+        self.threads = []
+        # Stats
+        self.records = 0
+        self.batches = 0
+        self.dropped = 0
+        self.disconnects = 0
+
+    def start(self):
+        ensure_directory_exists(self.path)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.path)
+        self.sock.listen(16)
+        self.sock.settimeout(1)
+        self.logger.info(f"local stream: {self.path}")
+        for target, name in ((self._accept, "local-accept"), (self._run, "local-stream")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def close(self, timeout=5):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        with self.clients_lock:
+            for client in self.clients:
+                client.close()
+            self.clients = []
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def get_clients(self) -> int:
+        return len(self.clients)
+
+    def publish(self, payload: bytes) -> bool:
+        if not self.clients:
+            return False
+        with self.cond:
+            if self.queued_bytes >= self.max_queue_bytes:
+                self.dropped += 1
+                return False
+            self.queue.append(RECORD_HEADER.pack(len(payload)))
+            self.queue.append(payload)
+            self.queued_bytes += RECORD_HEADER.size + len(payload)
+            if self.queued_bytes >= self.batch_bytes:
+                self.cond.notify_all()
+        return True
+
+    def _accept(self):
+        while not self.stopping:
+            try:
+                client, _ = self.sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            client.settimeout(self.send_timeout)
+            with self.clients_lock:
+                self.clients.append(client)
+            self.logger.info(f"local stream client connected ({len(self.clients)})")
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if self.queued_bytes < self.batch_bytes and not self.stopping:
+                    self.cond.wait(self.flush_interval)
+                batch = self.queue
+                self.queue = []
+                self.queued_bytes = 0
+                stopping = self.stopping
+            if batch:
+                data = b''.join(batch)
+                self.records += len(batch) // 2
+                self.batches += 1
+                with self.clients_lock:
+                    clients = list(self.clients)
+                for client in clients:
+                    try:
+                        client.sendall(data)
+                    except OSError as e:
+                        self._disconnect(client, e)
+            if stopping:
+                break
+
+    def _disconnect(self, client, error):
+        with self.clients_lock:
+            if client in self.clients:
+                self.clients.remove(client)
+        client.close()
+        self.disconnects += 1
+        self.logger.info(f"local stream client disconnected: {error}")
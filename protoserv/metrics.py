@@ -0,0 +1,312 @@
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+# Latency buckets (seconds)
+DECODE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 1.0)
+SINK_BUCKETS = DECODE_BUCKETS
+FRESHNESS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LOCAL_ADDRESSES = ("127.0.0.1", "::1")
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(value) -> str:
+    if isinstance(value, float):
+        if value != value:
+            return 'NaN'
+        if value in (float('inf'), float('-inf')):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+class _Sharded:
+    """Per-thread shards - recording never takes a lock.
+
+    Every recording thread owns a dict (labels -> value) that only it writes,
+    so there are no lost updates. ``render()`` sums the shards; ``list(dict.items())``
+    is a single C level operation under the GIL, so reading a shard while its owner
+    writes is safe. The lock is taken only when a thread records its first value
+    and when shards are collected: shards of exited threads are merged into one
+    retired shard, so short lived threads (ie. thread per connection) don't pile up.
+    """
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, dict]] = []
+        self._retired: dict = {}
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        shard = {}
+        with self._lock:
+            self._prune()
+            self._shards.append((threading.current_thread(), shard))
+        self._local.shard = shard
+        return shard
+
+    def _prune(self) -> None:
+        # called with self._lock held - a dead thread no longer writes its shard
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                for labels, value in shard.items():
+                    self._retired[labels] = self._merge(self._retired.get(labels), value)
+        self._shards = alive
+
+    def _merge(self, total, value):
+        raise NotImplementedError
+
+    def _collect(self) -> List[dict]:
+        """Retired shard + shards of the running threads."""
+        with self._lock:
+            self._prune()
+            return [self._retired] + [shard for _, shard in self._shards]
+
+    def remove(self, labels: Tuple) -> None:
+        """Drops a label set (ie. closed session) from all shards."""
+        for shard in self._collect():
+            shard.pop(labels, None)
+
+
+class Counter(_Sharded):
+    def inc(self, labels: Tuple = (), amount=1) -> None:
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self) -> Dict[Tuple, float]:
+        total = {}
+        for shard in self._collect():
+            for labels, value in list(shard.items()):
+                total[labels] = total.get(labels, 0) + value
+        return total
+
+    def _merge(self, total, value):
+        return value if total is None else total + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram(_Sharded):
+    def __init__(self, name: str, documentation: str, buckets: Iterable[float], labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._size = len(self.buckets) + 1
+
+    def observe(self, value: float, labels: Tuple = (), count: int = 1) -> None:
+        """Records ``count`` observations of ``value``."""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        entry = shard.get(labels)
+        if entry is None:
+            # bucket counts (last one is +Inf), sum
+            entry = shard[labels] = [0] * self._size + [0.0]
+        entry[bisect.bisect_left(self.buckets, value)] += count
+        entry[-1] += value * count
+
+    def _merge(self, total, entry):
+        if total is None:
+            total = [0] * self._size + [0.0]
+        for i, value in enumerate(entry):
+            total[i] += value
+        return total
+
+    def render(self) -> List[str]:
+        total = {}
+        for shard in self._collect():
+            for labels, entry in list(shard.items()):
+                total[labels] = self._merge(total.get(labels), entry)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, entry in sorted(total.items()):
+            cumulative = 0
+            for bound, value in zip(self.buckets + (float('inf'),), entry):
+                cumulative += value
+                le = 'le="' + _number(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(entry[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Last value gauge - ``set`` is a single dict store (no lock needed)."""
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value, labels: Tuple = ()) -> None:
+        self._values[labels] = value
+
+    def remove(self, labels: Tuple) -> None:
+        self._values.pop(labels, None)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(list(self._values.items())):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class CallbackMetric:
+    """Metric read at scrape time from ``callback() -> [(label values tuple, value), ...]``."""
+    def __init__(self, name: str, documentation: str, callback: Callable, labelnames: Iterable[str] = (),
+                 metric_type: str = 'gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.metric_type = metric_type
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for labels, value in self.callback():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, logger=None):
+        self.metrics = []
+        self.logger = logger if logger else logging.getLogger('logger')
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, buckets, labelnames=()) -> Histogram:
+        return self.register(Histogram(name, documentation, buckets, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def callback(self, name, documentation, callback, labelnames=(), metric_type='gauge') -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, callback, labelnames, metric_type))
+
+    def remove(self, labelnames: Tuple[str, ...], labels: Tuple) -> None:
+        """Drops a label set from every recorded metric with these label names (ie. closed session)."""
+        for metric in self.metrics:
+            if hasattr(metric, 'remove') and metric.labelnames == tuple(labelnames):
+                metric.remove(labels)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                self.logger.error(f"metrics {metric.name} error: {str(e)}")
+        lines.append('')
+        return "\n".join(lines)
+
+
+class MetricsServer:
+    """Serves ``registry.render()`` on ``http://listen_ip:port/metrics`` (Prometheus text format).
+
+    Other GET endpoints are added with ``add_route`` (ie. /history queries).
+    """
+    def __init__(self, registry: MetricsRegistry, listen_ip="127.0.0.1", port=9108, logger=None):
+        self.registry = registry
+        self.listen_ip = listen_ip
+        self.port = int(port)
+        self.logger = logger if logger else logging.getLogger('logger')
+        self.httpd: Optional[ThreadingHTTPServer] = None
+        self.routes: Dict[str, Tuple[Callable, bool]] = {}
+
+    def add_route(self, path: str, handler: Callable, local_only: bool = True) -> None:
+        """``handler(query dict) -> (content type, body str)`` - ValueError is answered with 400."""
+        self.routes[path] = (handler, local_only)
+
+    def start(self) -> bool:
+        """Binds and serves in a daemon thread. False (logged) when the address cannot be bound."""
+        registry = self.registry
+        routes = self.routes
+        logger = self.logger
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path in routes:
+                    self.route(url, *routes[url.path])
+                    return
+                if url.path not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                self.respond(CONTENT_TYPE, registry.render())
+
+            def route(self, url, handler, local_only):
+                if local_only and self.client_address[0] not in LOCAL_ADDRESSES:
+                    self.send_error(403)
+                    return
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                try:
+                    content_type, body = handler(query)
+                except ValueError as e:
+                    self.send_error(400, str(e))
+                    return
+                except Exception as e:
+                    logger.error(f"http {url.path} error: {str(e)}")
+                    self.send_error(500)
+                    return
+                self.respond(content_type, body)
+
+            def respond(self, content_type, body):
+                body = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.httpd = ThreadingHTTPServer((self.listen_ip, self.port), Handler)
+        except OSError as e:
+            # protobuf ingest keeps running without the endpoint
+            self.logger.error(f"metrics server {self.listen_ip}:{self.port} failed to start: {e}")
+            return False
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True).start()
+        self.logger.info(f"metrics server: http://{self.listen_ip}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
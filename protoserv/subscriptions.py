@@ -0,0 +1,197 @@
+import re
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+
+# Wildcard routing key part
+ANY = '*'
+
+_OPS = ('eq', 'ne', 'in', 'not_in', 'gt', 'ge', 'lt', 'le', 'contains', 'regex', 'exists')
+
+
+class SubscriptionError(ValueError):
+    pass
+
+
+def source_ip(source: Optional[str]) -> Optional[str]:
+    """'10.0.0.1:4567' -> '10.0.0.1' (routing uses the Apstra source IP only)."""
+    if source is None:
+        return None
+    return source.rsplit(':', 1)[0] if source.count(':') == 1 else source
+
+
+def _get_path(record: dict, path: List[str]):
+    value = record
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            raise KeyError(key)
+        value = value[key]
+    return value
+
+
+def _number(value) -> float:
+    # int64/uint64 fields are strings in the decoded dict
+    return float(value)
+
+
+def compile_predicate(spec: dict) -> Callable[[dict], bool]:
+    """Compiles ``{"path": "perf_mon.interface_counters.interface_name", "op": "eq", "value": "eth0"}``."""
+    if not isinstance(spec, dict) or 'path' not in spec:
+        raise SubscriptionError(f"field predicate requires 'path': {spec}")
+    path = [p for p in str(spec['path']).split('.') if p]
+    op = spec.get('op', 'eq')
+    expected = spec.get('value')
+    if op not in _OPS:
+        raise SubscriptionError(f"unknown op '{op}' - supported: {', '.join(_OPS)}")
+
+    if op == 'exists':
+        def test(value): return True
+    elif op == 'eq':
+        def test(value): return value == expected or str(value) == str(expected)
+    elif op == 'ne':
+        def test(value): return not (value == expected or str(value) == str(expected))
+    elif op in ('in', 'not_in'):
+        if not isinstance(expected, list):
+            raise SubscriptionError(f"op '{op}' requires list value")
+        values = {str(v) for v in expected}
+        if op == 'in':
+            def test(value): return str(value) in values
+        else:
+            def test(value): return str(value) not in values
+    elif op in ('gt', 'ge', 'lt', 'le'):
+        try:
+            limit = _number(expected)
+        except (TypeError, ValueError):
+            raise SubscriptionError(f"op '{op}' requires numeric value")
+        compare = {'gt': float.__gt__, 'ge': float.__ge__, 'lt': float.__lt__, 'le': float.__le__}[op]
+        def test(value): return compare(_number(value), limit)
+    elif op == 'contains':
+        def test(value): return expected in value if isinstance(value, (list, str)) else False
+    else:
+        try:
+            pattern = re.compile(str(expected))
+        except re.error as e:
+            raise SubscriptionError(f"invalid regex: {e}")
+        def test(value): return pattern.search(str(value)) is not None
+
+    def predicate(record: dict) -> bool:
+        try:
+            return test(_get_path(record, path))
+        except (KeyError, TypeError, ValueError):
+            return False
+    return predicate
+
+
+class Subscription:
+    """Compiled client filter.
+
+    Filter spec (all parts optional - missing part matches everything)::
+
+        {"source": ["10.1.1.1"], "type": ["alert", "perf_mon"],
+         "fields": [{"path": "perf_mon.interface_counters.interface_name", "op": "eq", "value": "eth0"}]}
+    """
+    __slots__ = ('spec', 'sources', 'types', 'predicates')
+
+    def __init__(self, spec: Optional[dict] = None):
+        spec = spec or {}
+        if not isinstance(spec, dict):
+            raise SubscriptionError("filter must be an object")
+        self.spec = spec
+        self.sources = self._as_set(spec.get('source'), source_ip)
+        self.types = self._as_set(spec.get('type'), str)
+        fields = spec.get('fields') or []
+        if not isinstance(fields, list):
+            raise SubscriptionError("'fields' must be a list")
+        self.predicates = [compile_predicate(p) for p in fields]
+
+    @staticmethod
+    def _as_set(value, convert) -> Optional[Set[str]]:
+        if value is None or value == ANY:
+            return None
+        if not isinstance(value, list):
+            value = [value]
+        return {convert(v) for v in value}
+
+    def routing_keys(self) -> List[Tuple[str, str]]:
+        return [(s, t) for s in (self.sources or [ANY]) for t in (self.types or [ANY])]
+
+    def match_fields(self, record: dict) -> bool:
+        for predicate in self.predicates:
+            if not predicate(record):
+                return False
+        return True
+
+
+class SubscriptionIndex:
+    """Subscribers indexed by routing key (source IP, message type).
+
+    A subscription is stored under every (source|*, type|*) combination it
+    covers, so a message is matched with 4 dict lookups whatever the number of
+    clients; only candidates with field predicates evaluate them.
+    """
+    def __init__(self):
+        self.index: Dict[Tuple[str, str], Dict[object, Subscription]] = {}
+        self.subscriptions: Dict[object, Subscription] = {}
+        # number of subscriptions filtering by type/fields - those need decoded messages
+        self.filtered = 0
+        # subscriptions without type filter / per type counts (wanted_types)
+        self.untyped = 0
+        self.type_counts: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.subscriptions)
+
+    def set(self, subscriber, subscription: Subscription) -> None:
+        self.remove(subscriber)
+        self.subscriptions[subscriber] = subscription
+        if subscription.types or subscription.predicates:
+            self.filtered += 1
+        if subscription.types is None:
+            self.untyped += 1
+        else:
+            for msg_type in subscription.types:
+                self.type_counts[msg_type] = self.type_counts.get(msg_type, 0) + 1
+        for key in subscription.routing_keys():
+            self.index.setdefault(key, {})[subscriber] = subscription
+
+    def remove(self, subscriber) -> None:
+        subscription = self.subscriptions.pop(subscriber, None)
+        if subscription is None:
+            return
+        if subscription.types or subscription.predicates:
+            self.filtered -= 1
+        if subscription.types is None:
+            self.untyped -= 1
+        else:
+            for msg_type in subscription.types:
+                self.type_counts[msg_type] -= 1
+                if not self.type_counts[msg_type]:
+                    del self.type_counts[msg_type]
+        for key in subscription.routing_keys():
+            bucket = self.index.get(key)
+            if bucket is not None:
+                bucket.pop(subscriber, None)
+                if not bucket:
+                    del self.index[key]
+
+    def wanted_types(self) -> Optional[Set[str]]:
+        """Message types some subscriber wants (``None`` - all types)."""
+        if self.untyped:
+            return None
+        return set(self.type_counts)
+
+    def match(self, source: Optional[str], msg_type: Optional[str], record: Optional[dict] = None) -> list:
+        """Returns subscribers interested in the message."""
+        index = self.index
+        source = source_ip(source) or ANY
+        msg_type = msg_type or ANY
+        result = []
+        # dict.fromkeys - keys collapse when source/type is unknown
+        for key in dict.fromkeys(((source, msg_type), (source, ANY), (ANY, msg_type), (ANY, ANY))):
+            bucket = index.get(key)
+            if not bucket:
+                continue
+            for subscriber, subscription in bucket.items():
+                if subscription.predicates and (record is None or not subscription.match_fields(record)):
+                    continue
+                result.append(subscriber)
+        return result
@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import signal
+import logging
+import selectors
+from typing import Callable, Dict, Optional
+
+
+class _Worker:
+    __slots__ = ('index', 'pid', 'fd', 'pending', 'started', 'restarts', 'restart_at', 'stats', 'reported')
+
+    def __init__(self, index: int):
+        self.index = index
+        self.pid = None
+        self.fd = None
+        self.pending = b''
+        self.started = 0.0
+        self.restarts = 0
+        self.restart_at = None
+        self.stats = None
+        self.reported = 0.0
+
+
+class Supervisor:
+    """Pre-fork supervisor: N worker processes, each with its own ingest/decode pipeline.
+
+    ``run()`` forks the workers and returns the worker index in every child - the
+    caller continues its normal startup there (listening with SO_REUSEPORT, so the
+    kernel spreads connections across the workers). In the supervisor process
+    ``run()`` never returns: it collects the stats workers send with ``report()``,
+    passes them to ``on_report`` every ``interval`` seconds and restarts workers
+    that exit (with backoff for workers that keep crashing right after start).
+    ``stop()`` sends SIGINT to the workers, waits ``shutdown_timeout`` seconds and
+    kills the rest.
+
+    Args:
+        workers (int): Number of worker processes.
+        interval (float): Seconds between ``on_report(workers)`` calls.
+        on_report (callable): ``on_report(list of {'index', 'pid', 'restarts', 'stats'})``.
+        restart_delay (float): First restart delay; doubled (up to max_restart_delay) while a worker crashes
+            within 10 seconds of its start.
+    """
+    def __init__(self, workers: int, interval: float = 5.0, on_report: Optional[Callable] = None,
+                 restart_delay: float = 1.0, max_restart_delay: float = 30.0, shutdown_timeout: float = 10.0,
+                 logger=None):
+        self.workers: Dict[int, _Worker] = {index: _Worker(index) for index in range(workers)}
+        self.interval = interval
+        self.on_report = on_report
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.shutdown_timeout = shutdown_timeout
+        self.logger = logger if logger else logging.getLogger('logger')
+        self.selector = None
+        self.stopping = False
+        # worker side
+        self.worker_index = None
+        self.report_fd = None
+        # rest of a stats line the full pipe took only partially
+        self.report_pending = b''
+        self.parent_pid = os.getpid()
+
+    @property
+    def is_worker(self) -> bool:
+        return self.worker_index is not None
+
+    # -----------------------------------------------
+    # Supervisor process
+    def run(self) -> int:
+        self.selector = selectors.DefaultSelector()
+        for worker in self.workers.values():
+            if self._spawn(worker):
+                return self.worker_index
+        next_report = time.monotonic() + self.interval
+        while True:
+            timeout = max(next_report - time.monotonic(), 0)
+            for key, _ in self.selector.select(timeout=min(timeout, 0.5)):
+                self._read(key.data)
+            if self._reap():
+                return self.worker_index
+            if time.monotonic() >= next_report:
+                next_report += self.interval
+                if self.on_report:
+                    try:
+                        self.on_report(self.get_workers())
+                    except Exception as e:
+                        self.logger.error(f"supervisor report error: {str(e)}")
+
+    def _spawn(self, worker: _Worker) -> bool:
+        """Forks the worker - True in the child."""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            for other in self.workers.values():
+                if other.fd is not None:
+                    os.close(other.fd)
+            self.selector.close()
+            self.selector = None
+            self.worker_index = worker.index
+            # a supervisor that stops reading must not block the worker
+            os.set_blocking(write_fd, False)
+            self.report_fd = write_fd
+            self.parent_pid = os.getppid()
+            return True
+        os.close(write_fd)
+        os.set_blocking(read_fd, False)
+        worker.pid = pid
+        worker.fd = read_fd
+        worker.pending = b''
+        worker.started = time.monotonic()
+        worker.restart_at = None
+        worker.stats = None
+        self.selector.register(read_fd, selectors.EVENT_READ, worker)
+        self.logger.info(f"supervisor: worker {worker.index} started (pid {pid})")
+        return False
+
+    def _read(self, worker: _Worker) -> None:
+        try:
+            data = os.read(worker.fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._close_pipe(worker)
+            return
+        lines = (worker.pending + data).split(b'\n')
+        worker.pending = lines.pop()
+        for line in lines:
+            try:
+                worker.stats = json.loads(line)
+                worker.reported = time.time()
+            except ValueError:
+                pass
+
+    def _close_pipe(self, worker: _Worker) -> None:
+        if worker.fd is not None:
+            self.selector.unregister(worker.fd)
+            os.close(worker.fd)
+            worker.fd = None
+
+    def _reap(self) -> bool:
+        """Collects exited workers and restarts them when due - True in a restarted child."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            for worker in self.workers.values():
+                if worker.pid == pid:
+                    self._exited(worker, status)
+        now = time.monotonic()
+        for worker in self.workers.values():
+            if worker.restart_at is not None and now >= worker.restart_at and not self.stopping:
+                worker.restarts += 1
+                if self._spawn(worker):
+                    return True
+        return False
+
+    def _exited(self, worker: _Worker, status: int) -> None:
+        self._close_pipe(worker)
+        pid = worker.pid
+        worker.pid = None
+        if self.stopping:
+            return
+        if os.WIFSIGNALED(status):
+            reason = f"killed by signal {os.WTERMSIG(status)}"
+        else:
+            reason = f"exit code {os.WEXITSTATUS(status)}"
+        uptime = time.monotonic() - worker.started
+        delay = self.restart_delay
+        if uptime < 10:
+            delay = min(self.restart_delay * 2 ** min(worker.restarts, 10), self.max_restart_delay)
+        worker.restart_at = time.monotonic() + delay
+        self.logger.error(f"supervisor: worker {worker.index} (pid {pid}) {reason} "
+                          f"after {uptime:.1f} s - restart in {delay:.1f} s")
+
+    def get_workers(self) -> list:
+        return [{'index': worker.index, 'pid': worker.pid, 'restarts': worker.restarts, 'stats': worker.stats,
+                 'reported': worker.reported}
+                for worker in self.workers.values()]
+
+    def stop(self) -> None:
+        """SIGINT to all workers, SIGKILL to those still running after shutdown_timeout."""
+        self.stopping = True
+        running = {worker.pid for worker in self.workers.values() if worker.pid}
+        for pid in list(running):
+            try:
+                os.kill(pid, signal.SIGINT)
+            except ProcessLookupError:
+                running.discard(pid)
+        deadline = time.monotonic() + self.shutdown_timeout
+        while running and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                running.discard(pid)
+            else:
+                time.sleep(0.1)
+        for pid in running:
+            self.logger.error(f"supervisor: worker pid {pid} did not stop - killed")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        for worker in self.workers.values():
+            worker.pid = None
+
+    # -----------------------------------------------
+    # Worker process
+    def report(self, stats: dict) -> bool:
+        """Sends the worker stats to the supervisor - False if the supervisor is gone.
+
+        The pipe is non-blocking: stats are skipped while it is full, a partially
+        written line is completed before the next one is sent.
+        """
+        if os.getppid() != self.parent_pid:
+            return False
+        try:
+            if self.report_pending:
+                self.report_pending = self.report_pending[os.write(self.report_fd, self.report_pending):]
+                if self.report_pending:
+                    return True
+            line = json.dumps(stats).encode('utf-8') + b'\n'
+            self.report_pending = line[os.write(self.report_fd, line):]
+        except BrokenPipeError:
+            return False
+        except BlockingIOError:
+            pass
+        return True
+
+
+def worker_path(path: str, index: int) -> str:
+    """Per worker file path: data/protoserv.data.log -> data/protoserv.data.w0.log"""
+    if not path:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}.w{index}{extension}"
@@ -0,0 +1,216 @@
+import time
+import socket
+import logging
+import selectors
+import threading
+from typing import Callable, Optional
+
+
+# Adaptive read size bounds (bytes per recv_into)
+INGEST_READ_MIN = 16 * 1024
+INGEST_READ_MAX = 1024 * 1024
+
+# accept() failure (ie. EMFILE): seconds the listen socket is left alone, seconds between error logs
+ACCEPT_BACKOFF = 0.1
+ACCEPT_ERROR_LOG_INTERVAL = 10
+
+
+class ReadSizer:
+    """Read size that follows the throughput of a connection.
+
+    A read that fills the whole request doubles the next one (the socket had
+    more queued), reads that keep using less than a quarter of it halve it, so
+    a busy stream is drained with few large reads while an idle one does not
+    reserve megabytes of session memory.
+    """
+    __slots__ = ('size', 'min_size', 'max_size', 'small')
+
+    def __init__(self, min_size: int = INGEST_READ_MIN, max_size: int = INGEST_READ_MAX):
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size)
+        self.size = min_size
+        self.small = 0
+
+    def update(self, received: int) -> None:
+        if received >= self.size:
+            self.size = min(self.size * 2, self.max_size)
+            self.small = 0
+        elif received < self.size // 4 and self.size > self.min_size:
+            self.small += 1
+            if self.small >= 8:
+                self.size = max(self.size // 2, self.min_size)
+                self.small = 0
+        else:
+            self.small = 0
+
+
+class SocketOptions:
+    """Socket options of the protobuf connections.
+
+    Args:
+        rcvbuf (int): SO_RCVBUF in bytes, set on the listening socket before listen() so
+            accepted connections inherit it with a matching TCP window scale
+            (0 - kernel default with receive buffer autotuning).
+        keepalive (bool): TCP keepalive - detects Apstra nodes that went away without a FIN.
+        keepidle (int): Idle seconds before the first keepalive probe.
+        keepintvl (int): Seconds between keepalive probes.
+        keepcnt (int): Unanswered probes before the connection is dropped.
+        idle_timeout (float): Close connections that send nothing for this many seconds (0 - never).
+    """
+    def __init__(self, rcvbuf: int = 0, keepalive: bool = True, keepidle: int = 60, keepintvl: int = 10,
+                 keepcnt: int = 6, idle_timeout: float = 0):
+        self.rcvbuf = rcvbuf
+        self.keepalive = keepalive
+        self.keepidle = keepidle
+        self.keepintvl = keepintvl
+        self.keepcnt = keepcnt
+        self.idle_timeout = idle_timeout
+
+    def apply_listener(self, sock) -> None:
+        if self.rcvbuf > 0:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+
+    def apply(self, sock) -> None:
+        """Per connection options (keepalive) - the receive buffer comes from the listener."""
+        if not self.keepalive:
+            return
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for name, value in (('TCP_KEEPIDLE', self.keepidle), ('TCP_KEEPINTVL', self.keepintvl),
+                            ('TCP_KEEPCNT', self.keepcnt)):
+            option = getattr(socket, name, None)
+            if option is not None and value > 0:
+                sock.setsockopt(socket.IPPROTO_TCP, option, value)
+
+
+def create_listen_socket(listen_ip: str, port: int, backlog: int = 128, reuse_port: bool = False,
+                         options: Optional[SocketOptions] = None) -> socket.socket:
+    """Non-blocking TCP listening socket (SO_REUSEADDR, optionally SO_REUSEPORT and SO_RCVBUF)."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if options:
+            options.apply_listener(sock)
+        sock.bind((listen_ip, int(port)))
+        sock.listen(backlog)
+        sock.setblocking(False)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+class TCPListener:
+    """Event driven accept loop (selectors - epoll on Linux) of the thread ingest mode.
+
+    The accept thread sleeps in ``select`` until a connection is pending, then
+    accepts everything queued in the backlog and passes each connection
+    (blocking, with ``options`` applied) to ``on_accept(client_socket, address)``.
+    ``stop()`` wakes the thread through a socketpair - no timeout polling.
+    When ``accept`` fails (ie. out of file descriptors) the pending connection
+    stays in the backlog, so the listen socket is unregistered for
+    ``ACCEPT_BACKOFF`` seconds instead of spinning on it, and the error is
+    logged at most once per ``ACCEPT_ERROR_LOG_INTERVAL`` seconds.
+
+    Args:
+        listen_ip (str): IP address to listen on.
+        port (int): TCP port to listen on.
+        on_accept (callable): ``on_accept(client_socket, (client_ip, client_port))``.
+        backlog (int): listen() backlog - connections the kernel queues until they are accepted.
+        reuse_port (bool): Bind with SO_REUSEPORT (several worker processes share the port).
+        options (SocketOptions): Receive buffer and keepalive settings.
+    """
+    def __init__(self, listen_ip: str, port: int, on_accept: Callable, backlog: int = 128,
+                 reuse_port: bool = False, options: Optional[SocketOptions] = None, logger=None):
+        self.listen_ip = listen_ip
+        self.listen_port = int(port)
+        self.on_accept = on_accept
+        self.backlog = backlog
+        self.reuse_port = reuse_port
+        self.options = options if options else SocketOptions()
+        self.logger = logger if logger else logging.getLogger('logger')
+        self.sock = None
+        self.selector = None
+        self.thread = None
+        self.wakeup = None
+        self.stopping = False
+        # monotonic time the listen socket is registered again (accept backoff)
+        self.resume_at = None
+        self.error_logged_at = None
+        self.errors_suppressed = 0
+        # Stats
+        self.accepted = 0
+        self.accept_errors = 0
+
+    def start(self):
+        self.sock = create_listen_socket(self.listen_ip, self.listen_port, self.backlog, self.reuse_port,
+                                         self.options)
+        self.wakeup = socket.socketpair()
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ)
+        self.selector.register(self.wakeup[0], selectors.EVENT_READ)
+        self.thread = threading.Thread(target=self._run, name="accept", daemon=True)
+        self.thread.start()
+        self.logger.info(f"protobuf server: {self.listen_ip}:{self.listen_port} (backlog {self.backlog})")
+        return self
+
+    def _run(self):
+        while not self.stopping:
+            timeout = None
+            if self.resume_at is not None:
+                timeout = self.resume_at - time.monotonic()
+                if timeout <= 0:
+                    self.selector.register(self.sock, selectors.EVENT_READ)
+                    self.resume_at = None
+                    timeout = None
+            for key, _ in self.selector.select(timeout):
+                if key.fileobj is self.sock:
+                    self._accept_pending()
+        self.selector.close()
+        self.sock.close()
+
+    def _accept_pending(self):
+        while True:
+            try:
+                client_socket, address = self.sock.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                # ie. EMFILE - leave the connection in the backlog for the next round
+                self._accept_failed(e)
+                return
+            try:
+                client_socket.setblocking(True)
+                self.options.apply(client_socket)
+                self.accepted += 1
+                self.on_accept(client_socket, address)
+            except Exception as e:
+                self.logger.error(f"accept_connections error: {str(e)}")
+                client_socket.close()
+
+    def _accept_failed(self, error: OSError):
+        self.accept_errors += 1
+        self.selector.unregister(self.sock)
+        self.resume_at = time.monotonic() + ACCEPT_BACKOFF
+        now = time.monotonic()
+        if self.error_logged_at is not None and now - self.error_logged_at < ACCEPT_ERROR_LOG_INTERVAL:
+            self.errors_suppressed += 1
+            return
+        suppressed = f" ({self.errors_suppressed} more since the last report)" if self.errors_suppressed else ""
+        self.logger.error(f"accept_connections error: {str(error)}{suppressed}")
+        self.error_logged_at = now
+        self.errors_suppressed = 0
+
+    def stop(self, timeout: float = 5):
+        if self.thread is None:
+            return
+        self.stopping = True
+        try:
+            self.wakeup[1].send(b'\0')
+        except OSError:
+            pass
+        self.thread.join(timeout)
+        self.thread = None
+        for sock in self.wakeup:
+            sock.close()
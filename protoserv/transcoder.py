@@ -0,0 +1,150 @@
+import math
+import base64
+
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.json_format import MessageToDict
+from google.protobuf.internal.type_checkers import ToShortestFloat
+
+from .decoder import field_is_map, field_is_repeated, parse_frame
+
+
+_INT64_TYPES = (FieldDescriptor.CPPTYPE_INT64, FieldDescriptor.CPPTYPE_UINT64)
+_INF = float('inf')
+_NINF = float('-inf')
+
+
+def _float_special(value):
+    if math.isnan(value):
+        return 'NaN'
+    return 'Infinity' if value > 0 else '-Infinity'
+
+def _double(value):
+    if _NINF < value < _INF:
+        return value
+    return _float_special(value)
+
+def _float(value):
+    if _NINF < value < _INF:
+        return ToShortestFloat(value)
+    return _float_special(value)
+
+def _b64(value) -> str:
+    return base64.b64encode(value).decode('utf-8')
+
+def _map_key(key) -> str:
+    if isinstance(key, bool):
+        return 'true' if key else 'false'
+    return str(key)
+
+class Transcoder:
+    """Descriptor driven protobuf -> dict/JSON converter for AosMessage/AosSequencedMessage.
+
+    At startup one converter function is generated (and compiled) per message type
+    reachable from the schema root messages. The result is identical to
+    ``MessageToDict(message, preserving_proto_field_name=True)``; well-known types
+    and extensions are delegated to ``MessageToDict``.
+
+    Args:
+        schema: Loaded streaming_telemetry_schema_pb2 module.
+        roots (tuple): Names of root message types.
+    """
+    def __init__(self, schema, roots=('AosMessage', 'AosSequencedMessage')):
+        self.schema = schema
+        self.converters = {}
+        self.source = []
+        self._names = {}
+        self._compiled = set()
+        self._namespace = {
+            '_double': _double, '_float': _float, '_b64': _b64, '_map_key': _map_key,
+            '_slow': self._slow,
+        }
+        for root in roots:
+            if hasattr(schema, root):
+                self._compile(getattr(schema, root).DESCRIPTOR)
+        exec(compile("\n".join(self.source), f"<transcoder {schema.__name__}>", "exec"), self._namespace)
+        for full_name, function_name in self._names.items():
+            self.converters[full_name] = self._namespace[function_name]
+
+    # -----------------------------------------------
+    # Code generation
+    def _function_name(self, descriptor) -> str:
+        if descriptor.full_name not in self._names:
+            self._names[descriptor.full_name] = f"_m{len(self._names)}_{descriptor.name}"
+        return self._names[descriptor.full_name]
+
+    def _value_expr(self, field, var: str) -> str:
+        """Python expression converting a single (non repeated) value of the field."""
+        cpp_type = field.cpp_type
+        if cpp_type == FieldDescriptor.CPPTYPE_MESSAGE:
+            if field.message_type.full_name.startswith('google.protobuf.'):
+                return f"_slow({var})"
+            return f"{self._compile(field.message_type)}({var})"
+        if cpp_type == FieldDescriptor.CPPTYPE_ENUM:
+            enum_name = "_e_" + field.enum_type.full_name.replace('.', '_')
+            if enum_name not in self._namespace:
+                self._namespace[enum_name] = {value.number: value.name for value in field.enum_type.values}
+            return f"{enum_name}.get({var}, {var})"
+        if cpp_type in _INT64_TYPES:
+            return f"str({var})"
+        if cpp_type == FieldDescriptor.CPPTYPE_DOUBLE:
+            return f"_double({var})"
+        if cpp_type == FieldDescriptor.CPPTYPE_FLOAT:
+            return f"_float({var})"
+        if field.type == FieldDescriptor.TYPE_BYTES:
+            return f"_b64({var})"
+        return var
+
+    def _field_expr(self, field) -> str:
+        if field_is_map(field):
+            value_field = field.message_type.fields_by_name['value']
+            return f"{{_map_key(k): {self._value_expr(value_field, 'v[k]')} for k in v}}"
+        if field_is_repeated(field):
+            expr = self._value_expr(field, 'x')
+            return "list(v)" if expr == 'x' else f"[{expr} for x in v]"
+        return self._value_expr(field, 'v')
+
+    def _compile(self, descriptor) -> str:
+        name = self._function_name(descriptor)
+        if name in self._compiled:
+            return name
+        # mark before walking nested types (recursive messages)
+        self._compiled.add(name)
+        body = [f"def {name}(msg):", "    d = {}", "    for f, v in msg.ListFields():", "        n = f.number"]
+        keyword = "if"
+        for field in sorted(descriptor.fields, key=lambda f: f.number):
+            body.append(f"        {keyword} n == {field.number}:")
+            body.append(f"            d[{field.name!r}] = {self._field_expr(field)}")
+            keyword = "elif"
+        # extensions - not known at startup
+        body.append("        else:" if keyword == "elif" else "        if True:")
+        body.append("            return _slow(msg)")
+        body.append("    return d")
+        body.append("")
+        self.source.extend(body)
+        return name
+
+    # -----------------------------------------------
+    # Slow path (well-known types / extensions)
+    def _slow(self, message) -> dict:
+        return MessageToDict(message, preserving_proto_field_name=True)
+
+    # -----------------------------------------------
+    def to_dict(self, message) -> dict:
+        """Same as ``MessageToDict(message, preserving_proto_field_name=True)``."""
+        return self.converters[message.DESCRIPTOR.full_name](message)
+
+    def message_to_dict(self, message, context=None) -> dict:
+        """Same as ``protoserv.decoder.message_to_dict`` (nested aos_proto unpacked, seq_num injected)."""
+        result_dict = self.converters[message.DESCRIPTOR.full_name](message)
+
+        if 'aos_proto' in result_dict and 'seq_num' in result_dict:
+            nested_message = parse_frame(self.schema, message.aos_proto, "unsequenced", context)
+            seq = result_dict['seq_num']
+            # nested AosMessage has no aos_proto - converted directly, not through the (span wrapped) message_to_dict
+            result_dict = self.to_dict(nested_message)
+            result_dict['seq_num'] = seq
+
+        if 'seq_num' not in result_dict:
+            result_dict['seq_num'] = 0
+
+        return result_dict
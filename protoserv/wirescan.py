@@ -0,0 +1,197 @@
+from collections import namedtuple
+from typing import Dict, Optional
+
+
+# Wire types
+WIRE_VARINT = 0
+WIRE_FIXED64 = 1
+WIRE_LENGTH_DELIMITED = 2
+WIRE_FIXED32 = 5
+
+
+# First uint64 of an unsequenced frame is the AosMessage timestamp (microseconds),
+# of a sequenced one the seq_num - anything above this is taken as a timestamp
+STREAM_MODE_TIMESTAMP_MIN = 1700000000000000
+
+# Routing keys of a single frame (seq_num is None for unsequenced stream).
+# start/end - bounds of the (nested) AosMessage in the frame payload
+RoutingKey = namedtuple('RoutingKey', ('seq_num', 'timestamp', 'msg_type', 'start', 'end'))
+
+
+def decode_varint(byte_stream, pos: int):
+    """(value, new position) of the varint at pos - tags and lengths are mostly single byte."""
+    try:
+        b = byte_stream[pos]
+        if b < 0x80:
+            return b, pos + 1
+        result = b & 0x7F
+        shift = 7
+        pos += 1
+        while True:
+            b = byte_stream[pos]
+            pos += 1
+            result |= (b & 0x7F) << shift
+            if b < 0x80:
+                return result, pos
+            shift += 7
+            if shift >= 64:
+                raise ValueError("Too many bytes when decoding varint")
+    except IndexError:
+        raise ValueError("Truncated varint") from None
+
+
+def skip_field(byte_stream, pos: int, wire_type: int) -> int:
+    """Returns position after the value of a field with wire_type starting at pos."""
+    if wire_type == WIRE_VARINT:
+        _, pos = decode_varint(byte_stream, pos)
+    elif wire_type == WIRE_LENGTH_DELIMITED:
+        field_length, pos = decode_varint(byte_stream, pos)
+        pos += field_length
+    elif wire_type == WIRE_FIXED64:
+        pos += 8
+    elif wire_type == WIRE_FIXED32:
+        pos += 4
+    else:
+        # groups (3/4) are not used by the Apstra schema
+        raise ValueError(f"Unsupported wire type {wire_type}")
+    if pos > len(byte_stream):
+        raise ValueError("Truncated message")
+    return pos
+
+
+def decode_first_uint64_field(byte_stream):
+    """Decode the first uint64 field from a byte stream."""
+    pos = 0
+    end = len(byte_stream)
+    while pos < end:
+        field_wire_type, pos = decode_varint(byte_stream, pos)
+        if field_wire_type == 0x08:  # field 1, varint
+            uint64_value, pos = decode_varint(byte_stream, pos)
+            return uint64_value
+        pos = skip_field(byte_stream, pos, field_wire_type & 0x07)
+    raise ValueError("No uint64 field found")
+
+
+def recognize_stream_mode(msg_bytes) -> str:
+    """'sequenced' or 'unsequenced' from the first frame of a connection (ValueError on garbage)."""
+    if decode_first_uint64_field(msg_bytes) > STREAM_MODE_TIMESTAMP_MIN:
+        return 'unsequenced'
+    return 'sequenced'
+
+
+def decode_length_delimited_field(byte_stream, field_number):
+    """Returns the first length-delimited field with field_number (None if not present)."""
+    pos = 0
+    end = len(byte_stream)
+    while pos < end:
+        field_wire_type, pos = decode_varint(byte_stream, pos)
+        if field_wire_type == (field_number << 3) | WIRE_LENGTH_DELIMITED:
+            field_length, pos = decode_varint(byte_stream, pos)
+            return byte_stream[pos:pos + field_length]
+        pos = skip_field(byte_stream, pos, field_wire_type & 0x07)
+    return None
+
+
+class WireScanner:
+    """Routing keys straight from the frame bytes - no ParseFromString.
+
+    Field numbers are taken from the schema descriptors once; the scanner then
+    compares whole tags (field number + wire type), so a frame is walked with a
+    single varint decode per field and nested messages are skipped, not parsed.
+    """
+    def __init__(self, schema):
+        sequenced = schema.AosSequencedMessage.DESCRIPTOR
+        message = schema.AosMessage.DESCRIPTOR
+        self.seq_num_tag = (sequenced.fields_by_name['seq_num'].number << 3) | WIRE_VARINT
+        self.aos_proto_tag = (sequenced.fields_by_name['aos_proto'].number << 3) | WIRE_LENGTH_DELIMITED
+        self.timestamp_tag = (message.fields_by_name['timestamp'].number << 3) | WIRE_VARINT
+        # tag of every top-level oneof member -> message type (perf_mon, alert, event, ...)
+        self.type_tags: Dict[int, str] = {}
+        for oneof in message.oneofs:
+            for field in oneof.fields:
+                self.type_tags[(field.number << 3) | WIRE_LENGTH_DELIMITED] = field.name
+        self.types = frozenset(self.type_tags.values())
+
+    def aos_message(self, payload, stream_mode: str):
+        """(seq_num, start, end) of the AosMessage in the frame payload."""
+        if stream_mode != "sequenced":
+            return None, 0, len(payload)
+        seq_num_tag = self.seq_num_tag
+        aos_proto_tag = self.aos_proto_tag
+        seq_num = None
+        start = end = None
+        pos = 0
+        size = len(payload)
+        try:
+            while pos < size:
+                tag = payload[pos]
+                if tag < 0x80:
+                    pos += 1
+                else:
+                    tag, pos = decode_varint(payload, pos)
+                if tag == seq_num_tag:
+                    seq_num, pos = decode_varint(payload, pos)
+                elif tag == aos_proto_tag:
+                    length, pos = decode_varint(payload, pos)
+                    start, end = pos, pos + length
+                    if end > size:
+                        raise ValueError("Truncated message")
+                    pos = end
+                else:
+                    pos = skip_field(payload, pos, tag & 0x07)
+                if seq_num is not None and start is not None:
+                    break
+        except IndexError:
+            raise ValueError("Truncated message") from None
+        if start is None:
+            raise ValueError("No aos_proto field found")
+        return seq_num, start, end
+
+    def scan(self, payload, stream_mode: str) -> RoutingKey:
+        """Routing keys of a frame payload (without the 2 byte length prefix) - ValueError if it is malformed."""
+        seq_num, start, end = self.aos_message(payload, stream_mode)
+        timestamp_tag = self.timestamp_tag
+        type_tags = self.type_tags
+        timestamp = None
+        msg_type = None
+        pos = start
+        try:
+            while pos < end:
+                tag = payload[pos]
+                if tag < 0x80:
+                    pos += 1
+                else:
+                    tag, pos = decode_varint(payload, pos)
+                if tag == timestamp_tag:
+                    timestamp, pos = decode_varint(payload, pos)
+                elif tag & 0x07 == WIRE_LENGTH_DELIMITED:
+                    if msg_type is None:
+                        msg_type = type_tags.get(tag)
+                    length = payload[pos]
+                    if length < 0x80:
+                        pos += 1 + length
+                    else:
+                        length, pos = decode_varint(payload, pos)
+                        pos += length
+                else:
+                    pos = skip_field(payload, pos, tag & 0x07)
+                if timestamp is not None and msg_type is not None:
+                    break
+        except IndexError:
+            raise ValueError("Truncated message") from None
+        if pos > end:
+            raise ValueError("Truncated message")
+        return RoutingKey(seq_num, timestamp, msg_type, start, end)
+
+    def msg_type(self, payload, stream_mode: str) -> Optional[str]:
+        return self.scan(payload, stream_mode).msg_type
+
+
+_scanners = {}
+
+def scanner_for(schema) -> WireScanner:
+    """WireScanner of a loaded schema module (built once)."""
+    scanner = _scanners.get(schema.__name__)
+    if scanner is None:
+        scanner = _scanners[schema.__name__] = WireScanner(schema)
+    return scanner
@@ -1,19 +1,27 @@
+import json
 import asyncio
 import threading
 import websockets
 import logging
+from collections import deque, Counter
+from urllib.parse import urlparse, parse_qs
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
 from websockets.legacy.server import WebSocketServerProtocol
 from typing import Set
 
 from typing import Union
 from dataclasses import dataclass
 
+from .subscriptions import Subscription, SubscriptionIndex, SubscriptionError
+
 @dataclass
 class ClientStats:
     ip: str
     port: int
     rx: int = 0
     tx: int = 0
+    queue_depth: int = 0
+    dropped: int = 0
     
     def __post_init__(self):
         if self.rx is None:
@@ -25,23 +33,157 @@ class AddressAlreadyInUseError(Exception):
     pass
 
 
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "disconnect")
+OUTPUT_MODES = ("json", "ndjson", "raw")
+LOCAL_ADDRESSES = ("127.0.0.1", "::1")
+
+
+class Standalone:
+    """Message that is never batched (control responses, relayed messages)."""
+    __slots__ = ('payload',)
+
+    def __init__(self, payload):
+        self.payload = payload
+
+
+class ClientChannel:
+    """Bounded outbound queue + writer task of a single WebSocket client.
+
+    Lives on the server event loop. ``put`` never blocks - when the queue is full
+    the overflow policy decides: drop_oldest, drop_newest or disconnect the client.
+
+    Output modes:
+        json   - one JSON text frame per message
+        ndjson - JSON messages joined with new line, one text frame per batch
+        raw    - 2 byte length prefixed protobuf frames (as received from Apstra), one binary frame per batch
+
+    A batch is flushed when ``batch_size`` messages are queued or ``batch_interval``
+    seconds after its first message.
+    """
+    def __init__(self, websocket: WebSocketServerProtocol, max_size=1000, overflow_policy="drop_oldest", on_sent=None,
+                 mode="json", batch_size=1, batch_interval=0.0):
+        self.websocket = websocket
+        self.queue = deque()
+        self.max_size = max_size
+        self.overflow_policy = overflow_policy
+        self.on_sent = on_sent
+        self.dropped = 0
+        self.closed = False
+        self.event = asyncio.Event()
+        self.full = asyncio.Event()
+        self.task = None
+        self.set_mode(mode, batch_size, batch_interval)
+
+    def set_mode(self, mode="json", batch_size=1, batch_interval=0.0):
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"Invalid mode. Choose one of: {', '.join(OUTPUT_MODES)}")
+        batch_size = max(int(batch_size), 1)
+        if mode == "json":
+            batch_size = 1
+        elif mode == "ndjson" and batch_size == 1:
+            batch_size = 100
+        self.mode = mode
+        self.batch_size = batch_size
+        self.batch_interval = max(float(batch_interval), 0.0)
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.writer())
+
+    def stop(self):
+        self.closed = True
+        if self.task:
+            self.task.cancel()
+
+    def put(self, message) -> bool:
+        if self.closed:
+            return False
+        if len(self.queue) >= self.max_size:
+            self.dropped += 1
+            if self.overflow_policy == "drop_newest":
+                return False
+            elif self.overflow_policy == "disconnect":
+                self.closed = True
+                self.queue.clear()
+                asyncio.get_running_loop().create_task(self.websocket.close(1013, "client too slow"))
+                return False
+            else:
+                self.queue.popleft()
+        self.queue.append(message)
+        self.event.set()
+        if len(self.queue) >= self.batch_size or isinstance(message, Standalone):
+            self.full.set()
+        return True
+
+    def _next_payload(self):
+        # returns (payload, number of messages)
+        queue = self.queue
+        if isinstance(queue[0], Standalone):
+            return queue.popleft().payload, 1
+        if self.batch_size == 1:
+            return queue.popleft(), 1
+        items = []
+        while queue and len(items) < self.batch_size and not isinstance(queue[0], Standalone):
+            items.append(queue.popleft())
+        if self.mode == "raw":
+            return b"".join(items), len(items)
+        return "\n".join(items), len(items)
+
+    async def writer(self):
+        try:
+            while not self.closed:
+                await self.event.wait()
+                self.event.clear()
+                while self.queue and not self.closed:
+                    if self.batch_size > 1 and len(self.queue) < self.batch_size and self.batch_interval > 0:
+                        # give the batch a chance to fill up
+                        self.full.clear()
+                        try:
+                            await asyncio.wait_for(self.full.wait(), self.batch_interval)
+                        except asyncio.TimeoutError:
+                            pass
+                        if not self.queue:
+                            break
+                    payload, count = self._next_payload()
+                    await self.websocket.send(payload)
+                    if self.on_sent:
+                        self.on_sent(self.websocket, count)
+        except websockets.ConnectionClosed:
+            self.closed = True
 
 
 class WSServer:
-    def __init__(self, listen_ip="0.0.0.0", port=8765, logger=None):
+    def __init__(self, listen_ip="0.0.0.0", port=8765, logger=None, queue_size=1000, overflow_policy="drop_oldest",
+                 compression="deflate", compression_level=6, compression_window_bits=12, compression_mem_level=5):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Invalid overflow_policy. Choose one of: {', '.join(OVERFLOW_POLICIES)}")
         self.msg_counter = {}
+        self.compression = compression
+        self.compression_level = compression_level
+        self.compression_window_bits = compression_window_bits
+        self.compression_mem_level = compression_mem_level
+        self.mode_count = Counter()
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.channels = {}
+        self.subscriptions = SubscriptionIndex()
+        self.commands = {}
+        self.snapshot_provider = None
+        self._inbox = deque()
+        self._wakeup_pending = False
         self.listen_ip = listen_ip
         self.listen_port = port
         self.shutdown_flag = False
         self.server_thread = None
         self.server_running = False
+        self.loop = None
+        self.loop_ready = threading.Event()
         self.connected_clients:Set[WebSocketServerProtocol] = set()
         self.logger = logger if logger else self._create_default_logger()
 
     async def websocket_server(self):
         try:
             self.logger.info(f"ws server: {self.listen_ip}:{self.listen_port}")
-            async with websockets.serve(self.handler, self.listen_ip, self.listen_port):
+            async with websockets.serve(self.handler, self.listen_ip, self.listen_port, **self._serve_options()):
                 self.server_running = True
                 while not self.shutdown_flag:
                     await asyncio.sleep(1)
@@ -51,50 +193,221 @@ class WSServer:
             self.logger.error(f"Failed to start server: {e}")
             raise AddressAlreadyInUseError("Address already in use.")
             
-    async def handler(self, incoming_websocket: WebSocketServerProtocol, path: str):
+    def _serve_options(self) -> dict:
+        # permessage-deflate is negotiated per connection during the WebSocket handshake
+        if self.compression != "deflate":
+            return {'compression': None}
+        return {
+            'compression': None,
+            'extensions': [ServerPerMessageDeflateFactory(
+                server_max_window_bits=self.compression_window_bits,
+                compress_settings={'level': self.compression_level, 'memLevel': self.compression_mem_level},
+            )],
+        }
+
+    @staticmethod
+    def _request_query(incoming_websocket, path) -> dict:
+        if path is None:
+            request = getattr(incoming_websocket, 'request', None)
+            path = getattr(request, 'path', None) or getattr(incoming_websocket, 'path', None) or ''
+        return parse_qs(urlparse(path).query)
+
+    @staticmethod
+    def _request_options(query: dict) -> dict:
+        # ws://host:8765/?mode=ndjson&batch_size=500&batch_interval=0.5
+        options = {}
+        for key in ('mode', 'batch_size', 'batch_interval'):
+            if key in query:
+                options[key] = query[key][0]
+        return options
+
+    async def handler(self, incoming_websocket: WebSocketServerProtocol, path: str = None):
+        channel = ClientChannel(incoming_websocket, self.queue_size, self.overflow_policy, on_sent=self._on_sent)
+        query = self._request_query(incoming_websocket, path)
+        try:
+            channel.set_mode(**self._request_options(query))
+        except ValueError as e:
+            self.logger.error(f"ws client: {incoming_websocket.remote_address[:2]} - invalid output mode: {e}")
+        channel.start()
+        self.mode_count[channel.mode] += 1
+        self.channels[incoming_websocket] = channel
+        # no filter until the client subscribes - everything is sent
+        self.subscriptions.set(channel, Subscription())
         self.connected_clients.add(incoming_websocket)
-        client_ip, client_port = incoming_websocket.remote_address
+        client_ip, client_port = incoming_websocket.remote_address[:2]
         self.logger.info(f"> ws client: {client_ip}:{client_port} - incomming connection")
+        # latest state first when asked for (ws://host:8765/?snapshot=1) - live messages only by default
+        if self.snapshot_provider and query.get('snapshot', ['0'])[0] in ('1', 'true', 'yes'):
+            channel.put(Standalone(self.snapshot(self.subscriptions.subscriptions[channel])))
         try:
             async for message in incoming_websocket:
                 self.logger.debug(f"ws client: {client_ip}:{client_port} - received msg: {message}")
                 await self.msg_handler(incoming_websocket, message)
+        except websockets.ConnectionClosed:
+            pass
         finally:
             self.logger.info(f"   > ws client disconnected: {client_ip}:{client_port} - disconnected")
-            self.connected_clients.remove(incoming_websocket)
+            self.connected_clients.discard(incoming_websocket)
+            self.channels.pop(incoming_websocket, None)
+            self.subscriptions.remove(channel)
+            self.mode_count[channel.mode] -= 1
+            channel.stop()
         
     async def msg_handler(self, incoming_websocket: WebSocketServerProtocol, message):
         # Only allow send message from localhost connected websocket
         # all othere ignore / log
-        incoming_client_ip, incoming_client_port = incoming_websocket.remote_address
+        incoming_client_ip, incoming_client_port = incoming_websocket.remote_address[:2]
         self.client_stats_update(incoming_client_ip, incoming_client_port, "rx")
+        control = self._parse_control_message(message)
+        if control is not None:
+            # subscription control messages are accepted from all clients
+            self.control_handler(incoming_websocket, control)
+            return
         if incoming_client_ip != '127.0.0.1':
             self.logger.error(f"websocket msg from {incoming_client_ip}:{incoming_client_port} not allowed - msg: {message}")
             return
         else:
-            for client_websocket in self.connected_clients:
-                client_ip, client_port = client_websocket.remote_address
+            for client_websocket, channel in list(self.channels.items()):
                 if incoming_websocket != client_websocket:
-                    self.client_stats_update(client_ip, client_port, "tx")
-                    self.logger.debug(f"websocket msg from {incoming_client_ip}:{incoming_client_port}->{client_ip}:{client_port} - msg: {message}")
-                    await client_websocket.send(message)
+                    self.logger.debug(f"websocket msg from {incoming_client_ip}:{incoming_client_port}->{client_websocket.remote_address[:2]} - msg: {message}")
+                    channel.put(Standalone(message))
     
-    async def send_message(self, message):
-        # this is python method for send message to all connected clientts
-        for client_websocket in self.connected_clients:
-            client_ip, client_port = client_websocket.remote_address
-            self.client_stats_update(client_ip, client_port, "tx")
-            # Get the event loop associated with the current thread
-            loop = asyncio.get_event_loop()
-            # Use the event loop to send the message
-            await loop.create_task(client_websocket.send(message))
+    @staticmethod
+    def _parse_control_message(message):
+        # {"action": "subscribe", "filter": {...}} | {"action": "unsubscribe"} | {"action": "subscription"}
+        if not isinstance(message, str) or not message.lstrip().startswith('{'):
+            return None
+        try:
+            control = json.loads(message)
+        except ValueError:
+            return None
+        if isinstance(control, dict) and 'action' in control:
+            return control
+        return None
+
+    def control_handler(self, incoming_websocket: WebSocketServerProtocol, control: dict):
+        channel = self.channels.get(incoming_websocket)
+        if channel is None:
+            return
+        client_ip, client_port = incoming_websocket.remote_address[:2]
+        action = control.get('action')
+        try:
+            if action == 'subscribe':
+                subscription = Subscription(control.get('filter'))
+                self.subscriptions.set(channel, subscription)
+                self.logger.info(f"   > ws client: {client_ip}:{client_port} - subscribe: {json.dumps(subscription.spec)}")
+                response = {'action': 'subscribed', 'filter': subscription.spec}
+            elif action == 'unsubscribe':
+                self.subscriptions.set(channel, Subscription())
+                response = {'action': 'unsubscribed'}
+            elif action == 'subscription':
+                response = {'action': 'subscription', 'filter': self.subscriptions.subscriptions[channel].spec}
+            elif action == 'mode':
+                # {"action": "mode", "mode": "ndjson", "batch_size": 500, "batch_interval": 0.5}
+                old_mode = channel.mode
+                try:
+                    channel.set_mode(control.get('mode', 'json'), control.get('batch_size', 1), control.get('batch_interval', 0.0))
+                except (TypeError, ValueError) as e:
+                    raise SubscriptionError(str(e))
+                self.mode_count[old_mode] -= 1
+                self.mode_count[channel.mode] += 1
+                self.logger.info(f"   > ws client: {client_ip}:{client_port} - mode: {channel.mode} batch: {channel.batch_size}/{channel.batch_interval}s")
+                response = {'action': 'mode', 'mode': channel.mode, 'batch_size': channel.batch_size, 'batch_interval': channel.batch_interval}
+            elif action == 'snapshot':
+                # {"action": "snapshot"} - current subscription, {"action": "snapshot", "filter": {...}} - other filter
+                if self.snapshot_provider is None:
+                    raise SubscriptionError("snapshot is not available (last value cache disabled)")
+                if 'filter' in control:
+                    subscription = Subscription(control.get('filter'))
+                else:
+                    subscription = self.subscriptions.subscriptions[channel]
+                response = self.snapshot(subscription)
+            elif action in self.commands:
+                if client_ip not in LOCAL_ADDRESSES:
+                    raise SubscriptionError(f"action '{action}' is allowed from localhost only")
+                response = self.commands[action](control)
+            else:
+                raise SubscriptionError(f"unknown action '{action}'")
+        except (SubscriptionError, ValueError, TypeError) as e:
+            response = {'action': action, 'error': str(e)}
+        channel.put(Standalone(response if isinstance(response, str) else json.dumps(response)))
+
+    def set_snapshot_provider(self, provider) -> None:
+        """``provider(subscription) -> [JSON message, ...]`` - latest state sent on connect and on request."""
+        self.snapshot_provider = provider
+
+    def snapshot(self, subscription: Subscription) -> str:
+        """Single batch with all snapshot messages matching the subscription (messages are already JSON)."""
+        messages = self.snapshot_provider(subscription)
+        return '{"action": "snapshot", "count": %d, "messages": [%s]}' % (len(messages), ", ".join(messages))
+
+    def register_command(self, action: str, handler) -> None:
+        """Adds localhost only control action - ``handler(control) -> response dict`` runs in the event loop."""
+        self.commands[action] = handler
+
+    def wants_json(self) -> bool:
+        """True if some connected client needs decoded (JSON) messages."""
+        return self.mode_count["json"] > 0 or self.mode_count["ndjson"] > 0
+
+    def wants_raw(self) -> bool:
+        """True if some connected client needs raw protobuf frames."""
+        return self.mode_count["raw"] > 0
+
+    def wants_routing(self) -> bool:
+        """True if some subscription filters by message type/fields (needs msg_type and record)."""
+        return self.subscriptions.filtered > 0
+
+    def wanted_types(self):
+        """Message types some connected client is subscribed to (``None`` - all types)."""
+        return self.subscriptions.wanted_types()
+
+    def publish(self, message, source=None, msg_type=None, record=None, raw=None) -> bool:
+        """Thread-safe broadcast to subscribed clients - never blocks the caller.
+
+        Messages are handed over to the server event loop and put into per-client
+        bounded queues; a slow client only affects its own queue.
+
+        Args:
+            message: Payload sent to the clients.
+            source (str): Apstra source ('ip:port') - routing key.
+            msg_type (str): Top-level AosMessage type (perf_mon, alert, ...) - routing key.
+            record (dict): Decoded message - used by subscription field predicates.
+            raw (bytes): Length prefixed protobuf frame for clients in raw mode.
+        """
+        if self.loop is None or self.loop.is_closed():
+            return False
+        if self.in_server_loop():
+            self._broadcast(message, source, msg_type, record, raw)
+            return True
+        self._inbox.append((message, source, msg_type, record, raw))
+        if not self._wakeup_pending:
+            self._wakeup_pending = True
+            self.loop.call_soon_threadsafe(self._drain_inbox)
+        return True
+
+    def _drain_inbox(self):
+        # reset flag before draining - anything appended later schedules a new wakeup
+        self._wakeup_pending = False
+        inbox = self._inbox
+        while inbox:
+            self._broadcast(*inbox.popleft())
+
+    def _broadcast(self, message, source=None, msg_type=None, record=None, raw=None):
+        for channel in self.subscriptions.match(source, msg_type, record):
+            payload = raw if channel.mode == "raw" else message
+            if payload is not None:
+                channel.put(payload)
+
+    def _on_sent(self, client_websocket, count=1):
+        client_ip, client_port = client_websocket.remote_address[:2]
+        self.client_stats_update(client_ip, client_port, "tx", count)
             
-    def client_stats_update(self, ip, port, direction="tx"):
+    def client_stats_update(self, ip, port, direction="tx", count=1):
         session_key = f"{ip}:{port}:{direction}"
         if session_key not in self.msg_counter:
-            self.msg_counter[session_key] = 1
+            self.msg_counter[session_key] = count
         else:
-            self.msg_counter[session_key] += 1
+            self.msg_counter[session_key] += count
     def start_server(self):
         try:
             self.server_thread = threading.Thread(target=self._run_server)
@@ -107,6 +420,8 @@ class WSServer:
         self.server_running = True
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
+        self.loop = loop
+        self.loop_ready.set()
         try:
             loop.run_until_complete(self.websocket_server())
         except AddressAlreadyInUseError:
@@ -118,15 +433,30 @@ class WSServer:
         if self.server_thread:
             self.server_thread.join()
 
+    def run_coroutine_threadsafe(self, coro, timeout=5):
+        # Schedule coroutine on the WebSocket server event loop (ie. asyncio ingest server)
+        # so everything asyncio based shares one loop
+        if not self.loop_ready.wait(timeout):
+            raise RuntimeError("WebSocket server event loop is not running")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def in_server_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
     def get_server_status(self):
         return self.server_running
     
     def get_connected_clients(self) -> ClientStats:
         rlist = []
-        for client in self.connected_clients:
-            client_ip, client_port = client.remote_address
+        for client in list(self.connected_clients):
+            client_ip, client_port = client.remote_address[:2]
             session_key = f"{client_ip}:{client_port}"
-            c = ClientStats(ip=client_ip, port=client_port, rx=self.msg_counter.get(f"{session_key}:rx"), tx=self.msg_counter.get(f"{session_key}:tx"))
+            channel = self.channels.get(client)
+            c = ClientStats(ip=client_ip, port=client_port, rx=self.msg_counter.get(f"{session_key}:rx"), tx=self.msg_counter.get(f"{session_key}:tx"),
+                            queue_depth=len(channel.queue) if channel else 0, dropped=channel.dropped if channel else 0)
             rlist.append(c)
         return rlist
 
@@ -1,12 +1,70 @@
 import os
+import time
+import queue
+import atexit
 import logging
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
 from .utils import ensure_directory_exists
+from .datasink import DataSink
+
+
+def _level(level) -> int:
+    if isinstance(level, str):
+        return getattr(logging, level.upper())
+    return level
+
+
+class _Columns:
+    """ZLogger.info() columns - padded and joined only when a handler formats the record
+    (on the listener thread in queue mode)."""
+    __slots__ = ('args',)
+
+    def __init__(self, args):
+        self.args = args
+
+    def __str__(self) -> str:
+        return " | ".join([str(arg).ljust(40) for arg in self.args])
+
+
+class _DropQueueHandler(QueueHandler):
+    """QueueHandler that never blocks the caller - records over the queue size are counted and dropped."""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.exception_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        # Same process listener - message formatting is left to the writer thread. The traceback
+        # is rendered now, while its frames are current, and the frames are not kept alive by the queue.
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Counter:
+    __slots__ = ('count', 'size', 'reported_count', 'reported_size', 'reported_at')
+
+    def __init__(self):
+        self.count = 0
+        self.size = 0
+        self.reported_count = 0
+        self.reported_size = 0
+        self.reported_at = time.monotonic()
 
 
 class ZLogger:
     def __init__(self):
         self.STD_LOGGER_LEVEL = getattr(logging, os.getenv('STD_LOGGER_LEVEL', 'INFO').upper())
+        self.STD_LOGGER_WRITER = os.getenv('STD_LOGGER_WRITER', 'queue')          # queue (background writer) or sync
+        self.STD_LOGGER_QUEUE_SIZE = int(os.getenv('STD_LOGGER_QUEUE_SIZE', 10000))  # records waiting for the writer
         
         self.STD_LOGGER_FILE_OUTPUT_FILEPATH = os.getenv('STD_LOGGER_FILE_OUTPUT_FILEPATH', 'log/stdout.log')
         self.STD_LOGGER_FILE_ROTATION_WHEN = os.getenv('STD_LOGGER_FILE_ROTATION_WHEN', 'midnight')
@@ -18,11 +76,25 @@ class ZLogger:
         self.DATA_LOGGER_FILE_ROTATION_WHEN = os.getenv('DATA_LOGGER_FILE_ROTATION_WHEN', 'midnight')
         self.DATA_LOGGER_FILE_ROTATION_INTERVAL = int(os.getenv('DATA_LOGGER_FILE_ROTATION_INTERVAL', 1))
         self.DATA_LOGGER_FILE_ROTATION_BACKUP_COUNT = int(os.getenv('DATA_LOGGER_FILE_ROTATION_BACKUP_COUNT', 10))
+        self.DATA_LOGGER_WRITER = os.getenv('DATA_LOGGER_WRITER', 'async')         # async (DataSink) or logging
+        self.DATA_LOGGER_FILE_ROTATION_MAX_BYTES = int(os.getenv('DATA_LOGGER_FILE_ROTATION_MAX_BYTES', 0))   # 0 - time rotation only
+        self.DATA_LOGGER_COMPRESSION = os.getenv('DATA_LOGGER_COMPRESSION', 'none')
+        self.DATA_LOGGER_COMPRESSION_LEVEL = int(os.getenv('DATA_LOGGER_COMPRESSION_LEVEL', 6))
+        self.DATA_LOGGER_BATCH_BYTES = int(os.getenv('DATA_LOGGER_BATCH_BYTES', 1024 * 1024))
+        self.DATA_LOGGER_FLUSH_INTERVAL = float(os.getenv('DATA_LOGGER_FLUSH_INTERVAL', 1))
+        self.DATA_LOGGER_FSYNC_INTERVAL = float(os.getenv('DATA_LOGGER_FSYNC_INTERVAL', 0))  # 0 - never
+
+        self.counters = {}
+        self.stdlogger_listener = None
+        self.stdlogger_queue_handler = None
+        self.listener_pid = None
         
     def std_logger(self):
          # Create a logger and default level
         self.stdlogger = logging.getLogger('stdlogger')
-        self.stdlogger .setLevel(logging.DEBUG)
+        # Logger level follows the most verbose handler, so logger.isEnabledFor(logging.DEBUG)
+        # is False (and debug dumps are not built at all) unless some handler really prints DEBUG
+        self.stdlogger.setLevel(min(_level(self.STD_LOGGER_LEVEL), _level(self.STD_LOGGER_FILE_LEVEL)))
 
         self.stdlogger_stream_handler = logging.StreamHandler()
         self.stdlogger_stream_handler.setLevel(self.STD_LOGGER_LEVEL)
@@ -35,10 +107,35 @@ class ZLogger:
         self.stdlogger_file_handler.setLevel(self.STD_LOGGER_FILE_LEVEL)
         self.stdlogger_file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
 
-        self.stdlogger.addHandler(self.stdlogger_file_handler)
-        self.stdlogger.addHandler(self.stdlogger_stream_handler)
+        if self.STD_LOGGER_WRITER == 'queue':
+            # Callers only enqueue the record, console and file are written by the listener thread
+            self.stdlogger_queue_handler = _DropQueueHandler(queue.Queue(self.STD_LOGGER_QUEUE_SIZE))
+            self.stdlogger_listener = QueueListener(self.stdlogger_queue_handler.queue,
+                                                    self.stdlogger_file_handler, self.stdlogger_stream_handler,
+                                                    respect_handler_level=True)
+            self.stdlogger_listener.start()
+            self.listener_pid = os.getpid()
+            atexit.register(self.close)
+            self.stdlogger.addHandler(self.stdlogger_queue_handler)
+        else:
+            self.stdlogger.addHandler(self.stdlogger_file_handler)
+            self.stdlogger.addHandler(self.stdlogger_stream_handler)
         
         return self.stdlogger
+
+    def close(self):
+        """Writes the queued records and stops the listener thread (queue mode)."""
+        listener = self.stdlogger_listener
+        # a forked worker inherits the object, not the listener thread
+        if listener is None or self.listener_pid != os.getpid():
+            return
+        self.stdlogger_listener = None
+        listener.stop()
+
+    def get_dropped(self) -> int:
+        """Records dropped because the log queue was full."""
+        handler = self.stdlogger_queue_handler
+        return handler.dropped if handler else 0
     
     def data_logger(self):
         self.datalogger = logging.getLogger('data_logger')
@@ -53,13 +150,59 @@ class ZLogger:
         
         self.datalogger.addHandler(self.datalogger_file_handler)
         return self.datalogger
+
+    def data_sink(self):
+        """Returns the data logger (``.info(line)``) selected by DATA_LOGGER_WRITER.
+
+        ``async`` - started DataSink (own writer thread, batching, compression, size rotation)
+        ``logging`` - stdlib logger from data_logger()
+        """
+        if self.DATA_LOGGER_WRITER == 'logging':
+            return self.data_logger()
+        self.datasink = DataSink(self.DATA_LOGGER_FILE_OUTPUT_FILEPATH,
+                                 when=self.DATA_LOGGER_FILE_ROTATION_WHEN,
+                                 interval=self.DATA_LOGGER_FILE_ROTATION_INTERVAL,
+                                 backup_count=self.DATA_LOGGER_FILE_ROTATION_BACKUP_COUNT,
+                                 max_bytes=self.DATA_LOGGER_FILE_ROTATION_MAX_BYTES,
+                                 compression=self.DATA_LOGGER_COMPRESSION,
+                                 compression_level=self.DATA_LOGGER_COMPRESSION_LEVEL,
+                                 batch_bytes=self.DATA_LOGGER_BATCH_BYTES,
+                                 flush_interval=self.DATA_LOGGER_FLUSH_INTERVAL,
+                                 fsync_interval=self.DATA_LOGGER_FSYNC_INTERVAL)
+        return self.datasink.start()
     
     def info(self, *args):
-        formatted_args = [arg.ljust(40) for arg in args]
-        self.stdlogger.info(" | ".join(formatted_args))
-        
-        
-        
+        """Logs the args as padded columns - nothing is formatted unless INFO is enabled."""
+        if self.stdlogger.isEnabledFor(logging.INFO):
+            self.stdlogger.info(_Columns(args))
+
+    def debug(self, *args):
+        if self.stdlogger.isEnabledFor(logging.DEBUG):
+            self.stdlogger.debug(_Columns(args))
+
+    # -----------------------------------------------
+    # Hot path counters - printed as one summary per interval instead of a line per event
+    def count(self, key, count: int = 1, size: int = 0):
+        counter = self.counters.get(key)
+        if counter is None:
+            counter = self.counters.setdefault(key, _Counter())
+        counter.count += count
+        counter.size += size
+
+    def interval(self, key) -> tuple:
+        """(count, size, seconds) since the previous interval() call for the key."""
+        counter = self.counters.get(key)
+        if counter is None:
+            return 0, 0, 0.0
+        now = time.monotonic()
+        count, size = counter.count, counter.size
+        result = (count - counter.reported_count, size - counter.reported_size, now - counter.reported_at)
+        counter.reported_count, counter.reported_size, counter.reported_at = count, size, now
+        return result
+
+    def discard(self, key):
+        self.counters.pop(key, None)
+
 
     def set_std_logger_level(self, level):
         """Sets the overall log level for the standard logger.
@@ -150,3 +293,21 @@ class ZLogger:
                 Defaults to 10 unless overridden by the environment variable DATA_LOGGER_FILE_ROTATION_BACKUP_COUNT.
         """
         self.DATA_LOGGER_FILE_ROTATION_BACKUP_COUNT = count
+
+    def set_data_logger_file_rotation_max_bytes(self, max_bytes):
+        """Sets the size based rotation of the data file (async writer only).
+
+        Args:
+            max_bytes (int): Rotate the data file once it would exceed this size, 0 disables.
+                Defaults to 0 unless overridden by the environment variable DATA_LOGGER_FILE_ROTATION_MAX_BYTES.
+        """
+        self.DATA_LOGGER_FILE_ROTATION_MAX_BYTES = max_bytes
+
+    def set_data_logger_compression(self, compression):
+        """Sets the data file compression (async writer only).
+
+        Args:
+            compression (str): 'none', 'gzip' or 'lzma'.
+                Defaults to 'none' unless overridden by the environment variable DATA_LOGGER_COMPRESSION.
+        """
+        self.DATA_LOGGER_COMPRESSION = compression
@@ -9,32 +9,74 @@ import threading
 import time
 import signal
 import sys
-import binascii
 import json
 import logging
 import argparse
-import gc
-import asyncio
+import selectors
+from datetime import datetime
 
 
-from protoserv import WSServer, Buffer, ZLogger
+from protoserv import WSServer, Buffer, ZLogger, PB2IngestServer
+from protoserv.framing import slice_frames, FRAME_HEADER_SIZE
+from protoserv.decoder import load_schema, DecodedMessage, DecodeContext, DECODE_REUSE_LIMIT
+from protoserv.gcpolicy import GCPolicy, parse_threshold
+from protoserv.decodepool import DecodePool, DecodeError
+from protoserv.transcoder import Transcoder
+from protoserv.datasink import DataSink
+from protoserv.capture import CaptureWriter, CaptureReader
+from protoserv.diagnostics import Diagnostics
+from protoserv.flowcontrol import FlowControl, OVERLOAD_POLICIES
+from protoserv.wirescan import WireScanner, decode_first_uint64_field, recognize_stream_mode
+from protoserv.lastvalue import LastValueCache, ENTITY_FIELDS
+from protoserv.history import HistoryStore
+from protoserv.aggregator import Aggregator, AGGREGATE_TYPE, AGGREGATE_IDLE_WINDOWS
+from protoserv.columnar import ColumnarSink, COLUMNAR_FORMATS
+from protoserv.localout import ShmRingWriter, UnixStreamServer, LOCAL_OUTPUT_FORMATS
+from protoserv.supervisor import Supervisor, worker_path
+from protoserv.tcpingest import TCPListener, SocketOptions, ReadSizer
+from protoserv.subscriptions import source_ip
+from protoserv import decoder
+from protoserv.metrics import MetricsRegistry, MetricsServer, DECODE_BUCKETS, SINK_BUCKETS, FRESHNESS_BUCKETS
 from protoserv.utils import get_current_datetime, ensure_directory_exists, encode_address, decode_address
 
-from google.protobuf.internal.decoder import _DecodeVarint
-from google.protobuf.json_format import MessageToDict
-
 # -----------------------------------------------
 # Parameters
-client_socket_timeout=21600         # 6h
-
 LOG_REFRESH_INTERVAL             = int(os.getenv('LOG_REFRESH_INTERVAL', 5))  # 5 sec
 
 
 # -----------------------------------------------
 # Internal variables
-server_socket = None  # Global variable for the server socket
+listener = None  # Protobuf listener of the thread ingest mode (event driven accept)
+ingest_server = None  # Global variable for the asyncio ingest server
+decode_pool = None  # Global variable for the decode worker pool (DECODE_WORKERS > 0)
+decode_contexts = {}  # Reused protobuf message instances per session (DECODE_REUSE_LIMIT)
+decode_reuse_limit = DECODE_REUSE_LIMIT
+decode_retired = [0, 0]  # parses, created messages of the closed sessions' decode contexts
+gc_policy = None  # GC thresholds, startup freeze, forced collections and pause stats (GC_*)
+transcoder = None  # Fast protobuf -> dict converter (TRANSCODER=fast)
+capture_writer = None  # Raw frame capture archive (CAPTURE_DIR)
+metrics_server = None  # Prometheus text metrics endpoint (METRICS_PORT)
+diagnostics = None  # Runtime diagnostics (SIGUSR1/SIGUSR2 or WebSocket "diagnostics" action)
+flow_control = None  # Session buffer memory budgets (BUFFER_OVERLOAD_POLICY)
+wire_scanner = None  # Routing keys from the frame bytes (seq_num, timestamp, message type)
+datafile_types = None  # Message types written to the data file (None - all)
+last_value_cache = None  # Latest message per (source, type, entity) - WebSocket snapshot (LAST_VALUE_CACHE_SIZE)
+last_value_types = None  # Message types kept in the last value cache (None - all)
+history = None  # Recent decoded messages indexed by time, source, type and device (HISTORY_MAX_AGE)
+history_types = None  # Message types kept in the history (None - all)
+aggregator = None  # Per window counter summaries instead of raw perf_mon samples (AGGREGATE_WINDOW)
+aggregate_passthrough = set()  # Aggregated message types still passed raw to the outputs
+columnar_sink = None  # Per message type columnar files - parquet or pcol (COLUMNAR_DIR)
+columnar_types = None  # Message types written to the columnar files (None - all)
+local_ring = None  # Shared memory ring for co-located consumers (LOCAL_SHM_NAME)
+local_stream = None  # Unix socket stream for co-located consumers (LOCAL_SOCKET_PATH)
+local_output_format = "json"  # Records of the local outputs: json (decoded message) or raw (frame payload)
+supervisor = None  # Pre-fork supervisor (WORKERS > 1) - in the workers too, is_worker tells them apart
 shutdown_flag = False  # Flag to indicate shutdown process
-accept_thread = None  # Global variable to hold the accept thread
+ingest_options = SocketOptions()  # Receive buffer, backlog, keepalive and idle timeout of the protobuf connections
+ingest_backlog = 128  # listen() backlog of the protobuf port (INGEST_BACKLOG)
+ingest_read_min = 16 * 1024  # Adaptive read size bounds (INGEST_READ_MIN/MAX)
+ingest_read_max = 1024 * 1024
 
 msg_counter = {}
 decoded_sessions = {}
@@ -42,277 +84,896 @@ stream_mode = {}
 
 pb2buffer = Buffer()
 
+# -----------------------------------------------
+# Metrics - recorded on the hot path (per-thread shards, no locks)
+metrics = MetricsRegistry()
+m_frames = metrics.counter('protoserv_session_frames_total', 'Frames sliced from the session stream', ('session',))
+m_filtered = metrics.counter('protoserv_session_filtered_total', 'Frames dropped before decode (message type no output wants)', ('session',))
+m_decode_errors = metrics.counter('protoserv_session_decode_errors_total', 'Frames that failed to decode', ('session',))
+m_session_freshness = metrics.gauge('protoserv_session_freshness_seconds', 'Receive time minus Apstra timestamp of the last received message', ('session',))
+m_freshness = metrics.histogram('protoserv_freshness_seconds', 'Receive time minus Apstra message timestamp', FRESHNESS_BUCKETS)
+m_decode_seconds = metrics.histogram('protoserv_decode_seconds', 'Decode time per message (pool: submit -> result of its batch)', DECODE_BUCKETS, ('stage',))
+m_sink_seconds = metrics.histogram('protoserv_sink_seconds', 'Time to pass a message to the output', SINK_BUCKETS, ('sink',))
+m_gc_pause = metrics.histogram('protoserv_gc_pause_seconds', 'Garbage collection pause', DECODE_BUCKETS, ('generation',))
+
 
 # -----------------------------------------------
 # Signal Handler
 def signal_handler(sig, frame):
-    global shutdown_flag, accept_thread, ws_server
+    global shutdown_flag, ws_server
+    if supervisor is not None and not supervisor.is_worker:
+        # Supervisor process - no pipeline of its own, workers shut down their pipelines
+        if not shutdown_flag:
+            shutdown_flag = True
+            logger.info("Signal Handler -> Stopping workers... please wait... ")
+            supervisor.stop()
+        sys.exit(0)
     if not shutdown_flag:
         logger.info("Signal Handler -> Shutting down... please wait for propere close socket... ")
         shutdown_flag = True
+        if listener:
+            listener.stop()
+        if ingest_server:
+            try:
+                ws_server.run_coroutine_threadsafe(ingest_server.stop()).result(timeout=5)
+            except Exception as e:
+                logger.error(f"ingest server stop error: {str(e)}")
+        if decode_pool:
+            decode_pool.shutdown(wait=False)
+        if aggregator:
+            try:
+                pb2_emit_aggregates(aggregator.flush(force=True))
+            except Exception as e:
+                logger.error(f"aggregator flush error: {str(e)}")
         ws_server.shutdown_server()
-        if accept_thread:
-            accept_thread.join()  # Wait for the accept thread to terminate
-        if server_socket:
-            server_socket.close()
+        if capture_writer:
+            capture_writer.close()
+        if metrics_server:
+            metrics_server.stop()
+        if isinstance(pb_logger, DataSink):
+            pb_logger.close()
+        if columnar_sink:
+            columnar_sink.close()
+        if local_stream:
+            local_stream.close()
+        if local_ring:
+            local_ring.close()
+        zlogger.close()
         sys.exit(0)
     
 #-----------------------------------------------
 # Thread Connection Socket
-#  continuously check for new connections, accept them, and start threads to receive data from each client.
-def accept_connections():
-    global server_socket, shutdown_flag, decoded_sessions, client_socket_timeout
-    while not shutdown_flag:
-        try:
-            client_socket, client_address = server_socket.accept()
-            client_socket.settimeout(client_socket_timeout)
-            client_ip, client_port = client_address # Unpack client address tuple
-            session_id = encode_address(client_ip,client_port)
-            decoded_sessions[session_id] = f"{client_ip}:{client_port}"
-            zlogger.info(f"> protobuf client {decoded_sessions.get(session_id)}", 
-                        f"new connection", 
-                        f"{get_current_datetime()}")
-            threading.Thread(target=receive_data, args=(client_socket,session_id,), daemon=True).start()
-        except socket.timeout as e:
-            # server_socket is set as server_socket.settimeout(1) -> 1sec (nessesery for propere way of kiiling thread)
-            # we not react on timeouts from servere to allow constance accept of connections
-            # just keep running the loop and accept connections all the time
-            pass
-        except e:
-            logger.error(f"accept_connections error: {str(e)}")
-        #time.sleep(0.01)
+#  TCPListener accepts new connections (event driven) and starts a thread receiving data from each client.
+def accept_connection(client_socket, client_address):
+    client_ip, client_port = client_address[:2] # Unpack client address tuple
+    session_id = encode_address(client_ip,client_port)
+    decoded_sessions[session_id] = f"{client_ip}:{client_port}"
+    zlogger.info(f"> protobuf client {decoded_sessions.get(session_id)}", 
+                f"new connection", 
+                f"{get_current_datetime()}")
+    threading.Thread(target=receive_data, args=(client_socket,session_id,), daemon=True).start()
+
+def create_pb2_session(session_id):
+    zlogger.info(f"> protobuf client {decoded_sessions.get(session_id)}", 
+                f"buffer size: 0", 
+                f"count: 0")
+    if session_id not in pb2buffer.get_sessions():
+        pb2buffer.create_session(session_id)
+    decode_contexts[session_id] = DecodeContext(streaming_telemetry_schema_pb2, decode_reuse_limit)
+    msg_counter[session_id] = 0
+    stream_mode[session_id] = None
+    if flow_control:
+        if ingest_server:
+            # asyncio: stop/resume reading the transport, thread mode: receive_data waits in flow_control.wait()
+            flow_control.register(session_id, on_pause=ingest_server.pause_reading,
+                                  on_resume=ingest_server.resume_reading,
+                                  on_disconnect=ingest_server.close_session)
+        else:
+            flow_control.register(session_id)
+
+def drop_decode_context(session_id):
+    context = decode_contexts.pop(session_id, None)
+    if context is not None:
+        decode_retired[0] += context.parses
+        decode_retired[1] += context.created
+
+def decode_context_stats() -> tuple:
+    """(parses, created messages) of all inline decode contexts, closed sessions included."""
+    contexts = list(decode_contexts.values())
+    return (decode_retired[0] + sum(context.parses for context in contexts),
+            decode_retired[1] + sum(context.created for context in contexts))
 
 def receive_data(client_socket,session_id):
     global msg_counter, decoded_sessions
     
     if session_id not in pb2buffer.get_sessions():
-        zlogger.info(f"> protobuf client {decoded_sessions.get(session_id)}", 
-                    f"buffer size: 0", 
-                    f"count: 0")
-        pb2buffer.create_session(session_id)
-        msg_counter[session_id] = 0
-        stream_mode[session_id] = None
+        create_pb2_session(session_id)
     
     stop_event_pb2_consumer = threading.Event()
-    threading.Thread(target=pb2_consumer, args=(session_id,stop_event_pb2_consumer), daemon=True).start()
+    consumer_thread = threading.Thread(target=pb2_consumer, args=(session_id,stop_event_pb2_consumer), daemon=True)
+    consumer_thread.start()
 
+    # recv_into straight into the session memory once the socket is readable,
+    # read size follows the throughput of the connection
+    sizer = ReadSizer(ingest_read_min, ingest_read_max)
+    selector = selectors.DefaultSelector()
+    selector.register(client_socket, selectors.EVENT_READ)
+    idle_timeout = ingest_options.idle_timeout or None
     while True:
+        # Over the memory budget - stop reading, TCP flow control pushes back on the sender
+        if flow_control and not flow_control.wait(session_id):
+            logger.warning(f"... over memory budget - disconnect : {session_id} | {get_current_datetime()}")
+            break
+        if not selector.select(idle_timeout):
+            logger.warning(f"... idle for {idle_timeout} s - disconnect : {session_id} | {get_current_datetime()}")
+            break
         try:
-            data = client_socket.recv(8196)  # Receive up to 1024 bytes of data
-            if not data:  # If no data is received, break the loop
-                time.sleep(0.01)
-                logger.info(f"... no data - break : {session_id} | {get_current_datetime()}")
-                break
-            b0 = pb2buffer.get_size(session_id)
-            pb2buffer.append(session_id, data)
-            b1 = pb2buffer.get_size(session_id)
-            zlogger.info(f"> protobuf client {decoded_sessions.get(session_id)}", 
-                        f"sock.recv: {len(data)}", 
-                        f"buffer size: {b0} -> {b1}")
-        except socket.timeout:
-            # Do not close connection from client
-            # just report error and continue
-            logger.warning(f"client socket timeout : {session_id} | {get_current_datetime()}")
-            pass
+            received = pb2buffer.recv_into(session_id, client_socket, sizer.size, socket.MSG_DONTWAIT)
+        except (BlockingIOError, InterruptedError):
+            continue
+        except OSError as e:
+            logger.info(f"... connection error - break : {session_id} | {str(e)} | {get_current_datetime()}")
+            break
+        if not received:  # Connection closed by the client
+            logger.info(f"... no data - break : {session_id} | {get_current_datetime()}")
+            break
+        sizer.update(received)
+        if flow_control:
+            flow_control.update(session_id, pb2buffer.get_size(session_id))
+    selector.close()
 
+    # the consumer finishes the frames received before the connection closed
+    stop_event_pb2_consumer.set()
+    consumer_thread.join()
     pb2buffer.destroy_session(session_id)
     stream_mode[session_id] = None
-    stop_event_pb2_consumer.set()
+    if flow_control:
+        flow_control.unregister(session_id)
+    if decode_pool:
+        decode_pool.destroy_session(session_id)
+    metrics.remove(('session',), (decoded_sessions.get(session_id),))
+    zlogger.discard(session_id)
+    drop_decode_context(session_id)
     client_socket.close()
     return
 
+#-----------------------------------------------
+# asyncio ingest (INGEST_MODE=asyncio)
+#  sessions are handled on the WebSocket server event loop - frames are sliced and dispatched from buffer_updated
+def async_session_connect(session_id, client_ip, client_port):
+    decoded_sessions[session_id] = f"{client_ip}:{client_port}"
+    zlogger.info(f"> protobuf client {decoded_sessions.get(session_id)}", 
+                f"new connection", 
+                f"{get_current_datetime()}")
+    create_pb2_session(session_id)
+
+def async_session_data(session_id):
+    frames = pb2_msg_slicer(session_id)
+    if frames:
+        frames = pb2_route(session_id, frames)
+    if decode_pool and frames:
+        pb2_submit_frames(session_id, frames, block=False)
+        return
+    for msg in frames:
+        try:
+            pb2_process_message(session_id, msg)
+        except Exception as e:
+            logger.error(f"Error Exception 2 -> {str(e)}")
+
+def async_session_close(session_id):
+    logger.info(f"... connection closed : {session_id} | {get_current_datetime()}")
+    stream_mode[session_id] = None
+    if flow_control:
+        flow_control.unregister(session_id)
+    if decode_pool:
+        decode_pool.destroy_session(session_id)
+    metrics.remove(('session',), (decoded_sessions.get(session_id),))
+    zlogger.discard(session_id)
+    drop_decode_context(session_id)
+
+async def start_ingest_server():
+    global ingest_server
+    ingest_server = PB2IngestServer(pb2buffer, ip_address, port,
+                                    on_connect=async_session_connect,
+                                    on_data=async_session_data,
+                                    on_close=async_session_close,
+                                    backlog=ingest_backlog,
+                                    reuse_port=supervisor is not None,
+                                    options=ingest_options,
+                                    read_min=ingest_read_min,
+                                    read_max=ingest_read_max,
+                                    logger=logger)
+    await ingest_server.start()
+
 
 #-----------------------------------------------
 
 
-def decode_first_uint64_field(byte_stream):
-    """Decode the first uint64 field from a byte stream."""
-    pos = 0
-    while pos < len(byte_stream):
-        # Decode the field number and wire type
-        field_wire_type, pos = _DecodeVarint(byte_stream, pos)
-        field_number = field_wire_type >> 3
-        wire_type = field_wire_type & 0x07
-        
-        # Check if the wire type is compatible with varint encoding and field number is the first field
-        if wire_type == 0 and field_number == 1:
-            # Decode the uint64 value
-            uint64_value, pos = _DecodeVarint(byte_stream, pos)
-            return uint64_value
-        else:
-            # Skip the field value based on wire type
-            if wire_type == 0:  # Varint
-                _, pos = _DecodeVarint(byte_stream, pos)
-            elif wire_type == 2:  # Length-delimited
-                field_length, pos = _DecodeVarint(byte_stream, pos)
-                pos += field_length
-            else:
-                raise ValueError("Unsupported wire type")
-    
-    raise ValueError("No uint64 field found")
+def message_timestamp(msg_bytes, mode) -> int:
+    """Apstra timestamp (microseconds) of the frame - timestamp field of the (nested) AosMessage."""
+    return wire_scanner.scan(msg_bytes, mode).timestamp or 0
 
-def recognize_stream_mode(msg_bytes) -> int:
-    varint_value = decode_first_uint64_field(msg_bytes)
-    if varint_value > 1700000000000000:
-        stream_mode = 'unsequenced'
-    else:
-        stream_mode = 'sequenced'
-    return stream_mode
-    
 
 #-----------------------------------------------
 # Protobuf Deserialize
-def pb2_msg_slicer(session_id) -> str:
-    buf = pb2buffer.get_range(session_id, 0, 200)
-    logger.debug(f"pb2buffer-debug - session: {session_id}")
-    logger.debug(f"pb2buffer-debug - full 200 bytes")
-    logger.debug(f"pb2buffer-debug : {buf}")
-    logger.debug(f"pb2buffer-debug-int : {int.from_bytes(buf, byteorder='big') }")
-    logger.debug(f"pb2buffer-debug-hex : {binascii.hexlify(buf).decode()}")
-    
-    logger.debug(f"--- pb2buffer size on start: {pb2buffer.get_size(session_id)}")
-    logger.debug(f"--- Search... for next Varint...")
-
-
-    buf = pb2buffer.get_range(session_id, 0, 2)
-    logger.debug(f"buf: {buf} - int: {int.from_bytes(buf, byteorder='big') } - hex: {binascii.hexlify(buf).decode()}")
-    msg_len = int(binascii.hexlify(buf), 16)
-    logger.debug(f"-msg_len: {msg_len}")
-    csize = pb2buffer.get_size(session_id)
-    if msg_len+2 > csize:
-        logger.error(f"Error - buffer too low - need to wait - we have truncated message in the pb2buffer: msg_len: {msg_len} > pb2buffer: {csize}")
-        return b''
-
-    logger.debug("")
-    full_msg = pb2buffer.get_range(session_id, 0, 2+msg_len)
-    logger.debug(f"full_msg_lenght: {msg_len+2}")
-    logger.debug(f"full_msg: {full_msg}")
-    logger.debug(f"full_msg_hex: {binascii.hexlify(full_msg).decode()}")
+def pb2_msg_slicer(session_id) -> list:
+    """Slices all complete messages from the session buffer (zero-copy memoryviews)."""
+    frames = slice_frames(pb2buffer, session_id, logger=logger)
+    if not frames:
+        return frames
+    if flow_control:
+        flow_control.update(session_id, pb2buffer.get_size(session_id))
+    msg_counter[session_id] += len(frames)
+    zlogger.count(session_id, len(frames), sum(map(len, frames)) + FRAME_HEADER_SIZE * len(frames))
+    m_frames.inc((decoded_sessions.get(session_id),), len(frames))
+    pb2_freshness(session_id, frames)
+    if capture_writer:
+        pb2_capture(session_id, frames)
+    return frames
+
+def wanted_types():
+    """Message types some output needs (None - all types)."""
+    if logger.isEnabledFor(logging.DEBUG) or local_ring is not None or local_stream is not None:
+        return None
+    wanted = set()
+    if pb_logger_file_output_format is not None:
+        if datafile_types is None:
+            return None
+        wanted.update(datafile_types)
+    if columnar_sink is not None:
+        if columnar_types is None:
+            return None
+        wanted.update(columnar_types)
+    if last_value_cache is not None:
+        if last_value_types is None:
+            return None
+        wanted.update(last_value_types)
+    if history is not None:
+        if history_types is None:
+            return None
+        wanted.update(history_types)
+    if aggregator is not None:
+        wanted.update(aggregator.types)
+    if ws_server.channels:
+        ws_types = ws_server.wanted_types()
+        if ws_types is None:
+            return None
+        wanted.update(ws_types)
+    return wanted
+
+def pb2_route(session_id, frames) -> list:
+    """Drops frames of message types no output wants - before ParseFromString/MessageToDict ever run."""
+    wanted = wanted_types()
+    if wanted is None:
+        return frames
+    if stream_mode[session_id] == None:
+        try:
+            stream_mode[session_id] = recognize_stream_mode(frames[0])
+        except (ValueError, IndexError):
+            # malformed first frame - stream mode unknown, the decoder reports it
+            return frames
+        logger.debug(f"Stream mode detected as: {stream_mode[session_id]}")
+    mode = stream_mode[session_id]
+    msg_type = wire_scanner.msg_type
+    routed = []
+    for msg in frames:
+        try:
+            if msg_type(msg, mode) not in wanted:
+                continue
+        except (ValueError, IndexError):
+            # malformed frame - the decoder reports it
+            pass
+        routed.append(msg)
+    if len(routed) != len(frames):
+        m_filtered.inc((decoded_sessions.get(session_id),), len(frames) - len(routed))
+    return routed
+
+def pb2_freshness(session_id, frames):
+    """Receive time - Apstra timestamp. Only the last frame of the batch is parsed (frames of one recv are adjacent)."""
+    try:
+        if stream_mode[session_id] == None:
+            stream_mode[session_id] = recognize_stream_mode(frames[0])
+            logger.debug(f"Stream mode detected as: {stream_mode[session_id]}")
+        timestamp = message_timestamp(frames[-1], stream_mode[session_id])
+    except (ValueError, IndexError):
+        return
+    if timestamp:
+        freshness = time.time() - timestamp / 1000000
+        m_freshness.observe(freshness, count=len(frames))
+        m_session_freshness.set(freshness, (decoded_sessions.get(session_id),))
+
+def pb2_capture(session_id, frames):
+    """Appends raw frames to the capture archive (CAPTURE_DIR) - seq_num is indexed for sequenced streams."""
+    try:
+        if stream_mode[session_id] == None:
+            stream_mode[session_id] = recognize_stream_mode(frames[0])
+            logger.debug(f"Stream mode detected as: {stream_mode[session_id]}")
+        seq_nums = None
+        if stream_mode[session_id] == "sequenced":
+            seq_nums = []
+            for msg in frames:
+                try:
+                    seq_nums.append(decode_first_uint64_field(msg))
+                except (ValueError, IndexError):
+                    seq_nums.append(0)
+        capture_writer.write(session_id, frames, seq_nums)
+    except Exception as e:
+        logger.error(f"capture error: {str(e)}")
+
+def ws_publish(pb_msg: DecodedMessage):
+    # thread-safe and non-blocking - slow WebSocket clients never stall ingest
+    # every form is built only if some connected client needs it (raw only clients -> no decode at all)
+    if not ws_server.channels:
+        return
+    routing = ws_server.wants_routing()
+    ws_server.publish(pb_msg.json if ws_server.wants_json() else None,
+                      source=pb_msg.source,
+                      msg_type=pb_msg.msg_type if routing else None,
+                      record=pb_msg.dict if routing else None,
+                      raw=pb_msg.frame if ws_server.wants_raw() and pb_msg.raw is not None else None)
+
+def decode_needed() -> bool:
+    """True if some output needs decoded messages (otherwise frames are only passed as raw)."""
+    return (pb_logger_file_output_format is not None
+            or columnar_sink is not None
+            or (local_output_format == "json" and (local_ring is not None or local_stream is not None))
+            or last_value_cache is not None
+            or history is not None
+            or aggregator is not None
+            or logger.isEnabledFor(logging.DEBUG)
+            or ws_server.wants_json()
+            or ws_server.wants_routing())
+
+def pb2_process_message(session_id, msg):
+    """Decodes a single protobuf message and passes it to the outputs (debug log, data file, websocket)."""
+    global stream_mode, pb_logger
+    if stream_mode[session_id] == None:
+        stream_mode[session_id] = recognize_stream_mode(msg)
+        logger.debug(f"Stream mode detected as: {stream_mode[session_id]}")
+
+    pb_msg = DecodedMessage(streaming_telemetry_schema_pb2, msg, stream_mode[session_id],
+                            source=decoded_sessions[session_id], transcoder=transcoder,
+                            context=decode_contexts.get(session_id))
+    if decode_needed():
+        t0 = time.perf_counter()
+        try:
+            pb_msg.dict
+        except Exception:
+            m_decode_errors.inc((decoded_sessions[session_id],))
+            raise
+        m_decode_seconds.observe(time.perf_counter() - t0, ('inline',))
+    pb2_emit(pb_msg)
+
+def pb2_emit(pb_msg: DecodedMessage):
+    """Passes decoded message to all outputs - every serialized form is built once and shared."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(pb_msg.json4)
+
+    # Counter samples are folded into the window summaries (raw only for AGGREGATE_PASSTHROUGH types)
+    if aggregator is not None and pb_msg.msg_type in aggregator.types:
+        t0 = time.perf_counter()
+        summaries = aggregator.add(source_ip(pb_msg.source), pb_msg.msg_type, pb_msg.dict)
+        m_sink_seconds.observe(time.perf_counter() - t0, ('aggregator',))
+        if summaries:
+            pb2_emit_aggregates(summaries)
+        if pb_msg.msg_type not in aggregate_passthrough:
+            return
     
-    logger.debug("")
-    msg = pb2buffer.get_range(session_id, 2, msg_len+2)
-    logger.debug(f"msg_real_lenght: {len(msg)}")
-    logger.debug(f"msg: {msg}")
-    logger.debug(f"msg_hex: {binascii.hexlify(msg).decode()}")
-
-    logger.debug("")
-    logger.debug(f"---> remove from pb2buffer {2+msg_len} bytess")
+    # File storage or publish to downstream systems
+    if pb_logger_file_output_format is not None and (datafile_types is None or pb_msg.msg_type in datafile_types):
+        t0 = time.perf_counter()
+        pb_logger.info(pb_msg.get(pb_logger_file_output_format))
+        m_sink_seconds.observe(time.perf_counter() - t0, ('datafile',))
+
+    if columnar_sink is not None:
+        t0 = time.perf_counter()
+        msg_type = pb_msg.msg_type
+        if columnar_types is None or msg_type in columnar_types:
+            columnar_sink.write(msg_type, pb_msg.dict)
+        m_sink_seconds.observe(time.perf_counter() - t0, ('columnar',))
     
-    pb2buffer.remove_elements(session_id, msg_len+2)
-    msg_counter[session_id] += 1
+    if last_value_cache is not None:
+        t0 = time.perf_counter()
+        msg_type = pb_msg.msg_type
+        if last_value_types is None or msg_type in last_value_types:
+            last_value_cache.update(pb_msg.source, msg_type, pb_msg.dict, pb_msg.json)
+        m_sink_seconds.observe(time.perf_counter() - t0, ('last_value',))
+
+    if history is not None:
+        t0 = time.perf_counter()
+        msg_type = pb_msg.msg_type
+        if history_types is None or msg_type in history_types:
+            history.append(source_ip(pb_msg.source), msg_type, pb_msg.dict.get('origin_name'), pb_msg.json)
+        m_sink_seconds.observe(time.perf_counter() - t0, ('history',))
+
+    if local_ring is not None or (local_stream is not None and local_stream.clients):
+        t0 = time.perf_counter()
+        if local_output_format == "raw":
+            payload = pb_msg.bytes if pb_msg.raw is not None else None
+        else:
+            payload = pb_msg.json.encode('utf-8')
+        if payload is not None:
+            if local_ring is not None:
+                local_ring.write(payload)
+            if local_stream is not None:
+                local_stream.publish(payload)
+        m_sink_seconds.observe(time.perf_counter() - t0, ('local',))
 
-    return msg
+    t0 = time.perf_counter()
+    ws_publish(pb_msg)
+    m_sink_seconds.observe(time.perf_counter() - t0, ('websocket',))
 
-def pb2_decoder(message, output_type="dict", json_sort_keys=False, source = None):
-    """Decodes a protobuf message into a Python dict or JSON string.
+def pb2_emit_aggregates(summaries):
+    """Passes window summary records (message type 'aggregate') to the outputs."""
+    for source, record in summaries:
+        pb2_emit(DecodedMessage(streaming_telemetry_schema_pb2, source=source, result_dict=record,
+                                msg_type=AGGREGATE_TYPE))
 
-    Args:
-    message: The protobuf message to decode.
-    output_type: The desired output format. Can be 'dict', 'json', or 'json4'.
+def history_query(params: dict) -> str:
+    """Recent history query - {"start"/"end": epoch or ISO, "last": seconds, "source", "type", "device", "limit"}."""
+    start = replay_time(params.get('start'))
+    end = replay_time(params.get('end'))
+    if params.get('last'):
+        start = time.time() - float(params['last'])
+    messages = history.query(start, end,
+                             source=source_ip(params.get('source')) if params.get('source') else None,
+                             msg_type=params.get('type') or None,
+                             device=params.get('device') or None,
+                             limit=int(params.get('limit') or 1000))
+    return '{"action": "history", "count": %d, "messages": [%s]}' % (len(messages), ", ".join(messages))
 
-    Returns:
-    The decoded message in the requested format.
+def last_value_snapshot(subscription) -> list:
+    """WebSocket snapshot provider - cached messages matching the client subscription."""
+    predicate = None
+    if subscription.predicates:
+        predicate = lambda message: subscription.match_fields(json.loads(message))
+    return last_value_cache.snapshot(subscription.sources, subscription.types, predicate)
+
+def pb2_submit_frames(session_id, frames, block=True):
+    """Hands sliced frames to the decode worker pool (DECODE_WORKERS > 0).
+
+    block=False (asyncio ingest, event loop thread) never waits for the reorder window -
+    the connection stops reading until the pool has room again.
     """
-    global decoded_sessions
-    result_dict = MessageToDict(message, preserving_proto_field_name=True)
+    if not frames:
+        return
+    if stream_mode[session_id] == None:
+        try:
+            stream_mode[session_id] = recognize_stream_mode(frames[0])
+        except (ValueError, IndexError):
+            # malformed first frame - stream mode unknown, decode inline so the decoder reports it
+            for msg in frames:
+                try:
+                    pb2_process_message(session_id, msg)
+                except Exception as e:
+                    logger.error(f"Error Exception 2 -> {str(e)}")
+            return
+        logger.debug(f"Stream mode detected as: {stream_mode[session_id]}")
 
-    if 'aos_proto' in result_dict and 'seq_num' in result_dict:
-        nested_message = streaming_telemetry_schema_pb2.AosMessage()
-        nested_message.ParseFromString(message.aos_proto)
-        seq = result_dict['seq_num']
-        result_dict = pb2_decoder(nested_message, output_type='dict')
-        result_dict['seq_num'] = seq
+    if not decode_needed():
+        for msg in frames:
+            pb2_emit(DecodedMessage(streaming_telemetry_schema_pb2, msg, stream_mode[session_id],
+                                    source=decoded_sessions[session_id]))
+        return
 
-    if 'seq_num' not in result_dict:
-        result_dict['seq_num'] = 0
+    # reorder key: seq_num for sequenced stream, position in the stream otherwise
+    key = msg_counter[session_id] - len(frames)
+    items = []
+    for msg in frames:
+        if stream_mode[session_id] == "sequenced":
+            try:
+                key = decode_first_uint64_field(msg)
+            except (ValueError, IndexError):
+                pass
+        else:
+            key += 1
+        items.append((key, bytes(msg)))
+    if block:
+        decode_pool.submit(session_id, stream_mode[session_id], items)
+    elif not decode_pool.submit(session_id, stream_mode[session_id], items, on_ready=pb2_decode_ready):
+        ingest_server.pause_reading(session_id, "decode")
 
-    if source is not None:
-        result_dict['source'] = decoded_sessions[source]
-        
-    if output_type == "json":
-        result = json.dumps(result_dict, sort_keys=json_sort_keys)
-    elif output_type == "json4":
-        result = json.dumps(result_dict, indent=4, sort_keys=json_sort_keys)
-    elif output_type == "dict":
-        result = result_dict
-    else:
-        raise ValueError("Invalid output_type. Choose either 'dict', 'json', or 'json4'.")
+def pb2_decode_ready(session_id):
+    """Decode pool callback (pool thread) - the session window has room, resume reading on the event loop."""
+    ws_server.loop.call_soon_threadsafe(ingest_server.resume_reading, session_id, "decode")
 
-    return result
+def pb2_decoded(session_id, result, frame):
+    """Decode worker pool callback - results arrive in seq_num order."""
+    if isinstance(result, DecodeError):
+        m_decode_errors.inc((decoded_sessions.get(session_id),))
+        logger.error(f"Error Exception 2 -> {str(result)}")
+        return
+    pb2_emit(DecodedMessage(streaming_telemetry_schema_pb2, frame, stream_mode=stream_mode.get(session_id),
+                            source=decoded_sessions[session_id], result_dict=result))
+
+def pb2_decoded_batch(session_id, count, elapsed):
+    m_decode_seconds.observe(elapsed, ('pool',), count)
 
 def pb2_consumer(session_id, stop_event):
     global stream_mode, pb_logger
-    msg_no = 0
-    while not stop_event.is_set():
+    while True:
+        # stop_event: connection closed - drain what is in the pb2buffer and exit
+        stopping = stop_event.is_set()
         csize = pb2buffer.get_size(session_id)
-        if csize > 4:
+        if csize >= FRAME_HEADER_SIZE:
             try:
-                msg = pb2_msg_slicer(session_id)
-                logger.debug(f"pb2_consumer msg: {msg}")
-                logger.debug(f"pb2_consumer stream_mode: {stream_mode[session_id]}")
-                if len(msg) == 0:
-                    time.sleep(0.005)
-                    continue
-                msg_length = int(len(msg))+2
-
-
-                if stream_mode[session_id] == None:
-                    stream_mode[session_id] = recognize_stream_mode(msg)
-                    logger.debug(f"Stream mode detected as: {stream_mode[session_id]}")
-
-                if stream_mode[session_id] == "sequenced":
-                    pb2Message = streaming_telemetry_schema_pb2.AosSequencedMessage()
-                    pb2Message.ParseFromString(msg)
-                
-                if stream_mode[session_id] == "unsequenced":
-                    pb2Message = streaming_telemetry_schema_pb2.AosMessage()
-                    pb2Message.ParseFromString(msg)
-                
-                if zlogger.STD_LOGGER_FILE_LEVEL <= logging.DEBUG or zlogger.STD_LOGGER_FILE_LEVEL <= logging.DEBUG:
-                    pb_dec = pb2_decoder(pb2Message, output_type="json4", source=session_id)
-                    logger.debug(pb_dec)
-                
-                # File storage or publish to downstream systems
-                if pb_logger_file_output_format is not None:
-                    pb_dec = pb2_decoder(pb2Message, output_type=pb_logger_file_output_format, source=session_id)
-                    pb_logger.info(pb_dec)
-                
-                asyncio.run(ws_server.send_message(pb_dec))
-                
-                msg_no+=1
-                zlogger.info(f"> protobuf client {decoded_sessions.get(session_id)}", 
-                            f"buffer size: {csize}", 
-                            f"consumed: msg {msg_no} size {msg_length}")
+                frames = pb2_msg_slicer(session_id)
             except Exception as e:
-                logger.error(f"Error Exception 2 -> {str(e)}")
+                logger.error(f"Error Exception 1 -> {str(e)}")
+                if stopping:
+                    break
                 time.sleep(LOG_REFRESH_INTERVAL)
+                continue
+            if len(frames) == 0:
+                if stopping:
+                    break
+                # truncated message in the pb2buffer - need to wait for the rest of it
+                time.sleep(0.005)
+                continue
+            frames = pb2_route(session_id, frames)
+            if decode_pool:
+                pb2_submit_frames(session_id, frames)
+                continue
+            for msg in frames:
+                try:
+                    pb2_process_message(session_id, msg)
+                except Exception as e:
+                    logger.error(f"Error Exception 2 -> {str(e)}")
+                    continue
+        elif stopping:
+            break
         # Keep CPU more quiet...
         if csize == 0:
-            msg_no = 0
-            zlogger.info(f"> protobuf client {decoded_sessions.get(session_id)}", 
+            zlogger.debug(f"> protobuf client {decoded_sessions.get(session_id)}", 
                         f"buffer size: {csize}", 
                         f"nothing to do... waiting...")
-            time.sleep(LOG_REFRESH_INTERVAL)       
-                
-    # Set stop_event to signal thread to stop
-    stop_event.set()    
+            stop_event.wait(LOG_REFRESH_INTERVAL)
+
+
+#-----------------------------------------------
+# Replay (REPLAY_DIR)
+#  captured frames are fed back through the normal decode pipeline (decode pool, data file, websocket)
+def replay_time(value):
+    """Replay/history range bound: epoch seconds or ISO datetime (local time) -> epoch seconds."""
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def pb2_replay_frames(session_id, frames):
+    msg_counter[session_id] += len(frames)
+    zlogger.count(session_id, len(frames), sum(map(len, frames)) + FRAME_HEADER_SIZE * len(frames))
+    frames = pb2_route(session_id, frames)
+    if decode_pool:
+        pb2_submit_frames(session_id, frames)
+        return
+    for msg in frames:
+        try:
+            pb2_process_message(session_id, msg)
+        except Exception as e:
+            logger.error(f"Error Exception 2 -> {str(e)}")
+
+def pb2_replay(capture_dir, speed, start=None, end=None):
+    reader = CaptureReader(capture_dir)
+    first_ts, last_ts = reader.time_range()
+    logger.info(f"replay: {capture_dir} | {len(reader)} msg | {first_ts} - {last_ts} | speed: {speed or 'max'}")
+    pending_session = None
+    pending = []
+    for ts, session_id, seq_num, frame in reader.replay(speed, start, end):
+        if shutdown_flag:
+            break
+        if session_id not in msg_counter:
+            client_ip, client_port = decode_address(session_id)
+            decoded_sessions[session_id] = f"{client_ip}:{client_port}"
+            create_pb2_session(session_id)
+        if pending and session_id != pending_session:
+            pb2_replay_frames(pending_session, pending)
+            pending = []
+        pending_session = session_id
+        pending.append(frame[FRAME_HEADER_SIZE:])
+        # paced replay emits every frame on time, max speed replay batches frames of a session
+        if speed > 0 or len(pending) >= decode_batch_size:
+            pb2_replay_frames(pending_session, pending)
+            pending = []
+    if pending:
+        pb2_replay_frames(pending_session, pending)
+    reader.close()
+    logger.info(f"replay: {capture_dir} | done")
+
+
+#-----------------------------------------------
+# Metrics endpoint (METRICS_PORT)
+def session_metric(getter) -> list:
+    values = []
+    for session_id in pb2buffer.get_sessions():
+        try:
+            values.append(((decoded_sessions.get(session_id),), getter(session_id)))
+        except KeyError:
+            # session closed meanwhile
+            pass
+    return values
+
+def flow_metric(key) -> list:
+    return [((decoded_sessions.get(session_id),), float(flow_control.get_stats(session_id)[key]))
+            for session_id in flow_control.get_sessions()]
+
+def ws_client_metric(getter) -> list:
+    return [((f"{client.ip}:{client.port}",), getter(client)) for client in ws_server.get_connected_clients()]
+
+def gc_generation_metric(key) -> list:
+    return [((str(generation),), value) for generation, value in enumerate(gc_policy.get_stats()[key])]
+
+def register_metrics():
+    """Scrape time metrics - values the server already keeps are read instead of recorded twice."""
+    metrics.callback('protoserv_session_received_bytes_total', 'Bytes received from the session',
+                     lambda: session_metric(pb2buffer.get_received), ('session',), 'counter')
+    metrics.callback('protoserv_session_buffer_bytes', 'Bytes waiting in the session buffer',
+                     lambda: session_metric(pb2buffer.get_size), ('session',))
+    metrics.callback('protoserv_gc_collections_total', 'Garbage collections',
+                     lambda: gc_generation_metric('collections'), ('generation',), 'counter')
+    metrics.callback('protoserv_gc_collected_objects_total', 'Objects freed by the garbage collector',
+                     lambda: gc_generation_metric('collected'), ('generation',), 'counter')
+    metrics.callback('protoserv_gc_frozen_objects', 'Objects in the permanent generation (GC_FREEZE)',
+                     lambda: [((), gc_policy.get_stats()['frozen'])])
+    metrics.callback('protoserv_allocated_blocks', 'Memory blocks allocated by the interpreter (sys.getallocatedblocks)',
+                     lambda: [((), gc_policy.get_stats()['allocated_blocks'])])
+    metrics.callback('protoserv_decode_parses_total', 'Frames parsed by the inline decode contexts',
+                     lambda: [((), decode_context_stats()[0])], (), 'counter')
+    metrics.callback('protoserv_decode_messages_created_total', 'Protobuf message instances created by the inline decode contexts',
+                     lambda: [((), decode_context_stats()[1])], (), 'counter')
+    metrics.callback('protoserv_log_dropped_total', 'Log records dropped because the log queue was full',
+                     lambda: [((), zlogger.get_dropped())], (), 'counter')
+    metrics.callback('protoserv_ws_clients', 'Connected WebSocket clients',
+                     lambda: [((), len(ws_server.channels))])
+    metrics.callback('protoserv_ws_queue_depth', 'Messages queued for the WebSocket client',
+                     lambda: ws_client_metric(lambda c: c.queue_depth), ('client',))
+    metrics.callback('protoserv_ws_dropped_total', 'Messages dropped for the WebSocket client (queue overflow)',
+                     lambda: ws_client_metric(lambda c: c.dropped), ('client',), 'counter')
+    metrics.callback('protoserv_ws_sent_total', 'Messages sent to the WebSocket client',
+                     lambda: ws_client_metric(lambda c: c.tx), ('client',), 'counter')
+    if isinstance(pb_logger, DataSink):
+        metrics.callback('protoserv_datafile_written_total', 'Messages written to the data file',
+                         lambda: [((), pb_logger.written_lines)], metric_type='counter')
+        metrics.callback('protoserv_datafile_queue_bytes', 'Bytes waiting for the data file writer',
+                         lambda: [((), pb_logger.get_queue_bytes())])
+    if flow_control:
+        metrics.callback('protoserv_session_paused', 'Session reading is paused (over memory budget)',
+                         lambda: flow_metric('paused'), ('session',))
+        metrics.callback('protoserv_session_pauses_total', 'Number of times the session reading was paused',
+                         lambda: flow_metric('pauses'), ('session',), 'counter')
+        metrics.callback('protoserv_session_paused_seconds_total', 'Time the session reading was paused',
+                         lambda: flow_metric('paused_seconds'), ('session',), 'counter')
+        metrics.callback('protoserv_session_last_pause_timestamp_seconds', 'Epoch time the session reading was last paused',
+                         lambda: flow_metric('last_paused'), ('session',))
+        metrics.callback('protoserv_buffer_bytes', 'Bytes waiting in all session buffers',
+                         lambda: [((), flow_control.total)])
+        metrics.callback('protoserv_buffer_overloads_total', 'Number of times the global buffer budget was exceeded',
+                         lambda: [((), flow_control.global_overloads)], metric_type='counter')
+    if columnar_sink is not None:
+        metrics.callback('protoserv_columnar_rows_total', 'Messages written to the columnar files',
+                         lambda: [((), columnar_sink.written_rows)], metric_type='counter')
+        metrics.callback('protoserv_columnar_bytes_total', 'Bytes written to the columnar files',
+                         lambda: [((), columnar_sink.written_bytes)], metric_type='counter')
+        metrics.callback('protoserv_columnar_queue_rows', 'Messages waiting for the columnar writer',
+                         lambda: [((), columnar_sink.get_queue_rows())])
+        metrics.callback('protoserv_columnar_dropped_total', 'Messages dropped (columnar writer queue full)',
+                         lambda: [((), columnar_sink.dropped)], metric_type='counter')
+    if local_ring is not None:
+        metrics.callback('protoserv_local_ring_records_total', 'Records written to the shared memory ring',
+                         lambda: [((), local_ring.records)], metric_type='counter')
+        metrics.callback('protoserv_local_ring_reader_lag_bytes', 'Bytes the shared memory ring reader is behind the writer',
+                         lambda: [((str(pid),), lag) for pid, lag in local_ring.readers()], ('pid',))
+    if local_stream is not None:
+        metrics.callback('protoserv_local_stream_clients', 'Connected Unix socket stream clients',
+                         lambda: [((), local_stream.get_clients())])
+        metrics.callback('protoserv_local_stream_records_total', 'Records sent on the Unix socket stream',
+                         lambda: [((), local_stream.records)], metric_type='counter')
+        metrics.callback('protoserv_local_stream_dropped_total', 'Records dropped (Unix socket stream queue full)',
+                         lambda: [((), local_stream.dropped)], metric_type='counter')
+    if last_value_cache is not None:
+        metrics.callback('protoserv_last_value_entries', 'Entries in the last value cache',
+                         lambda: [((), len(last_value_cache))])
+        metrics.callback('protoserv_last_value_bytes', 'Estimated memory of the last value cache',
+                         lambda: [((), last_value_cache.bytes)])
+        metrics.callback('protoserv_last_value_evictions_total', 'Last value cache entries evicted (size/memory limit)',
+                         lambda: [((), last_value_cache.evictions)], metric_type='counter')
+        metrics.callback('protoserv_last_value_expirations_total', 'Last value cache entries expired (TTL)',
+                         lambda: [((), last_value_cache.expirations)], metric_type='counter')
+    if history is not None:
+        metrics.callback('protoserv_history_entries', 'Messages in the recent history',
+                         lambda: [((), len(history))])
+        metrics.callback('protoserv_history_bytes', 'Estimated memory of the recent history',
+                         lambda: [((), history.bytes)])
+        metrics.callback('protoserv_history_evictions_total', 'Messages evicted from the recent history (age/memory limit)',
+                         lambda: [((), history.evictions)], metric_type='counter')
+    if aggregator is not None:
+        metrics.callback('protoserv_aggregate_samples_total', 'Messages folded into the aggregation windows',
+                         lambda: [((), aggregator.samples)], metric_type='counter')
+        metrics.callback('protoserv_aggregate_records_total', 'Window summary records emitted',
+                         lambda: [((), aggregator.records)], metric_type='counter')
+        metrics.callback('protoserv_aggregate_rows', 'Aggregated (source, device, labels) rows',
+                         lambda: [((), aggregator.get_rows())])
+        metrics.callback('protoserv_aggregate_expired_rows_total', 'Aggregated rows dropped after AGGREGATE_IDLE_WINDOWS windows without samples',
+                         lambda: [((), aggregator.expired)], metric_type='counter')
+    if capture_writer:
+        metrics.callback('protoserv_capture_frames_total', 'Frames written to the capture archive',
+                         lambda: [((), capture_writer.frames)], metric_type='counter')
+
+
+#-----------------------------------------------
+# Runtime diagnostics
+#  SIGUSR1 - sampling profile + timing spans for DIAG_DURATION seconds, SIGUSR2 - tracemalloc snapshot/diff
+#  localhost WebSocket: {"action": "diagnostics", "command": "profile|spans|capture|memory|memory_stop|status", ...}
+def diagnostics_state() -> dict:
+    """Sizes of the server buffers/dicts compared between tracemalloc snapshots."""
+    buffer_bytes = 0
+    for session_id in pb2buffer.get_sessions():
+        try:
+            buffer_bytes += pb2buffer.get_size(session_id)
+        except KeyError:
+            pass
+    return {'pb2buffer sessions': len(pb2buffer.get_sessions()),
+            'pb2buffer bytes': buffer_bytes,
+            'msg_counter': len(msg_counter),
+            'decoded_sessions': len(decoded_sessions),
+            'stream_mode': len(stream_mode),
+            'last value cache': len(last_value_cache) if last_value_cache is not None else 0,
+            'history': len(history) if history is not None else 0,
+            'aggregate rows': aggregator.get_rows() if aggregator is not None else 0,
+            'ws channels': len(ws_server.channels)}
+
+def setup_diagnostics():
+    global diagnostics
+    diagnostics = Diagnostics(output_dir=os.getenv('DIAG_OUTPUT_DIR', 'log/diagnostics'),
+                              duration=float(os.getenv('DIAG_DURATION', 30)),
+                              # the loop is created by the WebSocket server thread - look it up on use
+                              profile_call=lambda callback, *args: ws_server.loop.call_soon_threadsafe(callback, *args),
+                              state=diagnostics_state,
+                              logger=logger)
+    module = sys.modules[__name__]
+    diagnostics.spans.add('slice', module, 'pb2_msg_slicer')
+    diagnostics.spans.add('parse', decoder, 'parse_frame')      # message.ParseFromString
+    diagnostics.spans.add('decode', DecodedMessage, 'decode')      # parse + to_dict of the inline decode path
+    diagnostics.spans.add('serialize', DecodedMessage, 'serialize')
+    # top level call only - the nested aos_proto is converted inside it
+    diagnostics.spans.add('to_dict', transcoder if transcoder else decoder, 'message_to_dict')
+    diagnostics.spans.add('emit', module, 'pb2_emit')
+    diagnostics.spans.add('ws_publish', ws_server, 'publish')
+    diagnostics.spans.add('ws_broadcast', ws_server, '_broadcast')
+    diagnostics.install_signals()
+    ws_server.register_command('diagnostics', diagnostics.handle_command)
+
+
+#-----------------------------------------------
+# Multi-process mode (WORKERS > 1): workers report their stats, the supervisor prints them
+def worker_stats() -> dict:
+    sessions = []
+    for session_id in pb2buffer.get_sessions():
+        try:
+            sessions.append([decoded_sessions.get(session_id), pb2buffer.get_size(session_id), msg_counter[session_id]])
+        except KeyError:
+            pass
+    return {'sessions': sessions,
+            'consumed': sum(msg_counter.values()),
+            'ws_port': ws_server.listen_port,
+            'ws_clients': [[f"{c.ip}:{c.port}", c.rx, c.tx, c.queue_depth, c.dropped]
+                           for c in ws_server.get_connected_clients()]}
+
+def supervisor_report(workers):
+    prefix = f"#--- stats ---> {get_current_datetime()}"
+    padding = '-' * max(150 - len(prefix), 0)
+    logger.info(f"{prefix} {padding}")
+    total_sessions = total_consumed = running = 0
+    for worker in workers:
+        stats = worker['stats'] or {}
+        sessions = stats.get('sessions', [])
+        consumed = stats.get('consumed', 0)
+        running += worker['pid'] is not None
+        total_sessions += len(sessions)
+        total_consumed += consumed
+        zlogger.info(f"# worker {worker['index']} (pid {worker['pid'] or '-'})",
+                    f"sessions: {len(sessions)}",
+                    f"consumed: {consumed} msg",
+                    f"restarts: {worker['restarts']}")
+        for session, size, session_consumed in sessions:
+            zlogger.info(f"# protobuf client {session} w{worker['index']}",
+                        f"buffer size: {size}",
+                        f"consumed: {session_consumed} msg")
+        for client, rx, tx, queue, dropped in stats.get('ws_clients', []):
+            zlogger.info(f"# ws client {client} w{worker['index']}:{stats.get('ws_port')}",
+                        f"socket rx: {rx} msg",
+                        f"socket tx: {tx} msg",
+                        f"queue: {queue} dropped: {dropped}")
+    zlogger.info("# total",
+                f"workers: {running}/{len(workers)}",
+                f"sessions: {total_sessions}",
+                f"consumed: {total_consumed} msg")
+    prefix = f"#--->"
+    padding = '-' * max(150 - len(prefix), 0)
+    logger.info(f"{prefix} {padding}")
+
+def run_workers(args):
+    """Forks args.workers worker processes - returns (with per worker ports and paths in args) only in a worker."""
+    global supervisor, zlogger, logger
+    zlogger = ZLogger()
+    zlogger.set_std_logger_file_output_filepath(os.getenv('STD_LOGGER_FILE_OUTPUT_FILEPATH', 'log/protoserv.log'))
+    # no QueueListener thread in the supervisor - fork() would copy its locks into the workers mid-use
+    zlogger.STD_LOGGER_WRITER = 'sync'
+    logger = zlogger.std_logger()
+    logger.info(f"supervisor: {args.workers} workers, protobuf port {args.port} (SO_REUSEPORT), "
+                f"WebSocket ports {args.ws_port}-{args.ws_port + args.workers - 1}")
+    supervisor = Supervisor(args.workers, interval=LOG_REFRESH_INTERVAL, on_report=supervisor_report, logger=logger)
+    index = supervisor.run()
+
+    # Worker: own log file and console only for warnings (the supervisor prints the stats)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    os.environ['STD_LOGGER_FILE_OUTPUT_FILEPATH'] = worker_path(os.getenv('STD_LOGGER_FILE_OUTPUT_FILEPATH', 'log/protoserv.log'), index)
+    os.environ['DATA_LOGGER_FILE_OUTPUT_FILEPATH'] = worker_path(os.getenv('DATA_LOGGER_FILE_OUTPUT_FILEPATH', 'data/protoserv.data.log'), index)
+    os.environ['DIAG_OUTPUT_DIR'] = os.path.join(os.getenv('DIAG_OUTPUT_DIR', 'log/diagnostics'), f"w{index}")
+    os.environ['STD_LOGGER_LEVEL'] = os.getenv('WORKER_STD_LOGGER_LEVEL', 'WARNING')
+    args.ws_port += index
+    if args.metrics_port > 0:
+        args.metrics_port += index
+    if args.capture_dir:
+        args.capture_dir = os.path.join(args.capture_dir, f"w{index}")
+    if args.columnar_dir:
+        args.columnar_dir = os.path.join(args.columnar_dir, f"w{index}")
+    if args.local_shm_name:
+        args.local_shm_name = f"{args.local_shm_name}-w{index}"
+    if args.local_socket_path:
+        args.local_socket_path = worker_path(args.local_socket_path, index)
 
       
 def main():
-    global shutdown_flag, server_socket, accept_thread
+    global shutdown_flag, listener, decode_pool, metrics_server
 
-    # Create a TCP/IP socket
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # Set SO_REUSEADDR option 
-    server_socket.bind((ip_address, int(port)))
-    server_socket.listen(1)
-    server_socket.settimeout(1)  # Set timeout to handle KeyboardInterrupt gracefully
+    setup_diagnostics()
+    if last_value_cache is not None:
+        ws_server.set_snapshot_provider(last_value_snapshot)
+    if history is not None:
+        ws_server.register_command('history', history_query)
 
-    logger.info(f"protobuf server: {ip_address}:{port}")
-    
-    # Start accepting connections in a separate thread
-    accept_thread = threading.Thread(target=accept_connections, daemon=True)
-    accept_thread.start()
+    if metrics_port > 0:
+        register_metrics()
+        metrics_server = MetricsServer(metrics, metrics_ip_address, metrics_port, logger=logger)
+        if history is not None:
+            metrics_server.add_route('/history', lambda query: ('application/json', history_query(query)))
+        metrics_server.start()
+
+    if decode_workers > 0:
+        decode_pool = DecodePool(proto_dir, on_result=pb2_decoded,
+                                 workers=decode_workers,
+                                 batch_size=decode_batch_size,
+                                 reorder_window=decode_reorder_window,
+                                 transcoder=transcoder_mode,
+                                 logger=logger,
+                                 on_batch=pb2_decoded_batch,
+                                 reuse_limit=decode_reuse_limit,
+                                 gc_threshold=gc_policy.threshold,
+                                 gc_freeze=gc_policy.freeze_enabled)
+        decode_pool.start()
+
+    # Everything alive now lives until shutdown - out of the collector's way
+    gc_policy.freeze()
+
+    if replay_dir:
+        # No protobuf listener - captured frames are the input
+        threading.Thread(target=pb2_replay, args=(replay_dir, replay_speed, replay_start, replay_end), daemon=True).start()
+    elif ingest_mode == "asyncio":
+        # Protobuf listener shares the WebSocket server event loop
+        ws_server.run_coroutine_threadsafe(start_ingest_server()).result()
+    else:
+        # every worker binds the port with SO_REUSEPORT - the kernel spreads connections across them
+        listener = TCPListener(ip_address, port, accept_connection,
+                               backlog=ingest_backlog,
+                               reuse_port=supervisor is not None,
+                               options=ingest_options,
+                               logger=logger)
+        listener.start()
 
     # Keep reporting status until shutdown
     while True:
@@ -321,20 +982,90 @@ def main():
         logger.info(f"{prefix} {padding}")
         
         for session_id in pb2buffer.get_sessions():
+            # per message activity is only counted on the hot path - rates since the previous stats
+            messages, size, seconds = zlogger.interval(session_id)
             zlogger.info(f"# protobuf client {decoded_sessions.get(session_id)}", 
                         f"buffer size: {pb2buffer.get_size(session_id)}", 
-                        f"consumed: {msg_counter[session_id]} msg")
+                        f"consumed: {msg_counter[session_id]} msg",
+                        f"rate: {messages / seconds if seconds else 0:.0f} msg/s {size / seconds / 1024 if seconds else 0:.0f} KiB/s")
+            if flow_control and flow_control.get_stats(session_id)['pauses']:
+                flow = flow_control.get_stats(session_id)
+                zlogger.info(f"# protobuf client {decoded_sessions.get(session_id)}",
+                            f"paused: {'yes' if flow['paused'] else 'no'}",
+                            f"pauses: {flow['pauses']} ({flow['paused_seconds']:.1f} s)")
         for ws_client in ws_server.get_connected_clients():
             zlogger.info(f"# ws client {ws_client.ip}:{ws_client.port}", 
                         f"socket rx: {ws_client.rx} msg", 
-                        f"socket tx: {ws_client.tx} msg")
-        
+                        f"socket tx: {ws_client.tx} msg",
+                        f"queue: {ws_client.queue_depth} dropped: {ws_client.dropped}")
+        if isinstance(pb_logger, DataSink):
+            zlogger.info(f"# data file {pb_logger.filepath}",
+                        f"written: {pb_logger.written_lines} msg",
+                        f"batches: {pb_logger.batches} rotations: {pb_logger.rotations}",
+                        f"queued: {pb_logger.get_queue_bytes()} B")
+        if columnar_sink is not None:
+            zlogger.info(f"# columnar {columnar_sink.directory} ({columnar_sink.file_format})",
+                        f"written: {columnar_sink.written_rows} msg",
+                        f"row groups: {columnar_sink.row_groups}",
+                        f"queued: {columnar_sink.get_queue_rows()} dropped: {columnar_sink.dropped}")
+        if local_ring is not None:
+            zlogger.info(f"# local ring /dev/shm/{local_ring.name}",
+                        f"written: {local_ring.records} msg",
+                        f"readers: {len(local_ring.readers())}",
+                        f"max lag: {max([lag for _, lag in local_ring.readers()], default=0)} B")
+        if local_stream is not None:
+            zlogger.info(f"# local stream {local_stream.path}",
+                        f"sent: {local_stream.records} msg",
+                        f"clients: {local_stream.get_clients()}",
+                        f"batches: {local_stream.batches} dropped: {local_stream.dropped}")
+        gc_stats = gc_policy.get_stats()
+        zlogger.info("# gc",
+                    f"collections: {'/'.join(str(count) for count in gc_stats['collections'])} forced: {gc_stats['forced']}",
+                    f"pause: {sum(gc_stats['pause_seconds']) * 1000:.1f} ms max {max(gc_stats['max_pause']) * 1000:.1f} ms",
+                    f"blocks: {gc_stats['allocated_blocks']} frozen: {gc_stats['frozen']}")
+        if decode_reuse_limit > 0 and decode_contexts:
+            parses, created = decode_context_stats()
+            zlogger.info("# decode context",
+                        f"parses: {parses}",
+                        f"messages created: {created}",
+                        f"reuse limit: {decode_reuse_limit}")
+        if zlogger.get_dropped():
+            zlogger.info("# log queue",
+                        f"dropped: {zlogger.get_dropped()} records",
+                        f"queue size: {zlogger.STD_LOGGER_QUEUE_SIZE}")
+        if last_value_cache is not None:
+            last_value_cache.expire()
+            zlogger.info("# last value cache",
+                        f"entries: {len(last_value_cache)}",
+                        f"memory: {last_value_cache.bytes} B",
+                        f"evicted: {last_value_cache.evictions} expired: {last_value_cache.expirations}")
+        if history is not None:
+            history.expire()
+            zlogger.info("# history",
+                        f"messages: {len(history)}",
+                        f"memory: {history.bytes} B",
+                        f"evicted: {history.evictions}")
+        if aggregator is not None:
+            pb2_emit_aggregates(aggregator.flush())
+            zlogger.info(f"# aggregate {','.join(sorted(aggregator.types))} {aggregator.window:g}s",
+                        f"rows: {aggregator.get_rows()}",
+                        f"samples: {aggregator.samples} msg",
+                        f"summaries: {aggregator.records} ({aggregator.windows} windows)")
+        if capture_writer:
+            capture_writer.flush()
+            zlogger.info(f"# capture {capture_writer.segment_path}",
+                        f"captured: {capture_writer.frames} msg",
+                        f"segments: {capture_writer.segments}")
+
         prefix = f"#--->"
         padding = '-' * max(150 - len(prefix), 0)  
         logger.info(f"{prefix} {padding}")
         
-        gc.collect()
-        logger.debug(f"garbage collection> {gc.get_stats()}")
+        if supervisor and not supervisor.report(worker_stats()):
+            logger.error("supervisor is gone - shutting down")
+            signal_handler(signal.SIGINT, None)
+
+        gc_policy.tick()
         time.sleep(LOG_REFRESH_INTERVAL) # Check sessions periodically
 
 
@@ -347,14 +1078,86 @@ if __name__ == "__main__":
     parser.add_argument("--apstra-version", default=os.getenv('APSTRA_VERSION', '4.2.1'), help="Specify Apstra version. Default: 4.2.1")
     parser.add_argument("--port", default=os.getenv('LISTEN_PORT', 4444), help="Specify port number to listen on. Default: 4444")
     parser.add_argument("--ip-address", default=os.getenv('LISTEN_IPADDRESS', "0.0.0.0"), help="Specify IP address to listen on. Default: 0.0.0.0")
-    parser.add_argument("--pb-logger-file-output-format", default=os.getenv('PB_LOGGER_FILE_OUTPUT_FORMAT', "json"), help="Specify data log format: json, json4, dict. Default: json")
+    parser.add_argument("--pb-logger-file-output-format", default=os.getenv('PB_LOGGER_FILE_OUTPUT_FORMAT', "json"), help="Specify data log format: json, json4, dict, none (no data file). Default: json")
+    parser.add_argument("--pb-logger-message-types", default=os.getenv('PB_LOGGER_MESSAGE_TYPES', ""), help="Specify comma separated message types written to the data file, ie. alert,event (empty - all). Default: all")
+    parser.add_argument("--columnar-dir", default=os.getenv('COLUMNAR_DIR', ""), help="Specify directory for per message type columnar files - parquet (pyarrow) or built-in pcol (empty - disabled). Default: none")
+    parser.add_argument("--columnar-format", default=os.getenv('COLUMNAR_FORMAT', "auto"), choices=list(COLUMNAR_FORMATS), help="Specify columnar file format: auto (parquet if pyarrow is installed), parquet, pcol. Default: auto")
+    parser.add_argument("--local-shm-name", default=os.getenv('LOCAL_SHM_NAME', ""), help="Specify shared memory name of the ring for co-located consumers, ie. protoserv (empty - disabled). Default: none")
+    parser.add_argument("--local-socket-path", default=os.getenv('LOCAL_SOCKET_PATH', ""), help="Specify Unix socket path of the stream for co-located consumers (empty - disabled). Default: none")
+    parser.add_argument("--local-output-format", default=os.getenv('LOCAL_OUTPUT_FORMAT', "json"), choices=list(LOCAL_OUTPUT_FORMATS), help="Specify records of the shared memory ring / Unix socket stream: json (decoded message), raw (frame payload). Default: json")
+    parser.add_argument("--last-value-cache-size", type=int, default=int(os.getenv('LAST_VALUE_CACHE_SIZE', 0)), help="Specify max number of entities in the last value cache sent to WebSocket clients asking for a snapshot (0 - disabled). Default: 0")
+    parser.add_argument("--history-max-age", type=float, default=float(os.getenv('HISTORY_MAX_AGE', 0)), help="Specify how many seconds of decoded messages are kept in memory for history queries (0 - disabled). Default: 0")
+    parser.add_argument("--aggregate-window", type=float, default=float(os.getenv('AGGREGATE_WINDOW', 0)), help="Specify window in seconds of the perf_mon counter aggregation - one summary record (min/max/avg/last/rate) per counter group and window instead of raw samples (0 - disabled). Default: 0")
+    parser.add_argument("--decode-workers", type=int, default=int(os.getenv('DECODE_WORKERS', 0)), help="Specify number of decode worker processes (0 - decode in the consumer thread). Default: 0")
+    parser.add_argument("--decode-batch-size", type=int, default=int(os.getenv('DECODE_BATCH_SIZE', 64)), help="Specify max number of messages per decode worker task. Default: 64")
+    parser.add_argument("--decode-reorder-window", type=int, default=int(os.getenv('DECODE_REORDER_WINDOW', 4096)), help="Specify max number of in-flight messages per session (seq_num reorder window). Default: 4096")
+    parser.add_argument("--transcoder", default=os.getenv('TRANSCODER', "fast"), choices=["fast", "json_format"], help="Specify protobuf to dict converter: fast (generated from schema descriptors), json_format (MessageToDict). Default: fast")
+    parser.add_argument("--ws-queue-size", type=int, default=int(os.getenv('WS_QUEUE_SIZE', 1000)), help="Specify max number of queued messages per WebSocket client. Default: 1000")
+    parser.add_argument("--ws-overflow-policy", default=os.getenv('WS_OVERFLOW_POLICY', "drop_oldest"), choices=["drop_oldest", "drop_newest", "disconnect"], help="Specify what to do when WebSocket client queue is full. Default: drop_oldest")
+    parser.add_argument("--ws-compression", default=os.getenv('WS_COMPRESSION', "deflate"), choices=["deflate", "none"], help="Specify WebSocket permessage-deflate support (negotiated per client). Default: deflate")
+    parser.add_argument("--capture-dir", default=os.getenv('CAPTURE_DIR', ""), help="Specify directory for raw frame capture archive (empty - no capture). Default: none")
+    parser.add_argument("--replay", default=os.getenv('REPLAY_DIR', ""), help="Specify capture directory to replay instead of listening for protobuf connections. Default: none")
+    parser.add_argument("--replay-speed", type=float, default=float(os.getenv('REPLAY_SPEED', 1.0)), help="Specify replay speed: 1 - recorded speed, 2 - twice as fast, 0 - as fast as possible. Default: 1")
+    parser.add_argument("--replay-start", default=os.getenv('REPLAY_START', ""), help="Specify replay start time (epoch seconds or ISO datetime). Default: first captured frame")
+    parser.add_argument("--replay-end", default=os.getenv('REPLAY_END', ""), help="Specify replay end time (epoch seconds or ISO datetime). Default: last captured frame")
+    parser.add_argument("--metrics-port", type=int, default=int(os.getenv('METRICS_PORT', 9108)), help="Specify port of the Prometheus metrics endpoint (http://<metrics-ip-address>:<port>/metrics, 0 - disabled). Default: 9108")
+    parser.add_argument("--metrics-ip-address", default=os.getenv('METRICS_LISTEN_IP', "127.0.0.1"), help="Specify IP address of the metrics endpoint (/metrics, /history) to listen on. Default: 127.0.0.1")
+    parser.add_argument("--overload-policy", default=os.getenv('BUFFER_OVERLOAD_POLICY', "pause"), choices=list(OVERLOAD_POLICIES), help="Specify what to do when a session buffer is over its memory budget: pause (stop reading the socket), disconnect, none (metrics only). Default: pause")
+    parser.add_argument("--workers", type=int, default=int(os.getenv('WORKERS', 1)), help="Specify number of worker processes sharing the protobuf port (SO_REUSEPORT); worker N uses WebSocket/metrics port + N. Default: 1")
+    parser.add_argument("--ws-port", type=int, default=int(os.getenv('WS_PORT', 8765)), help="Specify WebSocket server port. Default: 8765")
+    parser.add_argument("--ingest-backlog", type=int, default=int(os.getenv('INGEST_BACKLOG', 128)), help="Specify listen backlog of the protobuf port (connections queued by the kernel until accepted). Default: 128")
+    parser.add_argument("--ingest-idle-timeout", type=float, default=float(os.getenv('INGEST_IDLE_TIMEOUT', 21600)), help="Specify seconds after which a protobuf connection that sends nothing is closed (0 - never). Default: 21600")
+    parser.add_argument("--ingest-mode", default=os.getenv('INGEST_MODE', "thread"), choices=["thread", "asyncio"], help="Specify protobuf ingest model: thread (thread per connection), asyncio (shared event loop with WebSocket server). Default: thread")
 
     # Retrieve values from Args
     args = parser.parse_args()
+    if args.workers > 1:
+        if args.replay:
+            parser.error("--replay runs in a single process (--workers 1)")
+        run_workers(args)
     apstra_version = args.apstra_version
     port = args.port
     ip_address = args.ip_address
     pb_logger_file_output_format = args.pb_logger_file_output_format
+    if pb_logger_file_output_format in ("", "none"):
+        pb_logger_file_output_format = None
+    ingest_mode = args.ingest_mode
+    decode_workers = args.decode_workers
+    decode_batch_size = args.decode_batch_size
+    decode_reorder_window = args.decode_reorder_window
+    transcoder_mode = args.transcoder
+    decode_reuse_limit = int(os.getenv('DECODE_REUSE_LIMIT', DECODE_REUSE_LIMIT))
+    gc_policy = GCPolicy(parse_threshold(os.getenv('GC_THRESHOLD', "")),
+                         freeze=int(os.getenv('GC_FREEZE', 1)) > 0,
+                         collect_interval=float(os.getenv('GC_COLLECT_INTERVAL', 0)),
+                         on_pause=lambda generation, seconds: m_gc_pause.observe(seconds, (str(generation),)))
+    ws_queue_size = args.ws_queue_size
+    ws_overflow_policy = args.ws_overflow_policy
+    ws_compression = args.ws_compression
+    metrics_port = args.metrics_port
+    metrics_ip_address = args.metrics_ip_address
+    replay_dir = args.replay
+    replay_speed = args.replay_speed
+    replay_start = replay_time(args.replay_start)
+    replay_end = replay_time(args.replay_end)
+    ingest_options = SocketOptions(rcvbuf=int(os.getenv('INGEST_RCVBUF', 0)),
+                                   keepalive=int(os.getenv('INGEST_KEEPALIVE', 1)) > 0,
+                                   keepidle=int(os.getenv('INGEST_KEEPALIVE_IDLE', 60)),
+                                   keepintvl=int(os.getenv('INGEST_KEEPALIVE_INTERVAL', 10)),
+                                   keepcnt=int(os.getenv('INGEST_KEEPALIVE_COUNT', 6)),
+                                   idle_timeout=args.ingest_idle_timeout)
+    ingest_backlog = args.ingest_backlog
+    ingest_read_min = int(os.getenv('INGEST_READ_MIN', 16 * 1024))
+    ingest_read_max = int(os.getenv('INGEST_READ_MAX', 1024 * 1024))
+    flow_control = FlowControl(session_high=int(os.getenv('BUFFER_SESSION_HIGH_WATER', 64 * 1024 * 1024)),
+                               session_low=int(os.getenv('BUFFER_SESSION_LOW_WATER', 32 * 1024 * 1024)),
+                               global_high=int(os.getenv('BUFFER_GLOBAL_HIGH_WATER', 512 * 1024 * 1024)),
+                               global_low=int(os.getenv('BUFFER_GLOBAL_LOW_WATER', 384 * 1024 * 1024)),
+                               policy=args.overload_policy)
+    if args.capture_dir and not replay_dir:
+        capture_writer = CaptureWriter(args.capture_dir,
+                                       segment_bytes=int(os.getenv('CAPTURE_SEGMENT_BYTES', 256 * 1024 * 1024)),
+                                       max_segments=int(os.getenv('CAPTURE_MAX_SEGMENTS', 0)))
     
     # Get the directory where the current schema is located
     script_dir = os.path.dirname(os.path.realpath(__file__))
@@ -364,17 +1167,79 @@ if __name__ == "__main__":
     sys.path.append(proto_dir)
     for path in sys.path:
         print(path)
-    import streaming_telemetry_schema_pb2
+    streaming_telemetry_schema_pb2 = load_schema(proto_dir)
+    wire_scanner = WireScanner(streaming_telemetry_schema_pb2)
+    if args.last_value_cache_size > 0:
+        last_value_cache = LastValueCache(max_entries=args.last_value_cache_size,
+                                          ttl=float(os.getenv('LAST_VALUE_CACHE_TTL', 3600)),
+                                          max_bytes=int(os.getenv('LAST_VALUE_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+                                          entity_fields=os.getenv('LAST_VALUE_CACHE_ENTITY_FIELDS', ",".join(ENTITY_FIELDS)).split(','))
+        if os.getenv('LAST_VALUE_CACHE_TYPES'):
+            last_value_types = {t.strip() for t in os.getenv('LAST_VALUE_CACHE_TYPES').split(',') if t.strip()}
+    if args.history_max_age > 0:
+        history = HistoryStore(max_age=args.history_max_age,
+                               max_bytes=int(os.getenv('HISTORY_MAX_BYTES', 64 * 1024 * 1024)),
+                               max_entries=int(os.getenv('HISTORY_MAX_ENTRIES', 0)))
+        if os.getenv('HISTORY_TYPES'):
+            history_types = {t.strip() for t in os.getenv('HISTORY_TYPES').split(',') if t.strip()}
+    if args.aggregate_window > 0:
+        try:
+            aggregator = Aggregator(streaming_telemetry_schema_pb2, window=args.aggregate_window,
+                                    types=[t.strip() for t in os.getenv('AGGREGATE_TYPES', 'perf_mon').split(',') if t.strip()],
+                                    idle_windows=int(os.getenv('AGGREGATE_IDLE_WINDOWS', AGGREGATE_IDLE_WINDOWS)))
+        except ValueError as e:
+            parser.error(str(e))
+        aggregate_passthrough = {t.strip() for t in os.getenv('AGGREGATE_PASSTHROUGH', '').split(',') if t.strip()}
+    if args.columnar_dir:
+        try:
+            columnar_sink = ColumnarSink(args.columnar_dir, streaming_telemetry_schema_pb2,
+                                         file_format=args.columnar_format,
+                                         compression=os.getenv('COLUMNAR_COMPRESSION', 'zstd'),
+                                         row_group_rows=int(os.getenv('COLUMNAR_ROW_GROUP_ROWS', 10000)),
+                                         flush_interval=float(os.getenv('COLUMNAR_FLUSH_INTERVAL', 60)),
+                                         rotate_interval=float(os.getenv('COLUMNAR_ROTATE_INTERVAL', 3600)))
+        except ValueError as e:
+            parser.error(str(e))
+        if os.getenv('COLUMNAR_TYPES'):
+            columnar_types = {t.strip() for t in os.getenv('COLUMNAR_TYPES').split(',') if t.strip()}
+    local_output_format = args.local_output_format
+    if args.local_shm_name:
+        local_ring = ShmRingWriter(args.local_shm_name, size=int(os.getenv('LOCAL_SHM_SIZE', 64 * 1024 * 1024)))
+    if args.local_socket_path:
+        local_stream = UnixStreamServer(args.local_socket_path,
+                                        batch_bytes=int(os.getenv('LOCAL_SOCKET_BATCH_BYTES', 256 * 1024)),
+                                        flush_interval=float(os.getenv('LOCAL_SOCKET_FLUSH_INTERVAL', 0.005)))
+    if args.pb_logger_message_types:
+        datafile_types = {t.strip() for t in args.pb_logger_message_types.split(',') if t.strip()}
+        supported = wire_scanner.types | {AGGREGATE_TYPE}
+        if datafile_types - supported:
+            parser.error(f"unknown message types: {', '.join(sorted(datafile_types - supported))} - "
+                         f"supported: {', '.join(sorted(supported))}")
+    if transcoder_mode == "fast":
+        transcoder = Transcoder(streaming_telemetry_schema_pb2)
 
     # Create a logger and default level
     zlogger = ZLogger()
     zlogger.set_std_logger_file_output_filepath(os.getenv('STD_LOGGER_FILE_OUTPUT_FILEPATH', 'log/protoserv.log'))
     zlogger.set_data_logger_file_output_filepath(os.getenv('DATA_LOGGER_FILE_OUTPUT_FILEPATH', 'data/protoserv.data.log'))
     logger = zlogger.std_logger()
-    pb_logger = zlogger.data_logger()
+    flow_control.logger = logger
+    gc_policy.logger = logger
+    gc_policy.install()
+    pb_logger = zlogger.data_sink()
+    if columnar_sink is not None:
+        columnar_sink.logger = logger
+        columnar_sink.start()
+    if local_stream is not None:
+        local_stream.logger = logger
+        local_stream.start()
 
     # Start WebSocket Server-Transmiter
-    ws_server = WSServer(logger=logger)
+    ws_server = WSServer(port=args.ws_port, logger=logger, queue_size=ws_queue_size, overflow_policy=ws_overflow_policy,
+                         compression=ws_compression,
+                         compression_level=int(os.getenv('WS_COMPRESSION_LEVEL', 6)),
+                         compression_window_bits=int(os.getenv('WS_COMPRESSION_WINDOW_BITS', 12)),
+                         compression_mem_level=int(os.getenv('WS_COMPRESSION_MEM_LEVEL', 5)))
     ws_server.start_server()
     if ws_server.get_server_status() == False:
         signal_handler(signal.SIGINT, None)
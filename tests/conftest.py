@@ -0,0 +1,7 @@
+import os
+import sys
+
+# protoserv package and the bench helpers (stream.py, corpus of bench_transcoder.py) without installing anything
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(1, os.path.join(PROJECT_DIR, 'bench'))
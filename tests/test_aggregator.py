@@ -0,0 +1,71 @@
+import pytest
+
+from protoserv import aggregator as aggregator_module
+from protoserv.aggregator import Aggregator
+from test_transcoder import build_schema
+
+
+WINDOW = 60.0
+
+
+def sample(interface: str, tx_bytes: int, timestamp: float) -> dict:
+    return {'timestamp': str(int(timestamp * 1000000)), 'origin_name': 'SYS1',
+            'alert': {'id': 'a1', 'counters': {'interface_name': interface, 'tx_bytes': str(tx_bytes)}}}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(aggregator_module, 'time', clock)
+    return clock
+
+
+def run_window(aggregator, clock, window: int, interfaces) -> dict:
+    """Feeds two samples per interface into ``window``; returns {interface: tx_bytes summary} once it ends."""
+    start = window * WINDOW
+    clock.now = start + 1
+    aggregator.flush()
+    for interface in interfaces:
+        aggregator.add('10.0.0.1', 'alert', sample(interface, window * 100, start + 1))
+        aggregator.add('10.0.0.1', 'alert', sample(interface, window * 100 + 50, start + 11))
+    clock.now = start + WINDOW + 1
+    return {record['aggregate']['counters']['interface_name']: record['aggregate']['counters']['counters']['tx_bytes']
+            for _, record in aggregator.flush()}
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_idle_rows_are_dropped(clock, use_numpy):
+    aggregator = Aggregator(build_schema(), window=WINDOW, types=('alert',), use_numpy=use_numpy, idle_windows=2)
+    assert set(run_window(aggregator, clock, 1, ['eth0', 'eth1', 'eth2'])) == {'eth0', 'eth1', 'eth2'}
+    assert aggregator.get_rows() == 3
+    # eth0 goes away - kept while idle for less than 2 windows
+    assert set(run_window(aggregator, clock, 2, ['eth1', 'eth2'])) == {'eth1', 'eth2'}
+    assert aggregator.get_rows() == 3
+    summaries = run_window(aggregator, clock, 3, ['eth2'])
+    assert aggregator.get_rows() == 2 and aggregator.expired == 1
+    # compacted rows keep their state: eth2 rate against its previous window
+    assert summaries['eth2']['rate'] == pytest.approx(100 / WINDOW)
+    assert summaries['eth2']['min'] == 300 and summaries['eth2']['max'] == 350
+    run_window(aggregator, clock, 4, ['eth2'])
+    assert aggregator.get_rows() == 1 and aggregator.expired == 2
+    # an expired row comes back as a new one
+    summaries = run_window(aggregator, clock, 5, ['eth0', 'eth2'])
+    assert aggregator.get_rows() == 2
+    assert summaries['eth0']['rate'] == pytest.approx(50 / 10)
+    assert summaries['eth2']['rate'] == pytest.approx(100 / WINDOW)
+
+
+def test_idle_windows_zero_keeps_rows(clock):
+    aggregator = Aggregator(build_schema(), window=WINDOW, types=('alert',), idle_windows=0)
+    run_window(aggregator, clock, 1, ['eth0', 'eth1'])
+    for window in range(2, 6):
+        run_window(aggregator, clock, window, [])
+    assert aggregator.get_rows() == 2 and aggregator.expired == 0
@@ -0,0 +1,104 @@
+import socket
+
+import pytest
+
+from protoserv.buffer import Buffer, _Session
+
+
+@pytest.fixture
+def socket_pair():
+    left, right = socket.socketpair()
+    yield left, right
+    left.close()
+    right.close()
+
+
+def test_reserve_keeps_free_space():
+    session = _Session()
+    session.reserve(100)
+    assert len(session.data) >= 100 and len(session) == 0
+    session.append(b'x' * 60)
+    data = session.data
+    session.reserve(40)
+    assert session.data is data     # fits, nothing moved
+
+
+def test_recv_into(socket_pair):
+    left, right = socket_pair
+    session = _Session()
+    session.append(b'head')
+    left.sendall(b'payload')
+    assert session.recv_into(right, 1024) == 7
+    assert bytes(session.data[session.start:session.end]) == b'headpayload'
+    assert session.received == 11
+    left.close()
+    assert session.recv_into(right, 1024) == 0
+
+
+def test_consume_rewinds_empty_session():
+    session = _Session()
+    session.append(b'abcdef')
+    session.consume(2)
+    assert (session.start, session.end, len(session)) == (2, 6, 4)
+    session.consume(100)
+    assert (session.start, session.end, len(session)) == (0, 0, 0)
+
+
+def test_reserve_reclaims_consumed_prefix():
+    session = _Session()
+    session.append(b'a' * 100)
+    capacity = len(session.data)
+    session.consume(90)
+    session.reserve(capacity - 20)
+    assert len(session.data) == capacity and session.start == 0
+    assert bytes(session.data[:len(session)]) == b'a' * 10
+
+
+def test_growth_past_initial_capacity():
+    buffer = Buffer()
+    buffer.create_session(1)
+    chunks = [bytes([i]) * (i * 37 + 1) for i in range(64)]
+    for chunk in chunks:
+        buffer.append(1, chunk)
+    assert buffer.get_size(1) == sum(map(len, chunks))
+    assert buffer.get(1, buffer.get_size(1)) == b''.join(chunks)
+    assert buffer.get_received(1) == sum(map(len, chunks))
+
+
+def test_pinned_view_survives_compaction_and_growth():
+    buffer = Buffer()
+    buffer.create_session(1)
+    buffer.append(1, b'0123456789')
+    view = buffer.peek(1, 2, 6)
+    buffer.remove_elements(1, 8)
+    assert buffer.compact(1) == 2           # pinned - nothing moved
+    assert bytes(view) == b'2345'
+    buffer.append(1, b'x' * 4096)           # reserve leaves the pinned memory to the view
+    assert bytes(view) == b'2345'
+    assert buffer.get(1, 6) == b'89xxxx'
+    view.release()
+    assert buffer.remove_elements(1, 2) == 4096
+    assert buffer.compact(1) == 4096
+    assert buffer.buffer[1].start == 0
+    assert buffer.get(1, 4096) == b'x' * 4096
+
+
+def test_reserve_commit():
+    buffer = Buffer()
+    buffer.create_session(1)
+    target = buffer.reserve(1, 16)
+    target[:5] = b'hello'
+    assert buffer.commit(1, 5) == 5
+    assert buffer.get(1, 5) == b'hello'
+    assert buffer.buffer[1].reserved is None
+
+
+def test_reserve_moves_away_from_pinned_memory():
+    session = _Session()
+    session.append(b'a' * 90 + b'b' * 10)
+    capacity = len(session.data)
+    view = memoryview(session.data)[:90]
+    session.consume(90)
+    session.reserve(capacity - 20)          # would reclaim the prefix in place
+    assert len(session.data) == capacity and bytes(session.data[:10]) == b'b' * 10
+    assert bytes(view) == b'a' * 90
@@ -0,0 +1,99 @@
+import os
+import glob
+import gzip
+import time
+
+import pytest
+
+from protoserv.datasink import DataSink
+
+
+def wait_written(sink: DataSink, lines: int, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while sink.written_lines < lines:
+        assert time.monotonic() < deadline, "writer thread did not write the lines"
+        time.sleep(0.01)
+
+
+def read_lines(paths, opener=open) -> list:
+    lines = []
+    for path in sorted(paths, key=lambda p: os.stat(p).st_mtime_ns):
+        with opener(path, 'rt') as f:
+            lines.extend(f.read().splitlines())
+    return lines
+
+
+def test_close_flushes_pending_records(tmp_path):
+    path = str(tmp_path / 'data.log')
+    # nothing would wake the writer before close(): huge batch, long flush interval
+    sink = DataSink(path, when='none', batch_bytes=1 << 30, flush_interval=60).start()
+    for i in range(1000):
+        sink.write(f'line {i}')
+    sink.close()
+    assert read_lines([path]) == [f'line {i}' for i in range(1000)]
+    assert sink.written_lines == 1000
+
+
+def test_close_flushes_gzip(tmp_path):
+    path = str(tmp_path / 'data.log')
+    sink = DataSink(path, when='none', compression='gzip', flush_interval=60).start()
+    sink.write('{"a": 1}')
+    sink.info('{"b": 2}')
+    sink.close()
+    assert read_lines([path + '.gz'], gzip.open) == ['{"a": 1}', '{"b": 2}']
+
+
+def test_rotate_on_size(tmp_path):
+    path = str(tmp_path / 'data.log')
+    sink = DataSink(path, when='none', max_bytes=100, backup_count=0, batch_bytes=1).start()
+    for i in range(20):
+        sink.write(f'record {i:02d} ' + 'x' * 20)      # 31 bytes per line
+        wait_written(sink, i + 1)
+    sink.close()
+    files = glob.glob(path + '*')
+    assert sink.rotations == len(files) - 1 >= 5
+    # every file holds whole lines and stays within max_bytes
+    assert all(os.path.getsize(f) <= 100 for f in files)
+    assert read_lines(files) == [f'record {i:02d} ' + 'x' * 20 for i in range(20)]
+
+
+def test_rotate_on_size_keeps_backup_count(tmp_path):
+    path = str(tmp_path / 'data.log')
+    sink = DataSink(path, when='none', max_bytes=50, backup_count=2, batch_bytes=1).start()
+    for i in range(10):
+        sink.write('y' * 40)
+        wait_written(sink, i + 1)
+    sink.close()
+    assert sink.rotations == 9
+    assert len(glob.glob(path + '*')) == 3
+
+
+def test_rotate_on_time(tmp_path):
+    path = str(tmp_path / 'data.log')
+    sink = DataSink(path, when='S', interval=3600, backup_count=0, batch_bytes=1).start()
+    sink.write('before')
+    wait_written(sink, 1)
+    assert sink.rotations == 0
+    sink.rollover_at = time.time() - 1      # the hour is over
+    sink.write('after')
+    wait_written(sink, 2)
+    sink.close()
+    rotated = glob.glob(path + ".*")
+    assert sink.rotations == 1 and len(rotated) == 1
+    assert read_lines(rotated) == ['before']
+    assert read_lines([path]) == ['after']
+    assert sink.rollover_at > time.time() + 3000
+
+
+@pytest.mark.parametrize("when", ["midnight", "W0", "H"])
+def test_next_rollover(when):
+    sink = DataSink('unused', when=when)
+    now = time.time()
+    assert now < sink._next_rollover(now) <= now + 8 * 86400
+
+
+def test_invalid_options():
+    with pytest.raises(ValueError):
+        DataSink('unused', compression='zip')
+    with pytest.raises(ValueError):
+        DataSink('unused', when='X')._next_rollover(time.time())
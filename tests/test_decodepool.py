@@ -0,0 +1,111 @@
+import os
+import threading
+
+import pytest
+
+import stream
+from protoserv.decodepool import DecodeError, DecodePool, ReorderWindow
+from protoserv.decoder import message_to_dict, parse_frame
+
+
+def push_all(window: ReorderWindow, keys) -> list:
+    released = []
+    for key in keys:
+        released.extend(window.push(key, key))
+    return released
+
+
+def test_in_order_release():
+    window = ReorderWindow()
+    for key in range(1, 6):
+        window.expect(key)
+    assert window.push(1, 'a') == ['a']
+    assert window.push(3, 'c') == []            # waits for 2
+    assert window.push(4, 'd') == []
+    assert window.push(2, 'b') == ['b', 'c', 'd']
+    assert window.push(5, 'e') == ['e']
+    assert len(window) == 0
+
+
+def test_gaps_do_not_stall():
+    window = ReorderWindow()
+    keys = [10, 11, 15, 40, 41, 100]             # seq_num gaps - never submitted keys are not waited for
+    for key in keys:
+        window.expect(key)
+    assert push_all(window, [41, 15, 100, 10]) == [10]
+    assert push_all(window, [11]) == [11, 15]
+    assert push_all(window, [40]) == [40, 41, 100]
+
+
+def test_duplicate_keys():
+    window = ReorderWindow()
+    for key in (1, 2, 2, 3):
+        window.expect(key)
+    assert push_all(window, [2, 3, 1]) == [1, 2]
+    assert push_all(window, [2]) == [2, 3]
+
+
+def test_overflow_releases_smallest():
+    window = ReorderWindow(max_size=3)
+    for key in range(1, 8):
+        window.expect(key)
+    assert push_all(window, [2, 3, 4]) == []
+    assert window.push(5, 5) == [2]             # over max_size - 1 is still in flight
+    assert window.push(6, 6) == [3]
+    assert window.push(1, 1) == [1, 4, 5, 6]
+    assert window.push(7, 7) == [7]
+
+
+def test_seq_num_wrap():
+    # Apstra restarted the sequence (or uint64 wrapped) while old keys are still decoding
+    window = ReorderWindow()
+    top = 2 ** 64 - 1
+    for key in (top - 1, top, 0, 1):
+        window.expect(key)
+    # the new sequence is not held back behind the old keys, nothing is lost
+    assert push_all(window, [0, 1]) == [0, 1]
+    assert push_all(window, [top]) == []
+    assert push_all(window, [top - 1]) == [top - 1, top]
+    assert len(window) == 0 and not window.in_flight
+
+
+def apstra_proto_dir() -> str:
+    # compiled schema of proto/<APSTRA_VERSION> (proto2py.sh) - not part of the repository
+    proto_dir = os.path.join(stream.PROJECT_DIR, 'proto', os.getenv('APSTRA_VERSION', '4.2.1'))
+    if not os.path.exists(os.path.join(proto_dir, 'streaming_telemetry_schema_pb2.py')):
+        pytest.skip(f"no compiled schema in {proto_dir}")
+    return proto_dir
+
+
+def test_decode_pool_round_trip():
+    proto_dir = apstra_proto_dir()
+    schema = stream.schema_for(os.getenv('APSTRA_VERSION', '4.2.1'))
+    payloads = stream.build_payloads(schema, 50, sequenced=True, start_seq=100)
+    items = [(100 + i, payload) for i, payload in enumerate(payloads)]
+    items.insert(20, (119, b'\x08\x77\x12\x05ab'))     # truncated aos_proto - decode error in order
+    results = []
+    done = threading.Event()
+    ready = []
+
+    def on_result(session_id, result, frame):
+        results.append((session_id, result, frame))
+        if len(results) == len(items):
+            done.set()
+
+    pool = DecodePool(proto_dir, on_result, workers=2, batch_size=8, reorder_window=16, transcoder="json_format")
+    pool.start()
+    try:
+        pool.submit(1, "sequenced", items[:16])
+        # window full - a non-blocking submit queues the frames and asks to be called back
+        assert not pool.submit(1, "sequenced", items[16:], on_ready=ready.append)
+        assert done.wait(60)
+    finally:
+        pool.shutdown()
+    assert ready == [1] and pool.get_pending(1) == 0
+    assert [frame for _, _, frame in results] == [frame for _, frame in items]
+    for (key, frame), (session_id, result, _) in zip(items, results):
+        assert session_id == 1
+        if frame == items[20][1]:
+            assert isinstance(result, DecodeError)
+        else:
+            assert result == message_to_dict(schema, parse_frame(schema, frame, "sequenced"))
@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+from protoserv.flowcontrol import FlowControl
+
+
+class Events:
+    def __init__(self):
+        self.log = []
+
+    def callbacks(self) -> dict:
+        return {'on_pause': lambda sid: self.log.append(('pause', sid)),
+                'on_resume': lambda sid: self.log.append(('resume', sid)),
+                'on_disconnect': lambda sid: self.log.append(('disconnect', sid))}
+
+
+def flow_control(policy="pause"):
+    return FlowControl(session_high=1000, session_low=500, global_high=2500, global_low=1500, policy=policy)
+
+
+def test_session_pause_at_high_resume_at_low():
+    flow, events = flow_control(), Events()
+    flow.register(1, **events.callbacks())
+    flow.update(1, 1000)                    # at the watermark - not over it
+    assert not flow.is_paused(1)
+    flow.update(1, 1001)
+    assert flow.is_paused(1) and events.log == [('pause', 1)]
+    flow.update(1, 2000)
+    flow.update(1, 501)                     # under high, still above low
+    assert flow.is_paused(1) and events.log == [('pause', 1)]
+    flow.update(1, 500)
+    assert not flow.is_paused(1) and events.log == [('pause', 1), ('resume', 1)]
+    assert flow.get_stats(1)['pauses'] == 1
+
+
+def test_global_budget_counts_across_sessions():
+    flow, events = flow_control(), Events()
+    for sid in (1, 2, 3):
+        flow.register(sid, **events.callbacks())
+    flow.update(1, 900)
+    flow.update(2, 900)
+    flow.update(3, 700)                     # 2500 - at the global watermark
+    assert flow.total == 2500 and not flow.global_over and events.log == []
+    flow.update(3, 701)                     # every session under its own budget, the sum is not
+    assert flow.global_over and flow.global_overloads == 1
+    assert sorted(events.log) == [('pause', 1), ('pause', 2), ('pause', 3)]
+    events.log.clear()
+    flow.update(1, 100)                     # 1701 - above global low
+    assert flow.global_over and events.log == []
+    flow.unregister(2)                      # its buffer leaves the budget - 801
+    assert not flow.global_over and flow.total == 801
+    assert sorted(events.log) == [('resume', 1), ('resume', 3)]
+
+
+def test_session_stays_paused_over_own_budget_after_global_resume():
+    flow, events = flow_control(), Events()
+    flow.register(1, **events.callbacks())
+    flow.register(2, **events.callbacks())
+    flow.update(1, 1200)
+    flow.update(2, 1400)
+    assert flow.global_over and flow.is_paused(1) and flow.is_paused(2)
+    flow.update(2, 0)
+    assert not flow.global_over
+    assert flow.is_paused(1) and not flow.is_paused(2)
+
+
+def test_disconnect_policy_only_cause():
+    flow, events = flow_control("disconnect"), Events()
+    flow.register(1, **events.callbacks())
+    flow.register(2, **events.callbacks())
+    flow.update(1, 900)
+    flow.update(2, 1700)
+    assert events.log == [('disconnect', 2)]
+    assert flow.wait(1) and not flow.wait(2)
+
+
+def test_none_policy_only_accounts():
+    flow, events = flow_control("none"), Events()
+    flow.register(1, **events.callbacks())
+    flow.update(1, 5000)
+    assert flow.global_over and not flow.is_paused(1) and events.log == []
+
+
+def test_wait_blocks_until_resume():
+    flow = flow_control()
+    flow.register(1)
+    flow.update(1, 1001)
+    assert flow.wait(1, timeout=0.05)       # still paused after timeout, not disconnected
+    assert flow.is_paused(1)
+    resumed = threading.Timer(0.1, flow.update, args=(1, 0))
+    resumed.start()
+    assert flow.wait(1, timeout=5)
+    assert not flow.is_paused(1)
+    resumed.join()
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        FlowControl(policy="drop")
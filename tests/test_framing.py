@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from protoserv.buffer import Buffer
+from protoserv.framing import FRAME_HEADER_SIZE, slice_frames
+
+
+def build_stream(rnd: random.Random, count: int = 200):
+    """Frame payloads (every 5th one empty) and the length prefixed stream."""
+    payloads = []
+    for i in range(count):
+        size = 0 if i % 5 == 0 else rnd.choice((1, 2, rnd.randrange(3, 300), rnd.randrange(300, 65536)))
+        payloads.append(rnd.randbytes(size))
+    return payloads, b''.join(len(p).to_bytes(FRAME_HEADER_SIZE, 'big') + p for p in payloads)
+
+
+def split_points(rnd: random.Random, data: bytes, headers: list, mode: str) -> list:
+    if mode == "bytes":
+        return list(range(1, len(data)))
+    if mode == "headers":
+        # inside the 2 byte header and right after it (zero length frames end there)
+        return sorted({h + 1 for h in headers} | {h + FRAME_HEADER_SIZE for h in headers if h + FRAME_HEADER_SIZE < len(data)})
+    return sorted(rnd.sample(range(1, len(data)), min(len(data) - 1, 500)))
+
+
+def feed(data: bytes, points: list, max_frames: int = 0) -> list:
+    buffer = Buffer()
+    buffer.create_session(1)
+    frames = []
+    for start, end in zip([0] + points, points + [len(data)]):
+        buffer.append(1, data[start:end])
+        while True:
+            sliced = slice_frames(buffer, 1, max_frames=max_frames)
+            frames.extend(bytes(frame) for frame in sliced)
+            if not sliced or not max_frames:
+                break
+    assert buffer.get_size(1) == 0
+    return frames
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("mode", ["random", "headers"])
+def test_random_chunk_splits(seed, mode):
+    rnd = random.Random(seed)
+    payloads, data = build_stream(rnd)
+    headers, pos = [], 0
+    for payload in payloads:
+        headers.append(pos)
+        pos += FRAME_HEADER_SIZE + len(payload)
+    assert feed(data, split_points(rnd, data, headers, mode)) == payloads
+
+
+def test_byte_by_byte():
+    rnd = random.Random(42)
+    payloads, data = build_stream(rnd, count=30)
+    payloads = [p[:200] for p in payloads]
+    data = b''.join(len(p).to_bytes(FRAME_HEADER_SIZE, 'big') + p for p in payloads)
+    assert feed(data, split_points(rnd, data, [], "bytes")) == payloads
+
+
+def test_zero_length_frames_only():
+    data = b'\x00\x00' * 10
+    assert feed(data, [1, 2, 3, 7, 8, 15]) == [b''] * 10
+
+
+def test_max_frames():
+    payloads, data = build_stream(random.Random(7), count=50)
+    assert feed(data, [len(data) // 3, len(data) // 2], max_frames=3) == payloads
+
+
+def test_incomplete_frame_stays_in_buffer():
+    buffer = Buffer()
+    buffer.create_session(1)
+    buffer.append(1, b'\x00\x03ab')
+    assert slice_frames(buffer, 1) == []
+    assert buffer.get_size(1) == 4
+    buffer.append(1, b'c\x00')
+    assert [bytes(frame) for frame in slice_frames(buffer, 1)] == [b'abc']
+    assert buffer.get_size(1) == 1
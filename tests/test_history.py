@@ -0,0 +1,39 @@
+import threading
+
+from protoserv.history import HistoryStore
+
+
+def test_times_stay_sorted_under_concurrent_appends():
+    store = HistoryStore(max_age=0, max_bytes=0)
+
+    def append(thread):
+        for i in range(2000):
+            store.append('10.0.0.1', 'alert', f'SYS{thread}', f'{thread}-{i}')
+
+    threads = [threading.Thread(target=append, args=(thread,)) for thread in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store) == 8000
+    assert store.times == sorted(store.times)
+    # every device index still lists its messages in order
+    assert store.query(device='SYS2', limit=2000) == [f'2-{i}' for i in range(2000)]
+
+
+def test_received_never_goes_backwards():
+    store = HistoryStore(max_age=0, max_bytes=0)
+    store.append('10.0.0.1', 'alert', 'SYS1', 'a', received=100.0)
+    store.append('10.0.0.1', 'alert', 'SYS1', 'b', received=90.0)     # clock stepped back
+    store.append('10.0.0.1', 'alert', 'SYS1', 'c', received=101.0)
+    assert store.times == [100.0, 100.0, 101.0]
+    assert store.query(start=100.0, end=100.0) == ['a', 'b']
+    assert store.query(start=100.5) == ['c']
+
+
+def test_eviction_by_age_and_key_query():
+    store = HistoryStore(max_age=10, max_bytes=0)
+    for i in range(20):
+        store.append('10.0.0.1', 'alert' if i % 2 else 'interface_counters', 'SYS1', str(i), received=float(i))
+    assert store.time_range() == (9.0, 19.0)
+    assert store.query(msg_type='alert', limit=3) == ['15', '17', '19']
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from protoserv import lastvalue
+from protoserv.lastvalue import ENTRY_OVERHEAD, LastValueCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(lastvalue, 'time', clock)
+    return clock
+
+
+def counters(device: str, interface: str, tx_bytes: int) -> dict:
+    return {'origin_name': device, 'perf_mon': {'interface_counters': {'interface_name': interface,
+                                                                       'tx_bytes': str(tx_bytes)}}}
+
+
+def update(cache, source, record, msg_type='perf_mon') -> str:
+    message = json.dumps(record)
+    cache.update(source, msg_type, record, message)
+    return message
+
+
+def test_entity_key():
+    cache = LastValueCache()
+    assert cache.entity_key(counters('SYS1', 'eth0', 1), 'perf_mon') == 'SYS1/interface_counters/eth0'
+    record = {'origin_name': 'SYS1', 'alert': {'id': 'a7', 'raised': True}}
+    assert cache.entity_key(record, 'alert') == 'SYS1/a7'
+
+
+def test_snapshot_keeps_latest_per_entity(clock):
+    cache = LastValueCache()
+    update(cache, '10.0.0.1:1000', counters('SYS1', 'eth0', 1))
+    eth1 = update(cache, '10.0.0.1:1000', counters('SYS1', 'eth1', 1))
+    # same entity from another connection of the same Apstra - replaces, moves to the end
+    eth0 = update(cache, '10.0.0.1:2000', counters('SYS1', 'eth0', 2))
+    other = update(cache, '10.0.0.2:1000', counters('SYS1', 'eth0', 3))
+    assert cache.snapshot() == [eth1, eth0, other]
+    assert cache.snapshot(sources={'10.0.0.1'}) == [eth1, eth0]
+    assert cache.snapshot(types={'alert'}) == []
+    assert cache.snapshot(predicate=lambda message: '"eth1"' in message) == [eth1]
+    assert cache.updates == 4 and len(cache) == 3
+
+
+def test_eviction_by_entries_and_bytes(clock):
+    cache = LastValueCache(max_entries=2)
+    update(cache, '10.0.0.1', counters('SYS1', 'eth0', 1))
+    eth1 = update(cache, '10.0.0.1', counters('SYS1', 'eth1', 1))
+    eth2 = update(cache, '10.0.0.1', counters('SYS1', 'eth2', 1))
+    assert cache.snapshot() == [eth1, eth2] and cache.evictions == 1
+
+    message = json.dumps(counters('SYS1', 'eth0', 1))
+    entry_size = len(message) + len('SYS1/interface_counters/eth0') + ENTRY_OVERHEAD
+    cache = LastValueCache(max_bytes=2 * entry_size)
+    for interface in ('eth0', 'eth1', 'eth2'):
+        update(cache, '10.0.0.1', counters('SYS1', interface, 1))
+    assert len(cache) == 2 and cache.bytes == 2 * entry_size and cache.evictions == 1
+
+
+def test_expiry(clock):
+    cache = LastValueCache(ttl=60)
+    update(cache, '10.0.0.1', counters('SYS1', 'eth0', 1))
+    clock.now += 30
+    eth1 = update(cache, '10.0.0.1', counters('SYS1', 'eth1', 1))
+    clock.now += 40
+    # eth0 is past its ttl - left out of the snapshot before anything expires it
+    assert cache.snapshot() == [eth1] and len(cache) == 2
+    cache.expire()
+    assert len(cache) == 1 and cache.expirations == 1
+    eth0 = update(cache, '10.0.0.1', counters('SYS1', 'eth0', 2))
+    assert cache.snapshot() == [eth1, eth0]
+
+
+def test_clear(clock):
+    cache = LastValueCache()
+    update(cache, '10.0.0.1', counters('SYS1', 'eth0', 1))
+    cache.clear()
+    assert cache.snapshot() == [] and cache.bytes == 0
@@ -0,0 +1,78 @@
+import os
+import hashlib
+
+import pytest
+
+from protoserv import localout
+from protoserv.localout import ShmRingWriter
+from protoserv.localclient import ShmRingReader, RING_HEADER
+
+
+def record(i: int, size: int = 500) -> bytes:
+    """Self-checking record: md5 of the body + body."""
+    body = i.to_bytes(4, 'big') * (size // 4)
+    return hashlib.md5(body).digest() + body
+
+
+def record_index(payload: bytes) -> int:
+    assert hashlib.md5(payload[16:]).digest() == payload[:16], "torn record"
+    return int.from_bytes(payload[16:20], 'big')
+
+
+@pytest.fixture
+def ring():
+    name = f"protoserv-test-{os.getpid()}"
+    writer = ShmRingWriter(name, 4096)
+    reader = ShmRingReader(name)
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def test_reader_in_step(ring):
+    writer, reader = ring
+    for round_start in range(0, 60, 6):
+        for i in range(round_start, round_start + 6):
+            assert writer.write(record(i))
+        assert [record_index(payload) for payload in reader.read()] == list(range(round_start, round_start + 6))
+    assert reader.overruns == 0 and reader.lost == 0
+
+
+def test_lagging_reader_detects_overrun(ring):
+    writer, reader = ring
+    for i in range(40):     # ~5 laps of a 4 KiB ring
+        writer.write(record(i))
+    records = reader.read()
+    assert reader.overruns == 1
+    # continues from the current write position - nothing stale or torn is returned
+    assert records == []
+    writer.write(record(40))
+    assert [record_index(payload) for payload in reader.read()] == [40]
+
+
+def test_overwrite_during_read_is_dropped(ring, monkeypatch):
+    writer, reader = ring
+    for i in range(7):      # reader is almost one lap behind
+        writer.write(record(i))
+    seen = []
+
+    class ReadBeforePublish:
+        # the reader runs after the copy, before the new write position is published
+        size = RING_HEADER.size
+
+        def pack_into(self, *args):
+            if not seen:
+                seen.extend(reader.read())
+            RING_HEADER.pack_into(*args)
+
+    monkeypatch.setattr(localout, 'RING_HEADER', ReadBeforePublish())
+    writer.write(record(7))     # wraps and overwrites record 0
+    assert [record_index(payload) for payload in seen] == [1, 2, 3, 4, 5, 6]
+    assert reader.lost == 1
+
+
+def test_oversized_record_is_dropped(ring):
+    writer, reader = ring
+    assert not writer.write(bytes(3000))
+    assert writer.dropped == 1
+    assert reader.read() == []
@@ -0,0 +1,56 @@
+import socket
+import threading
+import urllib.request
+
+from protoserv.metrics import Counter, Histogram, MetricsRegistry, MetricsServer
+
+
+def record_in_threads(record, count: int = 20):
+    for i in range(count):
+        thread = threading.Thread(target=record, args=(i,))
+        thread.start()
+        thread.join()
+
+
+def test_counter_prunes_exited_threads():
+    counter = Counter('test_total', 'test', ('session',))
+    record_in_threads(lambda i: counter.inc((str(i % 2),), 10))
+    counter.inc(('0',))
+    assert counter.values() == {('0',): 101, ('1',): 100}
+    assert len(counter._shards) == 1    # only the running (main) thread keeps its shard
+    counter.remove(('1',))
+    assert counter.values() == {('0',): 101}
+
+
+def test_histogram_prunes_exited_threads():
+    histogram = Histogram('test_seconds', 'test', (0.1, 1.0))
+    record_in_threads(lambda i: histogram.observe(0.5, count=2))
+    lines = histogram.render()
+    assert 'test_seconds_bucket{le="1.0"} 40' in lines
+    assert 'test_seconds_count 40' in lines
+    assert 'test_seconds_sum 20.0' in lines
+    assert histogram._shards == []
+
+
+def test_server_binds_localhost():
+    registry = MetricsRegistry()
+    registry.counter('test_total', 'test').inc()
+    server = MetricsServer(registry, port=0)
+    assert server.start()
+    try:
+        host, port = server.httpd.server_address
+        assert host == '127.0.0.1'
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert b'test_total 1' in response.read()
+    finally:
+        server.stop()
+
+
+def test_server_bind_failure_is_logged():
+    with socket.socket() as busy:
+        busy.bind(('127.0.0.1', 0))
+        busy.listen()
+        server = MetricsServer(MetricsRegistry(), port=busy.getsockname()[1])
+        assert not server.start()
+        assert server.httpd is None
+        server.stop()
@@ -0,0 +1,96 @@
+import os
+import json
+import time
+
+import pytest
+
+from protoserv.supervisor import Supervisor, worker_path
+
+
+EXIT_CODE_1 = 1 << 8    # waitpid() status of exit(1)
+KILLED = 9              # waitpid() status of SIGKILL
+
+
+def exited(supervisor, restarts: int, uptime: float, status: int = EXIT_CODE_1) -> float:
+    """Restart delay _exited() schedules for a worker that ran ``uptime`` seconds."""
+    worker = supervisor.workers[0]
+    worker.pid = 12345
+    worker.restarts = restarts
+    worker.started = time.monotonic() - uptime
+    supervisor._exited(worker, status)
+    assert worker.pid is None
+    return worker.restart_at - time.monotonic()
+
+
+@pytest.mark.parametrize("restarts, uptime, delay", [
+    (0, 1, 1.0),        # first crash right after start
+    (3, 1, 8.0),        # keeps crashing - doubled per restart
+    (10, 1, 30.0),      # capped at max_restart_delay
+    (50, 1, 30.0),
+    (5, 60, 1.0),       # ran for a while - back to restart_delay
+])
+def test_exited_restart_delay(restarts, uptime, delay):
+    supervisor = Supervisor(1, restart_delay=1.0, max_restart_delay=30.0)
+    assert exited(supervisor, restarts, uptime) == pytest.approx(delay, abs=0.1)
+
+
+def test_exited_killed_by_signal():
+    supervisor = Supervisor(1, restart_delay=2.0)
+    assert exited(supervisor, 0, 30, KILLED) == pytest.approx(2.0, abs=0.1)
+
+
+def test_exited_while_stopping_is_not_restarted():
+    supervisor = Supervisor(1)
+    supervisor.stopping = True
+    worker = supervisor.workers[0]
+    worker.pid = 12345
+    supervisor._exited(worker, EXIT_CODE_1)
+    assert worker.pid is None and worker.restart_at is None
+
+
+@pytest.mark.parametrize("path, index, expected", [
+    ("data/protoserv.data.log", 0, "data/protoserv.data.w0.log"),
+    ("log/protoserv.log", 3, "log/protoserv.w3.log"),
+    ("/run/protoserv.sock", 1, "/run/protoserv.w1.sock"),
+    ("data/output", 2, "data/output.w2"),
+    ("", 1, ""),
+])
+def test_worker_path(path, index, expected):
+    assert worker_path(path, index) == expected
+
+
+def read_available(fd) -> bytes:
+    data = b''
+    while True:
+        try:
+            chunk = os.read(fd, 65536)
+        except BlockingIOError:
+            return data
+        if not chunk:
+            return data
+        data += chunk
+
+
+def test_report_does_not_block_on_full_pipe():
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(read_fd, False)
+    os.set_blocking(write_fd, False)
+    supervisor = Supervisor(1)
+    supervisor.report_fd = write_fd
+    supervisor.parent_pid = os.getppid()
+    # lines over PIPE_BUF - the full pipe takes them partially
+    stats = {'frames': 1, 'padding': 'x' * 10000}
+    try:
+        for _ in range(50):
+            assert supervisor.report(stats)
+        data = read_available(read_fd)
+        assert supervisor.report(stats)
+        assert supervisor.report(stats)
+        data += read_available(read_fd)
+        # no torn lines - the partially written one was completed first
+        lines = data.split(b'\n')
+        assert lines[-1] == b'' and len(lines) > 2
+        assert all(json.loads(line) == stats for line in lines[:-1])
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
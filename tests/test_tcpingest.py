@@ -0,0 +1,99 @@
+import errno
+import socket
+import logging
+import selectors
+import threading
+import time
+
+from protoserv import tcpingest
+from protoserv.tcpingest import TCPListener
+
+
+class FailingListenSocket:
+    """Always readable listen socket whose accept() fails like a process out of file descriptors."""
+    def __init__(self):
+        self.pair = socket.socketpair()
+        self.pair[1].send(b'\0')
+        self.accept_calls = 0
+
+    def fileno(self):
+        return self.pair[0].fileno()
+
+    def accept(self):
+        self.accept_calls += 1
+        raise OSError(errno.EMFILE, "Too many open files")
+
+    def close(self):
+        for sock in self.pair:
+            sock.close()
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def start_failing_listener():
+    logger = logging.getLogger('test_tcpingest')
+    handler = ListHandler()
+    logger.addHandler(handler)
+    listener = TCPListener('127.0.0.1', 0, on_accept=lambda sock, address: None, logger=logger)
+    listener.sock = FailingListenSocket()
+    listener.wakeup = socket.socketpair()
+    listener.selector = selectors.DefaultSelector()
+    listener.selector.register(listener.sock, selectors.EVENT_READ)
+    listener.selector.register(listener.wakeup[0], selectors.EVENT_READ)
+    listener.thread = threading.Thread(target=listener._run, daemon=True)
+    listener.thread.start()
+    return listener, logger, handler
+
+
+def test_accept_error_backs_off(monkeypatch):
+    monkeypatch.setattr(tcpingest, 'ACCEPT_BACKOFF', 0.05)
+    listener, logger, handler = start_failing_listener()
+    try:
+        time.sleep(0.5)
+    finally:
+        listener.stop()
+        logger.removeHandler(handler)
+    # retried about every ACCEPT_BACKOFF seconds instead of spinning on the readable socket
+    assert 3 <= listener.sock.accept_calls <= 15
+    assert listener.accept_errors == listener.sock.accept_calls
+    # logged once per ACCEPT_ERROR_LOG_INTERVAL
+    assert len(handler.messages) == 1 and "Too many open files" in handler.messages[0]
+    assert listener.errors_suppressed == listener.accept_errors - 1
+
+
+def test_accept_error_log_reports_suppressed(monkeypatch):
+    monkeypatch.setattr(tcpingest, 'ACCEPT_BACKOFF', 0.02)
+    monkeypatch.setattr(tcpingest, 'ACCEPT_ERROR_LOG_INTERVAL', 0.1)
+    listener, logger, handler = start_failing_listener()
+    try:
+        time.sleep(0.5)
+    finally:
+        listener.stop()
+        logger.removeHandler(handler)
+    assert 2 <= len(handler.messages) < listener.accept_errors
+    assert "more since the last report" in handler.messages[-1]
+
+
+def test_accepts_connections():
+    accepted = []
+    done = threading.Event()
+
+    def on_accept(sock, address):
+        accepted.append(address)
+        sock.close()
+        done.set()
+
+    listener = TCPListener('127.0.0.1', 0, on_accept=on_accept).start()
+    try:
+        with socket.create_connection(listener.sock.getsockname()):
+            assert done.wait(5)
+    finally:
+        listener.stop()
+    assert listener.accepted == 1 and listener.accept_errors == 0
@@ -0,0 +1,119 @@
+import os
+import json
+import types
+import random
+
+import pytest
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+import stream
+from bench_transcoder import build_corpus
+from protoserv.decoder import message_to_dict, parse_frame
+from protoserv.transcoder import Transcoder
+
+
+F = descriptor_pb2.FieldDescriptorProto
+
+# Apstra shaped schema with every field kind the generated converters special-case (maps above all)
+_MESSAGES = {
+    'Counters': [
+        ('interface_name', 1, F.TYPE_STRING), ('tx_bytes', 2, F.TYPE_UINT64), ('delta', 3, F.TYPE_SINT64),
+        ('utilization', 4, F.TYPE_FLOAT), ('speed', 5, F.TYPE_DOUBLE), ('up', 6, F.TYPE_BOOL),
+        ('errors', 7, F.TYPE_INT32), ('samples', 8, F.TYPE_FIXED64, 'repeated'),
+        ('ratios', 9, F.TYPE_FLOAT, 'repeated'),
+    ],
+    'Alert': [
+        ('id', 1, F.TYPE_STRING), ('severity', 2, F.TYPE_ENUM, None, '.parity.Severity'),
+        ('raised', 3, F.TYPE_BOOL), ('payload', 4, F.TYPE_BYTES), ('tags', 5, F.TYPE_STRING, 'repeated'),
+        ('counters', 6, F.TYPE_MESSAGE, None, '.parity.Counters'),
+        ('history', 7, F.TYPE_MESSAGE, 'repeated', '.parity.Counters'),
+        ('labels', 8, 'map', (F.TYPE_STRING, F.TYPE_STRING)),
+    ],
+    'AosMessage': [
+        ('timestamp', 1, F.TYPE_UINT64), ('origin_name', 2, F.TYPE_STRING),
+        ('counters', 3, F.TYPE_MESSAGE, None, '.parity.Counters', 'data'),
+        ('alert', 4, F.TYPE_MESSAGE, None, '.parity.Alert', 'data'),
+        ('totals', 5, 'map', (F.TYPE_STRING, F.TYPE_INT64)),
+        ('by_index', 6, 'map', (F.TYPE_INT32, F.TYPE_MESSAGE, '.parity.Counters')),
+        ('flags', 7, 'map', (F.TYPE_BOOL, F.TYPE_STRING)),
+        ('values', 8, 'map', (F.TYPE_UINT64, F.TYPE_DOUBLE)),
+        ('ratios', 9, 'map', (F.TYPE_STRING, F.TYPE_FLOAT)),
+        ('blobs', 10, 'map', (F.TYPE_SINT32, F.TYPE_BYTES)),
+        ('states', 11, 'map', (F.TYPE_STRING, F.TYPE_ENUM, '.parity.Severity')),
+    ],
+    'AosSequencedMessage': [('seq_num', 1, F.TYPE_UINT64), ('aos_proto', 2, F.TYPE_BYTES)],
+}
+
+
+def _field(proto, name, number, field_type, label=None, type_name=None):
+    field = proto.field.add(name=name, number=number, type=field_type,
+                            label=F.LABEL_REPEATED if label == 'repeated' else F.LABEL_OPTIONAL)
+    if type_name:
+        field.type_name = type_name
+    return field
+
+
+def build_schema():
+    """Module with the generated message classes (same attributes as streaming_telemetry_schema_pb2)."""
+    file_proto = descriptor_pb2.FileDescriptorProto(name='parity_schema.proto', package='parity', syntax='proto3')
+    enum = file_proto.enum_type.add(name='Severity')
+    for number, name in enumerate(('SEVERITY_UNKNOWN', 'SEVERITY_INFO', 'SEVERITY_CRITICAL')):
+        enum.value.add(name=name, number=number)
+    for message_name, fields in _MESSAGES.items():
+        proto = file_proto.message_type.add(name=message_name)
+        for name, number, field_type, *rest in fields:
+            if field_type == 'map':
+                key_type, value_type, *value_type_name = rest[0]
+                entry_name = ''.join(part.capitalize() for part in name.split('_')) + 'Entry'
+                entry = proto.nested_type.add(name=entry_name)
+                entry.options.map_entry = True
+                _field(entry, 'key', 1, key_type)
+                _field(entry, 'value', 2, value_type, None, value_type_name[0] if value_type_name else None)
+                _field(proto, name, number, F.TYPE_MESSAGE, 'repeated', f'.parity.{message_name}.{entry_name}')
+                continue
+            label, type_name, oneof = (list(rest) + [None, None, None])[:3]
+            field = _field(proto, name, number, field_type, label, type_name)
+            if oneof:
+                if not proto.oneof_decl:
+                    proto.oneof_decl.add(name=oneof)
+                field.oneof_index = 0
+    pool = descriptor_pool.DescriptorPool()
+    pool.AddSerializedFile(file_proto.SerializeToString())
+    file_descriptor = pool.FindFileByName('parity_schema.proto')
+    schema = types.ModuleType('parity_schema_pb2')
+    get_class = getattr(message_factory, 'GetMessageClass', None)
+    factory = None if get_class else message_factory.MessageFactory(pool)
+    for name, descriptor in file_descriptor.message_types_by_name.items():
+        setattr(schema, name, get_class(descriptor) if get_class else factory.GetPrototype(descriptor))
+    return schema
+
+
+def assert_parity(schema, payloads):
+    transcoder = Transcoder(schema)
+    for i, payload in enumerate(payloads):
+        message = parse_frame(schema, payload, "sequenced" if i % 2 == 0 else "unsequenced")
+        assert json.dumps(transcoder.message_to_dict(message)) == json.dumps(message_to_dict(schema, message))
+
+
+def test_corpus_covers_maps():
+    schema = build_schema()
+    message = schema.AosMessage()
+    stream.fill_message(message, random.Random(1))
+    for name in ('totals', 'by_index', 'flags', 'values', 'ratios', 'blobs', 'states'):
+        assert len(getattr(message, name)) > 0
+    assert message.by_index[next(iter(message.by_index))].ListFields()
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_parity_synthetic_schema(seed):
+    schema = build_schema()
+    assert_parity(schema, build_corpus(schema, 300, seed))
+
+
+def test_parity_apstra_schema():
+    # compiled schema of proto/<APSTRA_VERSION> (proto2py.sh) - not part of the repository
+    proto_dir = os.path.join(stream.PROJECT_DIR, 'proto', os.getenv('APSTRA_VERSION', '4.2.1'))
+    if not os.path.exists(os.path.join(proto_dir, 'streaming_telemetry_schema_pb2.py')):
+        pytest.skip(f"no compiled schema in {proto_dir}")
+    schema = stream.schema_for(os.getenv('APSTRA_VERSION', '4.2.1'))
+    assert_parity(schema, build_corpus(schema, 500, 0))
@@ -0,0 +1,122 @@
+import random
+
+import pytest
+
+from protoserv.wirescan import (WireScanner, decode_first_uint64_field, decode_varint, recognize_stream_mode,
+                                skip_field)
+from test_transcoder import build_schema
+
+
+TIMESTAMP = 1710000000123456    # microseconds, as sent by Apstra
+
+
+@pytest.fixture(scope='module')
+def schema():
+    return build_schema()
+
+
+@pytest.fixture(scope='module')
+def scanner(schema):
+    return WireScanner(schema)
+
+
+def alert_message(schema) -> bytes:
+    message = schema.AosMessage(timestamp=TIMESTAMP, origin_name='SYS1')
+    message.alert.id = 'a1'
+    message.alert.tags.extend(['x' * 200])     # multi byte length
+    return message.SerializeToString()
+
+
+def sequenced(schema, seq_num: int, payload: bytes) -> bytes:
+    return schema.AosSequencedMessage(seq_num=seq_num, aos_proto=payload).SerializeToString()
+
+
+def test_skips_fixed64_and_fixed32(scanner):
+    fixed64 = b'\xa1\x01' + bytes(range(8))      # field 20, wire type 1
+    fixed32 = b'\xad\x01' + b'\xff' * 4          # field 21, wire type 5
+    # unknown fixed width fields ahead of the routing fields: timestamp 129, empty alert
+    payload = fixed64 + fixed32 + b'\x08\x81\x01' + b'\x22\x00'
+    assert skip_field(payload, 2, 1) == 10
+    assert skip_field(payload, 12, 5) == 16
+    assert decode_first_uint64_field(payload) == 129
+    key = scanner.scan(payload, 'unsequenced')
+    assert key.timestamp == 129 and key.msg_type == 'alert'
+    with pytest.raises(ValueError):
+        skip_field(fixed64[:6], 2, 1)
+    with pytest.raises(ValueError):
+        skip_field(fixed32[:4], 2, 5)
+
+
+def test_routing_keys_unsequenced(schema, scanner):
+    payload = alert_message(schema)
+    assert scanner.scan(payload, 'unsequenced') == (None, TIMESTAMP, 'alert', 0, len(payload))
+
+
+def test_routing_keys_sequenced(schema, scanner):
+    inner = alert_message(schema)
+    payload = sequenced(schema, 77, inner)
+    key = scanner.scan(payload, 'sequenced')
+    assert (key.seq_num, key.timestamp, key.msg_type) == (77, TIMESTAMP, 'alert')
+    assert payload[key.start:key.end] == inner
+
+
+def test_routing_keys_without_type(schema, scanner):
+    payload = schema.AosMessage(timestamp=TIMESTAMP, origin_name='SYS1').SerializeToString()
+    assert scanner.scan(payload, 'unsequenced').msg_type is None
+
+
+@pytest.mark.parametrize("data", [b'', b'\x80', b'\xff\xff'])
+def test_truncated_varint(data):
+    with pytest.raises(ValueError):
+        decode_varint(data, 0)
+    with pytest.raises(ValueError):
+        decode_first_uint64_field(b'\x08' + data)
+
+
+def test_overlong_varint():
+    with pytest.raises(ValueError):
+        decode_varint(b'\xff' * 11, 0)
+
+
+def test_truncated_length_delimited(schema, scanner):
+    with pytest.raises(ValueError):
+        scanner.scan(b'\x08\x01\x22\x05ab', 'unsequenced')
+    with pytest.raises(ValueError):
+        skip_field(b'\x05ab', 0, 2)
+    inner = alert_message(schema)
+    with pytest.raises(ValueError):
+        scanner.scan(sequenced(schema, 1, inner)[:-10], 'sequenced')
+
+
+@pytest.mark.parametrize("mode", ["sequenced", "unsequenced"])
+def test_every_truncation_is_value_error(schema, scanner, mode):
+    payload = alert_message(schema)
+    if mode == "sequenced":
+        payload = sequenced(schema, 300, payload)
+    for size in range(len(payload)):
+        try:
+            scanner.scan(payload[:size], mode)
+        except ValueError:
+            pass
+
+
+def test_stream_mode(schema):
+    payload = alert_message(schema)
+    assert recognize_stream_mode(payload) == 'unsequenced'
+    assert recognize_stream_mode(sequenced(schema, 1, payload)) == 'sequenced'
+    assert recognize_stream_mode(sequenced(schema, 10 ** 12, payload)) == 'sequenced'
+
+
+@pytest.mark.parametrize("garbage", [b'', b'\xff\xff\xff', b'\x0a\x10abc', b'\x12\x00\x1a\x00', b'\x0b\x01'])
+def test_stream_mode_garbage(garbage):
+    with pytest.raises(ValueError):
+        recognize_stream_mode(garbage)
+
+
+def test_stream_mode_random_garbage():
+    rnd = random.Random(0)
+    for _ in range(2000):
+        try:
+            assert recognize_stream_mode(rnd.randbytes(rnd.randrange(1, 40))) in ('sequenced', 'unsequenced')
+        except ValueError:
+            pass
@@ -0,0 +1,104 @@
+import queue
+import logging
+
+import pytest
+
+from protoserv.zlogger import ZLogger, _DropQueueHandler
+
+
+@pytest.fixture
+def make_zlogger(monkeypatch, tmp_path):
+    created = []
+
+    def make(writer: str, **env) -> ZLogger:
+        monkeypatch.setenv('STD_LOGGER_WRITER', writer)
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        zlogger = ZLogger()
+        zlogger.set_std_logger_file_output_filepath(str(tmp_path / 'protoserv.log'))
+        zlogger.std_logger()
+        created.append(zlogger)
+        return zlogger
+
+    yield make
+    # 'stdlogger' is a process wide logger - leave it without handlers for the next test
+    for zlogger in created:
+        zlogger.close()
+        for handler in list(zlogger.stdlogger.handlers):
+            zlogger.stdlogger.removeHandler(handler)
+            handler.close()
+
+
+def log_file(tmp_path) -> str:
+    return (tmp_path / 'protoserv.log').read_text()
+
+
+def test_queue_writer(make_zlogger, tmp_path):
+    zlogger = make_zlogger('queue')
+    assert [type(h) for h in zlogger.stdlogger.handlers] == [_DropQueueHandler]
+    assert zlogger.stdlogger_listener is not None
+    zlogger.info("# session", "10.0.0.1:4567", "frames: 10")
+    zlogger.close()
+    assert "# session" in log_file(tmp_path) and "frames: 10" in log_file(tmp_path)
+
+
+def test_sync_writer(make_zlogger, tmp_path):
+    zlogger = make_zlogger('sync')
+    assert zlogger.stdlogger_listener is None and zlogger.get_dropped() == 0
+    assert {type(h).__name__ for h in zlogger.stdlogger.handlers} == {'StreamHandler', 'TimedRotatingFileHandler'}
+    zlogger.stdlogger.warning("written by the caller")
+    assert "written by the caller" in log_file(tmp_path)
+
+
+@pytest.mark.parametrize("writer", ["queue", "sync"])
+def test_exception_traceback(make_zlogger, tmp_path, writer):
+    zlogger = make_zlogger(writer)
+
+    def failing():
+        raise ValueError("bad frame")
+
+    try:
+        failing()
+    except ValueError:
+        zlogger.stdlogger.exception("decode failed")
+    zlogger.close()
+    text = log_file(tmp_path)
+    assert "decode failed" in text
+    assert "Traceback (most recent call last)" in text and "in failing" in text
+    assert "ValueError: bad frame" in text
+
+
+def test_queue_full_drops_and_counts():
+    handler = _DropQueueHandler(queue.Queue(2))
+    logger = logging.getLogger('test_zlogger_drop')
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        for i in range(5):
+            logger.warning("record %d", i)
+    finally:
+        logger.removeHandler(handler)
+    assert handler.dropped == 3 and handler.queue.qsize() == 2
+    # message arguments are left for the writer thread to format
+    record = handler.queue.get_nowait()
+    assert (record.msg, record.args) == ("record %d", (0,))
+
+
+def test_level_follows_most_verbose_handler(make_zlogger):
+    zlogger = make_zlogger('sync', STD_LOGGER_LEVEL='WARNING', STD_LOGGER_FILE_LEVEL='INFO')
+    assert zlogger.stdlogger.isEnabledFor(logging.INFO)
+    assert not zlogger.stdlogger.isEnabledFor(logging.DEBUG)
+
+
+def test_hot_path_counters():
+    zlogger = ZLogger()
+    assert zlogger.interval('missing') == (0, 0, 0.0)
+    zlogger.count('10.0.0.1:4567', 3, 300)
+    zlogger.count('10.0.0.1:4567', 2, 200)
+    count, size, seconds = zlogger.interval('10.0.0.1:4567')
+    assert (count, size) == (5, 500) and seconds >= 0
+    zlogger.count('10.0.0.1:4567')
+    assert zlogger.interval('10.0.0.1:4567')[:2] == (1, 0)      # only what came since the last interval
+    assert zlogger.interval('10.0.0.1:4567')[:2] == (0, 0)
+    zlogger.discard('10.0.0.1:4567')
+    assert zlogger.interval('10.0.0.1:4567') == (0, 0, 0.0)